@@ -0,0 +1,19 @@
+"""
+Whether the configured cache is shared between worker processes.
+
+Data cached per process can only be invalidated in the process that made
+the write. Callers whose entries have to follow writes made elsewhere check
+is_cache_shared and fall back to something that does not rely on it.
+"""
+from django.conf import settings
+
+# Backends whose entries only the current process can see
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_cache_shared(alias='default'):
+    """Whether every process reads and writes the same ``alias`` cache"""
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
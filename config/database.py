@@ -0,0 +1,68 @@
+"""
+Connection reuse settings for the DATABASES entries.
+
+DB_POOL_MODE picks how worker processes hold their database connections:
+
+* ``pool``: a psycopg 3 connection pool per process (PostgreSQL only,
+  needs ``psycopg[pool]``). Requests borrow a connection and return it, so
+  worker churn never opens connections in bursts.
+* ``persistent``: one connection per thread kept for CONN_MAX_AGE seconds,
+  checked before reuse by CONN_HEALTH_CHECKS so a connection the server or a
+  proxy dropped is replaced instead of failing the request.
+* ``none``: a new connection per request.
+* ``auto``: ``pool`` when the database is PostgreSQL and psycopg 3 with its
+  pool is installed, ``persistent`` otherwise.
+"""
+import importlib.util
+
+from django.core.exceptions import ImproperlyConfigured
+
+POOL_MODES = ('auto', 'pool', 'persistent', 'none')
+
+
+def has_psycopg_pool():
+    """Whether psycopg 3 and psycopg_pool are importable"""
+    return all(importlib.util.find_spec(name) is not None for name in ('psycopg', 'psycopg_pool'))
+
+
+def resolve_pool_mode(database, mode):
+    """The concrete mode ``auto`` stands for with ``database``"""
+    if mode not in POOL_MODES:
+        raise ImproperlyConfigured(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, not {mode!r}")
+    supports_pool = 'postgresql' in database['ENGINE'] and has_psycopg_pool()
+    if mode == 'pool' and not supports_pool:
+        raise ImproperlyConfigured('DB_POOL_MODE=pool needs PostgreSQL and psycopg 3 with psycopg_pool installed')
+    if mode == 'auto':
+        return 'pool' if supports_pool else 'persistent'
+    return mode
+
+
+def configure_connections(database, mode='auto', conn_max_age=600, pool_min_size=2, pool_max_size=10,
+                          pool_timeout=10.0):
+    """Return a copy of the ``database`` settings set up for ``mode``"""
+    mode = resolve_pool_mode(database, mode)
+    database = {**database, 'OPTIONS': dict(database.get('OPTIONS') or {})}
+    database['OPTIONS'].pop('pool', None)
+    if mode == 'pool':
+        # The pool does the reuse; Django refuses persistent connections on top
+        database['CONN_MAX_AGE'] = 0
+        database['CONN_HEALTH_CHECKS'] = False
+        database['OPTIONS']['pool'] = {
+            'min_size': pool_min_size,
+            'max_size': pool_max_size,
+            'timeout': pool_timeout,
+        }
+    elif mode == 'persistent':
+        database['CONN_MAX_AGE'] = conn_max_age
+        database['CONN_HEALTH_CHECKS'] = True
+    else:
+        database['CONN_MAX_AGE'] = 0
+        database['CONN_HEALTH_CHECKS'] = False
+    return database
+
+
+def get_pool_mode(database):
+    """The mode a configured DATABASES entry is using"""
+    if (database.get('OPTIONS') or {}).get('pool'):
+        return 'pool'
+    return 'persistent' if database.get('CONN_MAX_AGE') else 'none'
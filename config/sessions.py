@@ -0,0 +1,62 @@
+"""
+Session settings profiles.
+
+SESSION_PROFILE picks where sessions live and whether the session's user is
+cached (see core.backends):
+
+* ``db``: sessions in the database, user looked up on every request. The
+  only safe choice when each process has its own local-memory cache.
+* ``cached``: ``cached_db`` sessions, read from the cache and written through
+  to the database, plus the cached user. Needs a cache shared by every
+  process (REDIS_URL), or logouts and password changes reach other
+  processes only when their entries expire.
+* ``cookie``: sessions in a signed cookie, plus the cached user. No session
+  queries at all, but the data is readable by the client and a copied
+  cookie stays valid until it expires. The cached user needs a shared cache
+  just like ``cached``.
+
+Without a shared cache get_session_profile turns the user cache off.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+CACHED_MODEL_BACKEND = 'core.backends.CachedModelBackend'
+
+# Sessions store the path of the backend that logged the user in and are
+# dropped when it is no longer listed. The cached profiles log users in with
+# CachedModelBackend and keep ModelBackend for sessions made before; a failed
+# login there checks the password with both.
+SESSION_PROFILES = {
+    'db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': [MODEL_BACKEND],
+        'AUTH_USER_CACHE_TIMEOUT': 0,
+    },
+    'cached': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': [CACHED_MODEL_BACKEND, MODEL_BACKEND],
+        'AUTH_USER_CACHE_TIMEOUT': 300,
+    },
+    'cookie': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'AUTHENTICATION_BACKENDS': [CACHED_MODEL_BACKEND, MODEL_BACKEND],
+        'AUTH_USER_CACHE_TIMEOUT': 300,
+    },
+}
+
+
+def get_session_profile(name, shared_cache=True):
+    """The settings of the profile called ``name``
+
+    Unless ``shared_cache``, the user is not cached: a per-process entry
+    would keep a changed or deactivated user logged in elsewhere.
+    """
+    if name not in SESSION_PROFILES:
+        raise ImproperlyConfigured(
+            f"SESSION_PROFILE must be one of {', '.join(SESSION_PROFILES)}, not {name!r}"
+        )
+    profile = dict(SESSION_PROFILES[name])
+    profile['AUTHENTICATION_BACKENDS'] = list(profile['AUTHENTICATION_BACKENDS'])
+    if not shared_cache:
+        profile['AUTH_USER_CACHE_TIMEOUT'] = 0
+    return profile
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tracker.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -55,17 +56,25 @@ MIDDLEWARE = [
 ]
 ROOT_URLCONF = 'config.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Compile each template once per process instead of on every render
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
@@ -78,15 +87,69 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 import dj_database_url
 
+from .database import configure_connections
+from .sessions import get_session_profile
+
+# Connection reuse, see config/database.py: DB_POOL_MODE is auto, pool,
+# persistent or none. Pool sizes are per worker process, so keep
+# DB_POOL_MAX_SIZE times the number of workers under the server's limit.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'auto')
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
-        conn_max_age=600,
-        ssl_require=False,
+    'default': configure_connections(
+        dj_database_url.config(
+            default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+            ssl_require=False,
+        ),
+        mode=DB_POOL_MODE,
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        pool_min_size=int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        pool_max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '10')),
     )
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Set REDIS_URL to share the cache between workers; otherwise each process
+# keeps its own local-memory cache and the caches that need invalidating
+# across workers (dashboard, sessions, users) stay off.
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'expensetracker',
+        }
+    }
+
+
+# Sessions and authentication, see config/sessions.py: SESSION_PROFILE is
+# db, cached or cookie. The cached user needs a shared cache, so cached is the
+# default only with REDIS_URL and the user cache is off without it.
+
+SESSION_PROFILE = os.getenv('SESSION_PROFILE', 'cached' if REDIS_URL else 'db')
+SESSION_SETTINGS = get_session_profile(SESSION_PROFILE, shared_cache=bool(REDIS_URL))
+SESSION_ENGINE = SESSION_SETTINGS['SESSION_ENGINE']
+# Seconds the session's user is cached by core.backends.CachedModelBackend
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', SESSION_SETTINGS['AUTH_USER_CACHE_TIMEOUT']))
+AUTHENTICATION_BACKENDS = SESSION_SETTINGS['AUTHENTICATION_BACKENDS']
+# Save sessions only when a view changed them, never just to extend expiry
+SESSION_SAVE_EVERY_REQUEST = False
+# Flash messages travel in their own cookie instead of loading and saving
+# the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -137,4 +200,47 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Expense tracker
+# Number of expenses shown per dashboard page (keyset paginated)
+EXPENSE_PAGE_SIZE = int(os.getenv('EXPENSE_PAGE_SIZE', '25'))
+# Rows per bulk_create batch when importing expenses from CSV
+EXPENSE_IMPORT_BATCH_SIZE = int(os.getenv('EXPENSE_IMPORT_BATCH_SIZE', '2000'))
+
+# Cache dashboard statistics, chart fragments and conditional responses per
+# user. Invalidation needs a cache shared by every worker, so it is on by
+# default only with REDIS_URL; a single-process deployment may turn it on.
+DASHBOARD_CACHE_ENABLED = os.getenv('DASHBOARD_CACHE_ENABLED', 'True' if REDIS_URL else 'False').lower() in ('true', '1')
+# Seconds a user's cached dashboard statistics are kept (entries are also
+# invalidated whenever the user's expenses change)
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+
+# Seconds a process keeps its category registry before reloading it when the
+# cache is per-process and cannot tell it about other processes' writes
+CATEGORY_REGISTRY_TTL = int(os.getenv('CATEGORY_REGISTRY_TTL', '30'))
+
+# Per-request SQL, service and render timings exposed as Server-Timing headers
+# and a "tracker.timing" log line. The middleware removes itself when disabled.
+TRACKER_TIMING_ENABLED = os.getenv('TRACKER_TIMING_ENABLED', 'False').lower() in ('true', '1')
+
+# Search backend for the expense search filter: 'auto' uses SQLite FTS5 or
+# PostgreSQL full-text search to match the database, 'basic' a substring scan
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'tracker.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
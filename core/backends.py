@@ -0,0 +1,60 @@
+"""
+Authentication backend that caches the user of each session.
+
+AuthenticationMiddleware looks the session's user up on every request, one
+query before any view code runs. CachedModelBackend keeps that user in the
+cache for AUTH_USER_CACHE_TIMEOUT seconds (0 turns the cache off). The
+signals in core.signals delete the entry whenever the user is saved or
+deleted, so a password change still ends the user's other sessions.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+
+def user_cache_key(user_id):
+    return f'core:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    """Drop the cached user, now and once the write commits"""
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    # A lookup between the write and the commit would cache the old row
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose session user lookups go through the cache"""
+
+    def get_user(self, user_id):
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        UserModel = get_user_model()
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        if not timeout:
+            return await super().aget_user(user_id)
+        UserModel = get_user_model()
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await UserModel._default_manager.aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            await cache.aset(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
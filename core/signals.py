@@ -0,0 +1,15 @@
+"""
+Signal handlers that drop cached users after user writes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_cached_user
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user(sender, instance, **kwargs):
+    """The cached copy of the user is stale, including its password hash"""
+    invalidate_cached_user(instance.pk)
@@ -1,3 +1,129 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
\ No newline at end of file
+from config.sessions import get_session_profile
+from core.backends import CachedModelBackend, user_cache_key
+
+
+def session_and_user_queries(queries):
+    tables = ('"django_session"', f'"{get_user_model()._meta.db_table}"')
+    return [query['sql'] for query in queries.captured_queries if any(table in query['sql'] for table in tables)]
+
+
+@override_settings(
+    AUTH_USER_CACHE_TIMEOUT=300, AUTHENTICATION_BACKENDS=get_session_profile('cached')['AUTHENTICATION_BACKENDS']
+)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='cached', email='cached@example.com', password='old-pass-123'
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('api_expenses')
+
+    def test_session_user_is_read_from_the_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Only the database session remains
+        self.assertEqual(len(session_and_user_queries(queries)), 1)
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)).username, 'cached')
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.client.get(self.url)
+        self.user.set_password('new-pass-456')
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        # The session was authenticated with the old password hash
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deactivated_and_deleted_users_are_not_returned(self):
+        backend = CachedModelBackend()
+        self.assertEqual(backend.get_user(self.user.pk), self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(backend.get_user(self.user.pk))
+        self.user.delete()
+        self.assertIsNone(backend.get_user(self.user.pk))
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    async def test_async_lookup_shares_the_cache(self):
+        backend = CachedModelBackend()
+        self.assertEqual(await backend.aget_user(self.user.pk), self.user)
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(cached, self.user)
+        cached.first_name = 'From cache'
+        cache.set(user_cache_key(self.user.pk), cached)
+        self.assertEqual((await backend.aget_user(self.user.pk)).first_name, 'From cache')
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_zero_timeout_turns_the_cache_off(self):
+        backend = CachedModelBackend()
+        with self.assertNumQueries(2):
+            backend.get_user(self.user.pk)
+            backend.get_user(self.user.pk)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+
+class SessionProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='profile', email='profile@example.com', password='pass-123'
+        )
+        self.url = reverse('api_expenses')
+
+    def test_unknown_profiles_are_rejected(self):
+        self.assertEqual(get_session_profile('cached')['AUTH_USER_CACHE_TIMEOUT'], 300)
+        with self.assertRaises(ImproperlyConfigured):
+            get_session_profile('redis')
+
+    def test_profiles_without_a_shared_cache_skip_the_user_cache(self):
+        # A per-process cache would keep changed users logged in elsewhere
+        for profile in ('cached', 'cookie'):
+            self.assertEqual(get_session_profile(profile, shared_cache=False)['AUTH_USER_CACHE_TIMEOUT'], 0)
+
+    def test_sessions_made_with_the_model_backend_survive_a_switch_to_a_cached_profile(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.session['_auth_user_backend'], 'django.contrib.auth.backends.ModelBackend')
+        with override_settings(**get_session_profile('cached')):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            # New logins go through the cached backend
+            self.assertTrue(self.client.login(username='profile', password='pass-123'))
+            self.assertEqual(self.client.session['_auth_user_backend'], 'core.backends.CachedModelBackend')
+
+    def test_unchanged_database_sessions_are_not_saved(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertEqual(len(session_and_user_queries(queries)), 2)
+        self.assertFalse(any(sql.startswith('UPDATE') for sql in session_and_user_queries(queries)))
+
+    def test_cached_and_cookie_profiles_skip_session_and_user_queries(self):
+        for profile in ('cached', 'cookie'):
+            with self.subTest(profile=profile), override_settings(**get_session_profile(profile)):
+                # SessionMiddleware picks its engine when the client first loads it
+                client = Client()
+                client.force_login(self.user)
+                client.get(self.url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(self.url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(session_and_user_queries(queries), [])
+
+    def test_flash_messages_are_kept_in_a_cookie(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'password1': 'Long-pass-789', 'password2': 'Long-pass-789',
+        })
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertIn('messages', response.cookies)
+        self.assertContains(self.client.get(reverse('login')), 'Registration successful')
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import ExpenseCategory, Expense
+from .models import Budget, ExpenseCategory, Expense, RecurringExpense
+from .services import ExpenseService, RollupService
 
 @admin.register(ExpenseCategory)
 class ExpenseCategoryAdmin(admin.ModelAdmin):
@@ -11,3 +12,34 @@ class ExpenseAdmin(admin.ModelAdmin):
     list_display = ('category', 'user', 'amount', 'date', 'description')
     search_fields = ('category__name', 'user__username', 'description')
     list_filter = ('category', 'date')
+    list_select_related = ('category', 'user')
+    autocomplete_fields = ('user', 'category')
+
+    def save_model(self, request, obj, form, change):
+        before = None
+        if change:
+            before = RollupService.snapshot(Expense.objects.get(pk=obj.pk))
+        ExpenseService.save_expense(obj, before=before)
+
+    def delete_model(self, request, obj):
+        ExpenseService.delete_expense(obj)
+
+    def delete_queryset(self, request, queryset):
+        for expense in queryset:
+            ExpenseService.delete_expense(expense)
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ('category', 'user', 'monthly_limit', 'updated_at')
+    search_fields = ('category__name', 'user__username')
+    list_filter = ('category',)
+    list_select_related = ('category', 'user')
+    autocomplete_fields = ('user', 'category')
+
+@admin.register(RecurringExpense)
+class RecurringExpenseAdmin(admin.ModelAdmin):
+    list_display = ('category', 'user', 'amount', 'frequency', 'interval', 'next_run', 'active')
+    search_fields = ('category__name', 'user__username', 'description')
+    list_filter = ('frequency', 'active', 'category')
+    list_select_related = ('category', 'user')
+    autocomplete_fields = ('user', 'category')
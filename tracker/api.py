@@ -0,0 +1,234 @@
+"""
+JSON endpoints for the expense list, expense CRUD and the dashboard chart series.
+
+They let the dashboard refresh the one widget that changed instead of
+re-rendering the whole page. Responses carry an ETag built from the user's
+DashboardCache data version and a Last-Modified of the user's last write, so
+polling an unchanged widget costs a cache lookup and a 304. Both are left
+out while the dashboard cache is off.
+"""
+import json
+from datetime import datetime, time
+from functools import wraps
+
+from django.conf import settings
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse, QueryDict
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_http_methods
+
+from .cache import DashboardCache
+from .charts import parse_chart_selection
+from .forms import ExpenseForm
+from .models import Expense
+from .pagination import ExpenseCursorPaginator
+from .projections import ExpenseRow
+from .recurring import RecurringExpenseService
+from .services import ExpenseService, RollupService
+from .view_helpers import ExpenseViewHelper
+
+MAX_PAGE_SIZE = 100
+
+
+def api_login_required(view):
+    """Like login_required, but answers anonymous requests with a JSON 401"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def data_etag(request, *args, **kwargs):
+    """ETag of the user's data version
+
+    The trends are relative to today, so the date is part of it as well.
+    None, so no ETag is sent, while the dashboard cache is off: the version
+    of a per-process cache does not change with writes made by other
+    processes.
+    """
+    if not DashboardCache.is_enabled():
+        return None
+    version = DashboardCache.get_version(request.user.pk)
+    return f'{request.user.pk}-{version}-{timezone.localdate().isoformat()}'
+
+
+def data_last_modified(request, *args, **kwargs):
+    """The user's last write, or the start of today if that is later; None while the dashboard cache is off"""
+    if not DashboardCache.is_enabled():
+        return None
+    start_of_today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(DashboardCache.get_last_write(request.user.pk), start_of_today)
+
+
+user_data_condition = condition(etag_func=data_etag, last_modified_func=data_last_modified)
+
+
+def api_response(data, status=200):
+    """JSON response that browsers store but always revalidate"""
+    response = JsonResponse(data, status=status)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def error_response(message, status, errors=None):
+    data = {'error': message}
+    if errors is not None:
+        data['errors'] = errors
+    return api_response(data, status=status)
+
+
+def serialize_expense(expense):
+    """JSON of an ExpenseRow or an Expense"""
+    if isinstance(expense, Expense):
+        expense = ExpenseRow.from_expense(expense)
+    return {
+        'id': expense.pk,
+        'date': expense.date.isoformat(),
+        'category': {'id': expense.category_id, 'name': expense.category_name},
+        'amount': str(expense.amount),
+        'description': expense.description or '',
+        'recurring_expense': expense.recurring_expense_id,
+    }
+
+
+def get_request_data(request):
+    """Request body as a mapping, from JSON or form encoding; None if malformed"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    if request.method == 'POST':
+        return request.POST
+    return QueryDict(request.body, encoding=request.encoding)
+
+
+def get_filters(request):
+    """Validated list filters from the query string as (helper, errors)"""
+    helper = ExpenseViewHelper(request)
+    filter_form = helper.get_filtered_expenses()['filter_form']
+    errors = None if filter_form.is_valid() else filter_form.errors.get_json_data()
+    return helper, errors
+
+
+def get_page_size(request):
+    default = getattr(settings, 'EXPENSE_PAGE_SIZE', 25)
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        page_size = default
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@user_data_condition
+def expense_collection(request):
+    """GET a cursor page of the user's expenses, POST to create one"""
+    if request.method == 'POST':
+        return create_expense(request)
+
+    helper, errors = get_filters(request)
+    if errors:
+        return error_response('Invalid filters', 400, errors)
+
+    paginator = ExpenseCursorPaginator(
+        ExpenseService.get_user_expenses(request.user, helper.filters),
+        sort_by=ExpenseService.get_sort_by(helper.filters),
+        page_size=get_page_size(request),
+        projection=ExpenseService.LIST_ROW
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return api_response({
+        'results': [serialize_expense(expense) for expense in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def create_expense(request):
+    data = get_request_data(request)
+    if data is None:
+        return error_response('Malformed request body', 400)
+
+    form = ExpenseForm(data)
+    if not form.is_valid():
+        return error_response('Invalid expense', 400, form.errors.get_json_data())
+    expense = form.save(commit=False)
+    expense.user = request.user
+    ExpenseService.save_expense(expense)
+    if form.cleaned_data.get('repeat'):
+        RecurringExpenseService.create_from_expense(expense, form.cleaned_data['repeat'])
+    return api_response(serialize_expense(expense), status=201)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD', 'PUT', 'PATCH', 'DELETE'])
+@user_data_condition
+def expense_detail(request, expense_id):
+    """GET, replace (PUT), partially update (PATCH) or DELETE one expense"""
+    try:
+        expense = Expense.objects.select_related('category').get(pk=expense_id, user=request.user)
+    except Expense.DoesNotExist:
+        return error_response('Expense not found', 404)
+
+    if request.method in ('GET', 'HEAD'):
+        return api_response(serialize_expense(expense))
+
+    if request.method == 'DELETE':
+        ExpenseService.delete_expense(expense)
+        return HttpResponse(status=204)
+
+    data = get_request_data(request)
+    if data is None:
+        return error_response('Malformed request body', 400)
+    if request.method == 'PATCH':
+        data = {**model_to_dict(expense, fields=ExpenseForm.Meta.fields), **dict(data.items())}
+
+    # Validation writes the new values onto the instance, so remember the
+    # old ones for the rollup first
+    before = RollupService.snapshot(expense)
+    form = ExpenseForm(data, instance=expense)
+    if not form.is_valid():
+        return error_response('Invalid expense', 400, form.errors.get_json_data())
+    ExpenseService.save_expense(form.save(commit=False), before=before)
+    return api_response(serialize_expense(expense))
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@user_data_condition
+def chart_collection(request):
+    """Several chart series at once, filtered like the expense list
+
+    ``?charts=monthly,category`` picks the series; only those are computed.
+    """
+    try:
+        series = parse_chart_selection(request.GET.get('charts'))
+    except ValueError as exc:
+        return error_response(str(exc), 400)
+
+    helper, errors = get_filters(request)
+    if errors:
+        return error_response('Invalid filters', 400, errors)
+
+    return api_response(dict(DashboardCache.get_chart_data(request.user, helper.filters, series)))
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@user_data_condition
+def chart_series(request, series):
+    """One dashboard chart series, filtered like the expense list"""
+    if series not in ExpenseService.CHART_SERIES:
+        return error_response('Unknown chart series', 404)
+
+    helper, errors = get_filters(request)
+    if errors:
+        return error_response('Invalid filters', 400, errors)
+
+    return api_response(DashboardCache.get_chart_series(request.user, series, helper.filters))
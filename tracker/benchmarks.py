@@ -0,0 +1,400 @@
+"""
+Synthetic data and measurement helpers shared by the benchmark management commands.
+"""
+import asyncio
+import math
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, RequestFactory
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Expense, ExpenseCategory
+from .search import get_search_backend
+from .services import ExpenseService, RollupService
+
+BENCHMARK_CATEGORIES = [
+    'Food', 'Transport', 'Housing', 'Utilities', 'Health',
+    'Entertainment', 'Shopping', 'Education', 'Travel', 'Other'
+]
+
+BENCHMARK_DESCRIPTIONS = [
+    'Groceries', 'Lunch with team', 'Monthly rent', 'Electricity bill', 'Taxi home',
+    'Pharmacy', 'Cinema tickets', 'New shoes', 'Online course', 'Weekend trip', ''
+]
+
+
+def get_benchmark_categories():
+    """Return the benchmark categories, creating the missing ones"""
+    existing = {category.name: category for category in ExpenseCategory.objects.filter(name__in=BENCHMARK_CATEGORIES)}
+    missing = [ExpenseCategory(name=name) for name in BENCHMARK_CATEGORIES if name not in existing]
+    if missing:
+        ExpenseCategory.objects.bulk_create(missing)
+        existing = {category.name: category for category in ExpenseCategory.objects.filter(name__in=BENCHMARK_CATEGORIES)}
+    return [existing[name] for name in BENCHMARK_CATEGORIES]
+
+
+def create_benchmark_user(username, password='benchmark-pass'):
+    """Create (or reuse) a user that owns the synthetic expenses"""
+    User = get_user_model()
+    user, created = User.objects.get_or_create(username=username, defaults={'email': f'{username}@example.com'})
+    if created:
+        user.set_password(password)
+        user.save(update_fields=['password'])
+    return user
+
+
+def seed_expenses(user, count, categories=None, days=730, batch_size=5000, seed=42):
+    """Insert ``count`` random expenses for ``user`` spread over the last ``days`` days
+
+    The user's daily rollups and search index entries are rebuilt afterwards
+    so both dashboard sources and the search see the same data.
+    """
+    rng = random.Random(seed)
+    categories = categories or get_benchmark_categories()
+    today = timezone.localdate()
+
+    batch = []
+    for _ in range(count):
+        batch.append(Expense(
+            user=user,
+            category=rng.choice(categories),
+            amount=Decimal(rng.randint(100, 5_000_000)) / 100,
+            description=rng.choice(BENCHMARK_DESCRIPTIONS),
+            date=today - timedelta(days=rng.randrange(days)),
+        ))
+        if len(batch) >= batch_size:
+            Expense.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Expense.objects.bulk_create(batch)
+    RollupService.rebuild(user)
+    get_search_backend().index_queryset(Expense.objects.filter(user=user))
+
+
+def measure(func, repeat=1, track_memory=True):
+    """Run ``func`` and return its wall time, query count and peak memory
+
+    Wall time is the best of ``repeat`` runs with query capture enabled.
+    Peak memory is taken from a separate run under tracemalloc, because
+    tracing slows the code down too much to time it at the same time.
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        queries = len(context.captured_queries)
+
+    result = {'wall_ms': round(min(timings) * 1000, 3), 'queries': queries}
+    if track_memory:
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+class BenchmarkContext:
+    """Objects a benchmark case needs: the seeded user, a client and a request"""
+
+    def __init__(self, user, size):
+        self.user = user
+        self.size = size
+        self.expenses = Expense.objects.filter(user=user)
+        self.filters = {'amount_min': Decimal('100.00'), 'sort_by': '-amount'}
+        self.client = Client()
+        self.client.force_login(user)
+        self.request = RequestFactory().get('/')
+        self.request.user = user
+        self.dashboard_context = None
+
+
+def _home_get(context, warm):
+    if not warm:
+        cache.clear()
+    url = reverse('home')
+    response = context.client.get(url)
+    _check(response, url)
+    return response
+
+
+def _dashboard_context(context):
+    from .view_helpers import get_dashboard_context
+    cache.clear()
+    return get_dashboard_context(context.request)
+
+
+def _render_home(context, warm):
+    """Render home.html from a prepared context, isolating template time"""
+    from .view_helpers import get_dashboard_context
+    if context.dashboard_context is None:
+        context.dashboard_context = get_dashboard_context(context.request)
+    if not warm:
+        cache.clear()
+    return render_to_string('tracker/home.html', context.dashboard_context, context.request)
+
+
+# (name, callable taking a BenchmarkContext). Each callable must fully
+# evaluate its result so lazy querysets are included in the measurement.
+BENCHMARK_CASES = [
+    ('ExpenseService.get_user_expenses', lambda c: list(ExpenseService.get_user_expenses(c.user)[:25])),
+    ('ExpenseService.apply_filters', lambda c: list(ExpenseService.apply_filters(c.expenses, c.filters)[:25])),
+    ('ExpenseService.get_expense_statistics', lambda c: ExpenseService.get_expense_statistics(c.user)),
+    ('ExpenseService.get_monthly_statistics', lambda c: ExpenseService.get_monthly_statistics(c.user)),
+    ('ExpenseService.get_monthly_trends', lambda c: ExpenseService.get_monthly_trends(c.user)),
+    ('ExpenseService.get_weekly_trends', lambda c: ExpenseService.get_weekly_trends(c.user)),
+    ('ExpenseService.get_daily_trends', lambda c: ExpenseService.get_daily_trends(c.user)),
+    ('ExpenseService.get_category_distribution', lambda c: ExpenseService.get_category_distribution(c.user)),
+    ('ExpenseService.get_top_categories', lambda c: list(ExpenseService.get_top_categories(c.user))),
+    ('ExpenseService.get_recent_expenses', lambda c: list(ExpenseService.get_recent_expenses(c.user))),
+    ('ExpenseService.get_chart_data', lambda c: dict(ExpenseService.get_chart_data(c.user))),
+    ('ExpenseService.get_chart_data (raw expenses)', lambda c: dict(ExpenseService.get_chart_data(c.user, c.expenses))),
+    ('ExpenseService.export_expenses_to_csv', lambda c: ExpenseService.export_expenses_to_csv(c.user)),
+    ('get_dashboard_context', _dashboard_context),
+    ('GET home (cold cache)', lambda c: _home_get(c, warm=False)),
+    ('GET home (warm cache)', lambda c: _home_get(c, warm=True)),
+    ('render home.html (cold cache)', lambda c: _render_home(c, warm=False)),
+    ('render home.html (warm cache)', lambda c: _render_home(c, warm=True)),
+]
+
+# Rows loaded by the row memory cases; their peak memory is also reported per row
+ROW_SAMPLE = 1000
+
+
+def _latest(context):
+    return context.expenses.order_by('-date', '-id')[:ROW_SAMPLE]
+
+
+def _project(projection, queryset):
+    return projection.rows(list(projection.select(queryset.order_by('-date', '-id'))[:ROW_SAMPLE]))
+
+
+# The same rows as model instances, loaded with the columns the list and the
+# export read, and as the projections that replaced them
+ROW_MEMORY_CASES = [
+    ('list rows (Expense instances)', lambda c: list(_latest(c).select_related('category'))),
+    ('list rows (ExpenseRow projection)', lambda c: _project(ExpenseService.LIST_ROW, c.expenses)),
+    ('export rows (Expense instances)', lambda c: list(
+        _latest(c).select_related('category').only(
+            'date', 'category__name', 'amount', 'description', 'created_at', 'updated_at'
+        )
+    )),
+    ('export rows (ExportRow projection)', lambda c: _project(ExpenseService.EXPORT_ROW, c.expenses)),
+]
+ALL_BENCHMARK_CASES = BENCHMARK_CASES + ROW_MEMORY_CASES
+
+# The cold cache cases clear the cache, so they run against a private one
+# rather than the configured (possibly shared) default
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'expensetracker-benchmarks',
+    }
+}
+
+
+def run_benchmarks(user, size, cases=None, repeat=1, track_memory=True):
+    """Measure every benchmark case against ``user``'s expenses, using BENCHMARK_CACHES"""
+    results = []
+    row_memory_cases = {name for name, _ in ROW_MEMORY_CASES}
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        context = BenchmarkContext(user, size)
+        for name, func in cases or ALL_BENCHMARK_CASES:
+            result = measure(lambda: func(context), repeat=repeat, track_memory=track_memory)
+            if name in row_memory_cases and 'peak_memory_kb' in result:
+                result['bytes_per_row'] = round(result['peak_memory_kb'] * 1024 / min(size, ROW_SAMPLE))
+            results.append({'size': size, 'benchmark': name, **result})
+    return results
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty sequence"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize_latencies(name, concurrency, latencies, elapsed):
+    """p50/p99 latency and throughput of one load run"""
+    return {
+        'benchmark': name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+def _split(total, parts):
+    return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+
+def _check(response, url):
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} returned {response.status_code}')
+
+
+def run_wsgi_load(user, url, concurrency, requests):
+    """GET ``url`` ``requests`` times from ``concurrency`` threads through the WSGI handler
+
+    Returns (latencies in seconds, elapsed seconds). Each thread uses its own
+    database connection, so the user's data must be committed.
+    """
+    clients = [Client() for _ in range(concurrency)]
+    for client in clients:
+        client.force_login(user)
+
+    def worker(client, count):
+        latencies = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - started)
+                _check(response, url)
+        finally:
+            connection.close()
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        chunks = list(pool.map(worker, clients, _split(requests, concurrency)))
+    return [latency for chunk in chunks for latency in chunk], time.perf_counter() - started
+
+
+def run_asgi_load(user, url, concurrency, requests):
+    """GET ``url`` ``requests`` times from ``concurrency`` coroutines through the ASGI handler
+
+    Same return value as run_wsgi_load. The requests share one event loop,
+    like the workers of an ASGI server process.
+    """
+    clients = [AsyncClient() for _ in range(concurrency)]
+    for client in clients:
+        client.force_login(user)
+
+    async def worker(client, count):
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            _check(response, url)
+        return latencies
+
+    async def run():
+        try:
+            return await asyncio.gather(*map(worker, clients, _split(requests, concurrency)))
+        finally:
+            await sync_to_async(connections.close_all)()
+
+    started = time.perf_counter()
+    chunks = asyncio.run(run())
+    return [latency for chunk in chunks for latency in chunk], time.perf_counter() - started
+
+
+def run_connection_load(user, url, concurrency, requests):
+    """GET ``url`` through the WSGI handler and count the database connections opened
+
+    The handler is called directly instead of through the test Client, which
+    turns off the closing of connections at the end of each request, so
+    connections are kept or closed exactly as under a WSGI server. Returns
+    (latencies in seconds, elapsed seconds, connections opened, failed
+    requests). In pool mode a connection counts each time it is borrowed.
+    """
+    client = Client()
+    client.force_login(user)
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    opened = []
+
+    def count_connection(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    def worker(count):
+        latencies, errors = [], 0
+        try:
+            for _ in range(count):
+                environ = factory.get(url, HTTP_COOKIE=cookie).environ
+                started = time.perf_counter()
+                response = handler(environ, start_response)
+                b''.join(response)
+                response.close()
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+        finally:
+            connection.close()
+        return latencies, errors
+
+    connection_created.connect(count_connection)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            chunks = list(pool.map(worker, _split(requests, concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        connection_created.disconnect(count_connection)
+    latencies = [latency for chunk, _ in chunks for latency in chunk]
+    return latencies, elapsed, len(opened), sum(errors for _, errors in chunks)
+
+
+def _query_kind(sql):
+    tables = {
+        'session': Session._meta.db_table,
+        'user': get_user_model()._meta.db_table,
+    }
+    for kind, table in tables.items():
+        if f'"{table}"' in sql:
+            write = sql.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+            return f'{kind}_writes' if write else f'{kind}_reads'
+    return 'other'
+
+
+def measure_request_queries(user, url, requests):
+    """Queries per GET ``url`` of a logged in client, by the table they hit
+
+    Returns the average session reads and writes, user reads and other
+    queries per request, and the mean latency. The first request warms the
+    caches and is not counted.
+    """
+    client = Client()
+    client.force_login(user)
+    _check(client.get(url), url)
+    counts = dict.fromkeys(['session_reads', 'session_writes', 'user_reads', 'user_writes', 'other'], 0)
+    elapsed = 0
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed += time.perf_counter() - started
+        _check(response, url)
+        for query in queries.captured_queries:
+            counts[_query_kind(query['sql'])] += 1
+    result = {kind: round(count / requests, 2) for kind, count in counts.items()}
+    result['queries'] = round(sum(counts.values()) / requests, 2)
+    result['mean_ms'] = round(elapsed / requests * 1000, 2)
+    return result
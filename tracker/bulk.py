@@ -0,0 +1,173 @@
+"""
+Actions on many of a user's expenses at once.
+
+Each action changes the selected expenses with a single UPDATE or DELETE
+restricted to the user, so ids of other users' expenses are ignored. The
+daily rollups and monthly totals move by deltas read with one grouped query
+before the write, and the dashboard cache is invalidated once per action
+instead of once per expense. Bulk updates and deletes send no model signals,
+so the search index is kept in sync here.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import DO_NOTHING, Case, Count, DateField, F, Sum, Value, When
+from django.utils import timezone
+
+from .cache import DashboardCache
+from .instrumentation import timed
+from .models import Expense
+from .search import get_search_backend
+from .services import RollupService
+
+
+class BulkExpenseService:
+    """Delete, re-categorize or move the dates of a selection of expenses"""
+
+    @staticmethod
+    def get_selected(user, expense_ids):
+        return Expense.objects.filter(user=user, pk__in=expense_ids)
+
+    @staticmethod
+    def get_groups(expenses):
+        """(category_id, date, total, count) of ``expenses``, the keys their rollups live under"""
+        return list(
+            expenses.order_by().values_list('category_id', 'date').annotate(total=Sum('amount'), count=Count('id'))
+        )
+
+    @staticmethod
+    def move_deltas(groups, move):
+        """Rollup deltas moving each group to the (category_id, date) ``move`` returns, or removing it for None"""
+        deltas = {}
+        for category_id, day, total, count in groups:
+            targets = [((category_id, day), -total, -count)]
+            target = move(category_id, day)
+            if target is not None:
+                targets.append((target, total, count))
+            for key, amount, number in targets:
+                old_amount, old_count = deltas.get(key, (0, 0))
+                deltas[key] = (old_amount + amount, old_count + number)
+        return deltas
+
+    @staticmethod
+    def update_derived_data(user, groups, move):
+        RollupService.apply_deltas(user.pk, BulkExpenseService.move_deltas(groups, move))
+        DashboardCache.invalidate(user.pk)
+
+    @staticmethod
+    def can_delete_directly():
+        """Whether deleting expenses leaves nothing for Django's deletion collector to do
+
+        True while no model cascades from, protects or points a nullable key
+        at Expense. A relation that needs any of these makes delete fall back
+        to QuerySet.delete.
+        """
+        return all(relation.on_delete is DO_NOTHING for relation in Expense._meta.related_objects)
+
+    @staticmethod
+    def delete_rows(user, expense_ids, using):
+        """DELETE the user's expenses in ``expense_ids`` with one statement; returns the row count
+
+        QuerySet.delete would load every row to send post_delete to the
+        search index and dashboard receivers one by one, which delete
+        already takes care of for the whole selection.
+        """
+        quote = connections[using].ops.quote_name
+        placeholders = ', '.join(['%s'] * len(expense_ids))
+        sql = (
+            f"DELETE FROM {quote(Expense._meta.db_table)} "
+            f"WHERE {quote(Expense._meta.get_field('user').column)} = %s "
+            f"AND {quote(Expense._meta.pk.column)} IN ({placeholders})"
+        )
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, [user.pk, *expense_ids])
+            return cursor.rowcount
+
+    @staticmethod
+    @timed
+    def delete(user, expense_ids):
+        """Delete the user's expenses in ``expense_ids``; returns how many were deleted"""
+        with transaction.atomic():
+            expenses = BulkExpenseService.get_selected(user, expense_ids)
+            groups = BulkExpenseService.get_groups(expenses)
+            if not groups:
+                return 0
+            get_search_backend().remove_queryset(expenses)
+            if BulkExpenseService.can_delete_directly():
+                deleted = BulkExpenseService.delete_rows(user, expense_ids, expenses.db)
+            else:
+                deleted = expenses.delete()[1].get(Expense._meta.label, 0)
+            BulkExpenseService.update_derived_data(user, groups, lambda category_id, day: None)
+        return deleted
+
+    @staticmethod
+    @timed
+    def recategorize(user, expense_ids, category):
+        """Move the user's expenses in ``expense_ids`` to ``category``; returns how many changed"""
+        with transaction.atomic():
+            expenses = BulkExpenseService.get_selected(user, expense_ids).exclude(category=category)
+            groups = BulkExpenseService.get_groups(expenses)
+            if not groups:
+                return 0
+            updated = expenses.update(category=category, updated_at=timezone.now())
+            # The category name is indexed with each expense
+            get_search_backend().index_queryset(
+                BulkExpenseService.get_selected(user, expense_ids).filter(category=category)
+            )
+            BulkExpenseService.update_derived_data(user, groups, lambda category_id, day: (category.pk, day))
+        return updated
+
+    @staticmethod
+    @timed
+    def shift_dates(user, expense_ids, days):
+        """Move the dates of the user's expenses in ``expense_ids`` by ``days``; returns how many changed
+
+        Raises IntegrityError, leaving everything unchanged, if a recurring
+        expense would land on a date its rule already has an expense on.
+        """
+        shift = timedelta(days=days)
+        with transaction.atomic():
+            expenses = BulkExpenseService.get_selected(user, expense_ids)
+            groups = BulkExpenseService.get_groups(expenses) if days else []
+            if not groups:
+                return 0
+            # One CASE over the selection's distinct dates keeps this a single
+            # portable UPDATE; date arithmetic differs between databases
+            new_date = Case(
+                *[When(date=day, then=Value(day + shift)) for day in sorted({group[1] for group in groups})],
+                default=F('date'), output_field=DateField()
+            )
+            occurrences = list(expenses.filter(recurring_expense__isnull=False).values_list(
+                'pk', 'recurring_expense_id', 'date'
+            ))
+            if occurrences:
+                BulkExpenseService.check_occurrences(occurrences, shift)
+                # The unique (recurring_expense, date) constraint is checked
+                # row by row, so shifting a run of consecutive occurrences
+                # would collide with itself halfway through the UPDATE
+                Expense.objects.filter(pk__in=[pk for pk, _, _ in occurrences]).update(recurring_expense=None)
+            updated = expenses.update(date=new_date, updated_at=timezone.now())
+            if occurrences:
+                rule_ids = {}
+                for pk, rule_id, _ in occurrences:
+                    rule_ids.setdefault(rule_id, []).append(pk)
+                Expense.objects.filter(pk__in=[pk for pk, _, _ in occurrences]).update(recurring_expense=Case(
+                    *[When(pk__in=pks, then=Value(rule_id)) for rule_id, pks in rule_ids.items()]
+                ))
+            BulkExpenseService.update_derived_data(user, groups, lambda category_id, day: (category_id, day + shift))
+        return updated
+
+    @staticmethod
+    def check_occurrences(occurrences, shift):
+        """Raise IntegrityError if a shifted (pk, rule id, date) occurrence lands on another of its rule's dates
+
+        Occurrences in the selection move together and never meet, so only
+        the rule's expenses outside it are compared.
+        """
+        shifted = {(rule_id, day + shift) for _, rule_id, day in occurrences}
+        collisions = Expense.objects.filter(
+            recurring_expense_id__in={rule_id for rule_id, _ in shifted},
+            date__in={day for _, day in shifted}
+        ).exclude(pk__in=[pk for pk, _, _ in occurrences]).values_list('recurring_expense_id', 'date')
+        if shifted.intersection(collisions):
+            raise IntegrityError('A recurring expense would fall on a date its rule already has an expense on')
@@ -0,0 +1,232 @@
+"""
+Per-user caching of dashboard statistics.
+
+Each user has a data version stored in the cache. Every cached result is keyed
+by that version, so bumping it after a write makes all of the user's entries
+unreachable at once and stale data is never served.
+
+That only holds when every process reads the same version, so the cache is
+off unless DASHBOARD_CACHE_ENABLED is set, which it is by default only with
+REDIS_URL. While it is off nothing is cached, and the ETags and immutable
+chart URLs built from the version are not sent either.
+"""
+import hashlib
+import json
+import time
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+from .charts import render_chart
+from .instrumentation import timed
+from .series import LazyChartData
+from .services import BudgetService, ExpenseService, DashboardAggregator
+
+
+class DashboardCache:
+    """Cache for the per-user dashboard statistics and chart data"""
+
+    KEY_PREFIX = 'tracker'
+
+    # Filters that change the statistics; sorting only affects the list
+    SIGNATURE_FIELDS = ('date_from', 'date_to', 'category', 'amount_min', 'amount_max', 'search')
+
+    @staticmethod
+    def is_enabled():
+        """Whether results are cached and versions may be shown to clients"""
+        return getattr(settings, 'DASHBOARD_CACHE_ENABLED', False)
+
+    @staticmethod
+    def _version_key(user_id):
+        return f'{DashboardCache.KEY_PREFIX}:data-version:{user_id}'
+
+    @staticmethod
+    def get_version(user_id):
+        """Get the user's current data version, initialising it if missing"""
+        key = DashboardCache._version_key(user_id)
+        version = cache.get(key)
+        if version is None:
+            # Seed from the clock so a version that fell out of the cache never
+            # comes back lower than one that was used before
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    async def aget_version(user_id):
+        """Async get_version"""
+        key = DashboardCache._version_key(user_id)
+        version = await cache.aget(key)
+        if version is None:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            version = await cache.aget(key)
+        return version
+
+    @staticmethod
+    def _last_write_key(user_id):
+        return f'{DashboardCache.KEY_PREFIX}:last-write:{user_id}'
+
+    @staticmethod
+    def bump_version(user_id):
+        """Invalidate every cached entry of a user"""
+        cache.set(DashboardCache._last_write_key(user_id), time.time(), timeout=None)
+        key = DashboardCache._version_key(user_id)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            version = time.time_ns()
+            cache.set(key, version, timeout=None)
+            return version
+
+    @staticmethod
+    def get_last_write(user_id):
+        """Time of the user's last write as an aware datetime
+
+        When the timestamp fell out of the cache the current time is stored,
+        which can only make clients revalidate once more than needed.
+        """
+        key = DashboardCache._last_write_key(user_id)
+        timestamp = cache.get(key)
+        if timestamp is None:
+            cache.add(key, time.time(), timeout=None)
+            timestamp = cache.get(key)
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+    @staticmethod
+    def invalidate(user_id):
+        """Bump the user's version now and again once the current transaction commits"""
+        DashboardCache.bump_version(user_id)
+        # A request running between the write and the commit can still cache
+        # the old rows under the new version; the second bump discards it
+        transaction.on_commit(lambda: DashboardCache.bump_version(user_id))
+
+    @staticmethod
+    def filter_signature(filters):
+        """Stable short hash of the filters that affect the statistics"""
+        normalized = {}
+        for field in DashboardCache.SIGNATURE_FIELDS:
+            value = (filters or {}).get(field)
+            if value in (None, ''):
+                continue
+            if isinstance(value, models.Model):
+                value = value.pk
+            elif isinstance(value, date):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value.normalize())
+            normalized[field] = value
+        payload = json.dumps(normalized, sort_keys=True, default=str)
+        return hashlib.md5(payload.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def make_key(user_id, name, filters=None, version=None):
+        """Build the cache key for one cached result of a user"""
+        if version is None:
+            version = DashboardCache.get_version(user_id)
+        # Trends and the monthly comparison are relative to today
+        today = timezone.localdate().isoformat()
+        return ':'.join([
+            DashboardCache.KEY_PREFIX, name, str(user_id), str(version),
+            today, DashboardCache.filter_signature(filters)
+        ])
+
+    @staticmethod
+    @timed
+    def get_or_compute(user, name, filters, compute):
+        """Return the cached result for ``name`` or compute and store it"""
+        if not DashboardCache.is_enabled():
+            return compute()
+        key = DashboardCache.make_key(user.pk, name, filters)
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+        return result
+
+    @staticmethod
+    async def aget_or_compute(user, name, filters, acompute):
+        """Async get_or_compute; ``acompute`` is a coroutine function"""
+        if not DashboardCache.is_enabled():
+            return await acompute()
+        key = DashboardCache.make_key(user.pk, name, filters, await DashboardCache.aget_version(user.pk))
+        result = await cache.aget(key)
+        if result is None:
+            result = await acompute()
+            await cache.aset(key, result, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+        return result
+
+    @staticmethod
+    def _filtered_expenses(user, filters):
+        return ExpenseService.get_statistics_source(user, filters) if filters else None
+
+    @staticmethod
+    def get_expense_statistics(user, filters=None):
+        """Cached ExpenseService.get_expense_statistics"""
+        return DashboardCache.get_or_compute(user, 'statistics', filters, lambda: (
+            ExpenseService.get_expense_statistics(user, DashboardCache._filtered_expenses(user, filters))
+        ))
+
+    @staticmethod
+    def get_chart_data(user, filters=None, series=None):
+        """LazyChartData of ``series`` (all by default) read through get_chart_series"""
+        return LazyChartData(
+            lambda name: DashboardCache.get_chart_series(user, name, filters),
+            ExpenseService.CHART_SERIES if series is None else series
+        )
+
+    @staticmethod
+    def get_chart_series(user, series, filters=None):
+        """Cached ExpenseService.get_chart_series"""
+        return DashboardCache.get_or_compute(user, f'chart-{series}', filters, lambda: (
+            ExpenseService.get_chart_series(user, series, DashboardCache._filtered_expenses(user, filters))
+        ))
+
+    @staticmethod
+    def get_chart_svg(user, series, filters=None):
+        """Cached SVG rendering of one chart series"""
+        return DashboardCache.get_or_compute(user, f'chart-svg-{series}', filters, lambda: (
+            render_chart(series, DashboardCache.get_chart_series(user, series, filters))
+        ))
+
+    @staticmethod
+    def get_monthly_statistics(user):
+        """Cached ExpenseService.get_monthly_statistics"""
+        return DashboardCache.get_or_compute(user, 'monthly', None, lambda: (
+            ExpenseService.get_monthly_statistics(user)
+        ))
+
+    @staticmethod
+    def get_budget_status(user):
+        """Cached BudgetService.get_budget_status for the current month"""
+        return DashboardCache.get_or_compute(user, 'budgets', None, lambda: (
+            BudgetService.get_budget_status(user)
+        ))
+
+    @staticmethod
+    async def aget_budget_status(user):
+        """Async get_budget_status"""
+        return await DashboardCache.aget_or_compute(user, 'budgets', None, lambda: (
+            BudgetService.aget_budget_status(user)
+        ))
+
+    @staticmethod
+    def get_dashboard_aggregates(user, filters=None, expenses=None):
+        """Cached DashboardAggregator result for the dashboard view
+
+        The dashboard's charts are images served by the chart_svg view, so
+        no chart series are built here.
+        """
+        return DashboardCache.get_or_compute(user, 'dashboard', filters, lambda: (
+            DashboardAggregator(user, expenses, filters=filters or {}, charts=()).compute()
+        ))
+
+    @staticmethod
+    async def aget_dashboard_aggregates(user, filters=None, expenses=None):
+        """Async get_dashboard_aggregates, computed with DashboardAggregator.acompute"""
+        return await DashboardCache.aget_or_compute(user, 'dashboard', filters, lambda: (
+            DashboardAggregator(user, expenses, filters=filters or {}, charts=()).acompute()
+        ))
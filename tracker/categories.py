@@ -0,0 +1,129 @@
+"""
+Process-local registry of the expense categories.
+
+Categories are a small table that rarely changes, yet every form, export,
+import and chart needs their names. Each process loads the whole table once
+into a ``CategoryRegistry`` (id -> category, name -> id), tagged with a
+version number stored in the cache. Category writes bump the version through
+the signals in tracker.signals. With a shared cache (REDIS_URL) every process
+sees the bump and reloads the registry on its next use. A per-process cache
+only tells the writing process, so there the registries of the other
+processes also expire CATEGORY_REGISTRY_TTL seconds after loading, and CSV
+imports always reload. This lets the chart and export queries group or read
+``category_id`` and skip the join to the category table.
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from config.caches import is_cache_shared
+
+from .models import ExpenseCategory
+
+VERSION_KEY = 'tracker:category-version'
+
+
+class CategoryRegistry:
+    """Snapshot of the category table; never mutated once built"""
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.categories = {category.pk: category for category in categories}
+        self.names = {category.pk: category.name for category in categories}
+        self.ids = {category.name: category.pk for category in categories}
+        self.choices = sorted(self.names.items(), key=lambda item: item[1])
+        self.loaded_at = time.monotonic()
+
+    def __contains__(self, category_id):
+        return category_id in self.categories
+
+    def get(self, category_id):
+        """A copy of the category with this id, or None; callers may modify it"""
+        category = self.categories.get(category_id)
+        return copy.copy(category) if category is not None else None
+
+
+# Registry of this process; replaced as a whole on reload. The placeholder's
+# version matches no cached one, not even the None of a DummyCache.
+_registry = CategoryRegistry(object(), [])
+
+
+def get_category_version():
+    """Current version of the category table, initialising it if missing"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_category_version():
+    """Async get_category_version"""
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_category_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_categories():
+    """Make processes sharing the cache reload the registry, now and once the write commits"""
+    bump_category_version()
+    # A reload between the write and the commit would not see it yet
+    transaction.on_commit(bump_category_version)
+
+
+def _is_stale(registry, version, category_ids):
+    if registry.version != version or any(pk not in registry for pk in category_ids):
+        return True
+    # Version bumps made by other processes never reach a per-process cache
+    ttl = getattr(settings, 'CATEGORY_REGISTRY_TTL', 30)
+    return not is_cache_shared() and time.monotonic() - registry.loaded_at > ttl
+
+
+def get_category_registry(category_ids=(), reload=False):
+    """The registry of this process, reloaded if the version changed
+
+    Ids in ``category_ids`` that the registry does not know, such as a
+    category another process created just now, force a reload too, as does
+    ``reload``.
+    """
+    global _registry
+    version = get_category_version()
+    if reload or _is_stale(_registry, version, category_ids):
+        _registry = CategoryRegistry(version, list(ExpenseCategory.objects.all()))
+    return _registry
+
+
+async def aget_category_registry(category_ids=()):
+    """Async get_category_registry"""
+    global _registry
+    version = await aget_category_version()
+    if _is_stale(_registry, version, category_ids):
+        _registry = CategoryRegistry(version, [category async for category in ExpenseCategory.objects.all()])
+    return _registry
+
+
+def get_category_choices():
+    """(id, name) of every category, ordered by name"""
+    return get_category_registry().choices
+
+
+def get_category_names(category_ids=()):
+    """id -> name of every category, including those in ``category_ids``"""
+    return get_category_registry(category_ids).names
+
+
+async def aget_category_names(category_ids=()):
+    """Async get_category_names"""
+    return (await aget_category_registry(category_ids)).names
@@ -0,0 +1,194 @@
+"""
+Server-side SVG rendering of the dashboard charts.
+
+The dashboard shows each chart as an ``<img>`` of a standalone SVG document
+built from ExpenseService.get_chart_data, so it needs no JavaScript or
+third-party assets and works offline. Chart URLs carry a token made of the
+user's DashboardCache data version and today's date. Any write and any new day
+therefore produce new URLs, and a response for the current token can be cached
+by the browser for good.
+"""
+import math
+from urllib.parse import urlencode
+
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+WIDTH = 600
+HEIGHT = 300
+FONT = 'font-family="system-ui, -apple-system, Segoe UI, Roboto, sans-serif"'
+
+# Browser cache lifetime of a chart requested with the current token
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+BAR_COLOR = '#36A2EB'
+GRID_COLOR = '#E5E5E5'
+TEXT_COLOR = '#555555'
+
+CHART_TITLES = {
+    'category': 'Category Distribution',
+    'monthly': 'Monthly Spending',
+    'weekly': 'Weekly Spending',
+    'daily': 'Daily Spending',
+}
+
+
+def chart_token(version):
+    """Token identifying the chart contents for a data version, valid today"""
+    return f'{version}-{timezone.localdate().isoformat()}'
+
+
+def parse_chart_selection(value):
+    """Series named by a comma-separated ``?charts=`` value, in CHART_TITLES order
+
+    An empty value selects every chart. Unknown names raise ValueError.
+    """
+    names = {name.strip() for name in (value or '').split(',') if name.strip()}
+    if not names:
+        return list(CHART_TITLES)
+    unknown = names - CHART_TITLES.keys()
+    if unknown:
+        raise ValueError(f"Unknown chart series: {', '.join(sorted(unknown))}")
+    return [series for series in CHART_TITLES if series in names]
+
+
+def get_chart_urls(token, filter_params=None, series=None):
+    """Title, series and versioned URL of the dashboard charts in ``series``, all by default
+
+    ``filter_params`` are the raw query parameters of the list filters, so
+    the charts follow the filtered dashboard.
+    """
+    query = urlencode({**(filter_params or {}), 'v': token})
+    return [
+        {
+            'series': name,
+            'title': title,
+            'url': f"{reverse('chart_svg', args=[name])}?{query}",
+        }
+        for name, title in CHART_TITLES.items()
+        if series is None or name in series
+    ]
+
+
+def format_amount(value):
+    return f'{value:,.2f}'
+
+
+def svg_document(title, body):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" '
+        f'width="{WIDTH}" height="{HEIGHT}" role="img" aria-label="{escape(title)}" {FONT}>'
+        f'<title>{escape(title)}</title>{"".join(body)}</svg>'
+    )
+
+
+def empty_message(title):
+    return svg_document(title, [
+        f'<text x="{WIDTH / 2}" y="{HEIGHT / 2}" text-anchor="middle" font-size="14" '
+        f'fill="{TEXT_COLOR}">No expenses to show</text>'
+    ])
+
+
+def point_on_circle(cx, cy, radius, fraction):
+    """Point at ``fraction`` of a turn clockwise from twelve o'clock"""
+    angle = 2 * math.pi * fraction - math.pi / 2
+    return cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+
+
+def render_pie(data, title=CHART_TITLES['category']):
+    """SVG pie of get_category_distribution data with a legend on the right"""
+    amounts = data['amounts']
+    total = sum(amounts)
+    if total <= 0:
+        return empty_message(title)
+
+    colors = data['colors']
+    cx, cy, radius = HEIGHT / 2, HEIGHT / 2, HEIGHT / 2 - 20
+    body = []
+    # Legend rows that fit; the last one summarizes the rest if there are more
+    legend_rows = (HEIGHT - 20) // 22
+    shown = len(amounts) if len(amounts) <= legend_rows else legend_rows - 1
+    legend_y = max(10, HEIGHT / 2 - 11 * min(len(amounts), legend_rows))
+    start = 0
+    for index, (label, amount) in enumerate(zip(data['labels'], amounts)):
+        color = colors[index % len(colors)]
+        fraction = amount / total
+        tooltip = f'<title>{escape(label)}: {format_amount(amount)} ({fraction:.0%})</title>'
+        if fraction >= 1:
+            body.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{color}">{tooltip}</circle>')
+        elif fraction > 0:
+            x0, y0 = point_on_circle(cx, cy, radius, start)
+            x1, y1 = point_on_circle(cx, cy, radius, start + fraction)
+            large_arc = 1 if fraction > 0.5 else 0
+            body.append(
+                f'<path d="M{cx:.2f},{cy:.2f} L{x0:.2f},{y0:.2f} '
+                f'A{radius},{radius} 0 {large_arc} 1 {x1:.2f},{y1:.2f} Z" '
+                f'fill="{color}" stroke="#FFFFFF" stroke-width="1">{tooltip}</path>'
+            )
+        start += fraction
+
+        if index >= shown:
+            continue
+        y = legend_y + 22 * index
+        body.append(f'<rect x="{HEIGHT + 10}" y="{y}" width="14" height="14" fill="{color}"/>')
+        body.append(
+            f'<text x="{HEIGHT + 32}" y="{y + 11}" font-size="12" fill="{TEXT_COLOR}">'
+            f'{escape(label)} ({fraction:.0%})</text>'
+        )
+    if shown < len(amounts):
+        body.append(
+            f'<text x="{HEIGHT + 10}" y="{legend_y + 22 * shown + 11}" font-size="12" fill="{TEXT_COLOR}">'
+            f'and {len(amounts) - shown} more</text>'
+        )
+    return svg_document(title, body)
+
+
+def render_bars(labels, values, title):
+    """SVG bar chart with a labelled y axis; x labels are thinned to fit"""
+    if not values or max(values) <= 0:
+        return empty_message(title)
+
+    left, right, top, bottom = 70, 10, 15, 40
+    plot_width = WIDTH - left - right
+    plot_height = HEIGHT - top - bottom
+    peak = max(values)
+    slot = plot_width / len(values)
+    bar_width = max(slot * 0.7, 1)
+    # Roughly 6.5px per character at font-size 11
+    longest = max(len(label) for label in labels)
+    label_every = max(1, math.ceil(len(labels) * longest * 6.5 / plot_width))
+    body = []
+
+    for step in range(5):
+        value = peak * step / 4
+        y = top + plot_height - plot_height * step / 4
+        body.append(f'<line x1="{left}" y1="{y:.2f}" x2="{WIDTH - right}" y2="{y:.2f}" stroke="{GRID_COLOR}"/>')
+        body.append(
+            f'<text x="{left - 6}" y="{y + 4:.2f}" text-anchor="end" font-size="11" '
+            f'fill="{TEXT_COLOR}">{format_amount(value)}</text>'
+        )
+
+    for index, (label, value) in enumerate(zip(labels, values)):
+        height = plot_height * value / peak
+        x = left + slot * index + (slot - bar_width) / 2
+        y = top + plot_height - height
+        body.append(
+            f'<rect x="{x:.2f}" y="{y:.2f}" width="{bar_width:.2f}" height="{height:.2f}" fill="{BAR_COLOR}">'
+            f'<title>{escape(label)}: {format_amount(value)}</title></rect>'
+        )
+        if index % label_every == 0:
+            body.append(
+                f'<text x="{x + bar_width / 2:.2f}" y="{HEIGHT - bottom + 16}" text-anchor="middle" '
+                f'font-size="11" fill="{TEXT_COLOR}">{escape(label)}</text>'
+            )
+    return svg_document(title, body)
+
+
+def render_chart(series, data):
+    """SVG document for one ExpenseService.CHART_SERIES entry"""
+    title = CHART_TITLES[series]
+    if series == 'category':
+        return render_pie(data, title)
+    values = data['data'] if series == 'monthly' else data['amounts']
+    return render_bars(data['labels'], values, title)
@@ -1,12 +1,64 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 from django.forms.widgets import DateInput, NumberInput, Select, Textarea
 from django.utils import timezone
-from .models import Expense, ExpenseCategory
+from .categories import get_category_choices, get_category_registry
+from .models import Budget, Expense, ExpenseCategory, RecurringExpense
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+    """Category choices read from the process-local registry instead of the queryset"""
+    
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from get_category_choices()
+    
+    def __len__(self):
+        return len(get_category_choices()) + (self.field.empty_label is not None)
+    
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_category_choices())
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """Category select that renders and validates against the category registry
+
+    A per-process registry can still hold a category another process just
+    deleted, so model forms keep the model's own existence check on save.
+    """
+    iterator = CategoryChoiceIterator
+    
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, ExpenseCategory):
+            return value
+        try:
+            category_id = int(value)
+        except (TypeError, ValueError):
+            category_id = None
+        category = get_category_registry([category_id]).get(category_id) if category_id else None
+        if category is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return category
 
 class ExpenseForm(forms.ModelForm):
+    # Only offered for new expenses: turns the expense into a recurring rule
+    repeat = forms.ChoiceField(
+        choices=[('', 'Does not repeat')] + RecurringExpense.FREQUENCY_CHOICES,
+        required=False,
+        widget=Select(attrs={
+            'class': 'form-select',
+        }),
+        label='Repeat'
+    )
+    
     class Meta:
         model = Expense
         fields = ['category', 'amount', 'description', 'date']
+        field_classes = {'category': CategoryChoiceField}
         widgets = {
             'date': DateInput(attrs={
                 'type': 'date',
@@ -37,6 +89,8 @@ class ExpenseForm(forms.ModelForm):
         self.fields['category'].label = 'Category'
         self.fields['amount'].label = 'Amount'
         self.fields['date'].label = 'Date'
+        if self.instance.pk:
+            del self.fields['repeat']
 
 class ExpenseFilterForm(forms.Form):
     """Form for filtering and searching expenses"""
@@ -63,7 +117,7 @@ class ExpenseFilterForm(forms.Form):
     )
     
     # Category filter
-    category = forms.ModelChoiceField(
+    category = CategoryChoiceField(
         queryset=ExpenseCategory.objects.all(),
         required=False,
         empty_label="All Categories",
@@ -119,6 +173,7 @@ class ExpenseFilterForm(forms.Form):
         ('amount', 'Amount (Lowest First)'),
         ('category__name', 'Category (A-Z)'),
         ('-category__name', 'Category (Z-A)'),
+        ('-search_rank', 'Relevance (when searching)'),
     ]
     
     sort_by = forms.ChoiceField(
@@ -147,3 +202,119 @@ class ExpenseFilterForm(forms.Form):
             raise forms.ValidationError("Minimum amount cannot be greater than maximum amount.")
         
         return cleaned_data
+
+class ExpenseImportForm(forms.Form):
+    """Form for uploading a CSV file of expenses"""
+    
+    csv_file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control form-control-sm',
+            'accept': '.csv,text/csv'
+        }),
+        label='CSV File'
+    )
+
+class BudgetForm(forms.ModelForm):
+    """Form for setting the monthly budget of a category"""
+    
+    class Meta:
+        model = Budget
+        fields = ['category', 'monthly_limit']
+        field_classes = {'category': CategoryChoiceField}
+        widgets = {
+            'category': Select(attrs={
+                'class': 'form-select form-select-sm',
+            }),
+            'monthly_limit': NumberInput(attrs={
+                'class': 'form-control form-control-sm',
+                'step': '0.01',
+                'min': '0',
+                'placeholder': 'Monthly limit',
+            }),
+        }
+        labels = {
+            'monthly_limit': 'Monthly Limit',
+        }
+    
+    def clean_monthly_limit(self):
+        monthly_limit = self.cleaned_data['monthly_limit']
+        if monthly_limit < 0:
+            raise forms.ValidationError("The monthly limit cannot be negative.")
+        return monthly_limit
+
+class ExpenseIdsField(forms.Field):
+    """Ids of the expenses ticked in the list, as a sorted list of ints"""
+    widget = forms.MultipleHiddenInput
+    
+    def __init__(self, *, max_ids=None, **kwargs):
+        self.max_ids = max_ids
+        super().__init__(**kwargs)
+    
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            ids = sorted({int(item) for item in value})
+        except (TypeError, ValueError):
+            raise ValidationError("Invalid expense selection.", code='invalid')
+        if self.max_ids is not None and len(ids) > self.max_ids:
+            raise ValidationError(f"Select at most {self.max_ids} expenses at a time.", code='max_ids')
+        return ids
+
+class BulkExpenseForm(forms.Form):
+    """Form for applying one action to the expenses selected in the list"""
+    
+    DELETE = 'delete'
+    RECATEGORIZE = 'recategorize'
+    SHIFT_DATES = 'shift_dates'
+    ACTION_CHOICES = [
+        (DELETE, 'Delete selected'),
+        (RECATEGORIZE, 'Change category'),
+        (SHIFT_DATES, 'Shift dates by days'),
+    ]
+    
+    # Keeps the IN (...) list and the date CASE of one statement small
+    MAX_EXPENSES = 500
+    
+    expense_ids = ExpenseIdsField(max_ids=MAX_EXPENSES, error_messages={'required': 'Select at least one expense.'})
+    
+    bulk_action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        widget=Select(attrs={
+            'class': 'form-select form-select-sm',
+        }),
+        label='With selected'
+    )
+    
+    category = CategoryChoiceField(
+        queryset=ExpenseCategory.objects.all(),
+        required=False,
+        empty_label='New category',
+        widget=Select(attrs={
+            'class': 'form-select form-select-sm',
+        }),
+        label='Category'
+    )
+    
+    days = forms.IntegerField(
+        required=False,
+        min_value=-3650,
+        max_value=3650,
+        widget=NumberInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': 'Days (e.g. -1)',
+        }),
+        label='Days'
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('bulk_action')
+        
+        if action == self.RECATEGORIZE and not cleaned_data.get('category'):
+            raise forms.ValidationError("Choose the category to move the expenses to.")
+        
+        if action == self.SHIFT_DATES and not cleaned_data.get('days'):
+            raise forms.ValidationError("Enter a non-zero number of days to shift the dates by.")
+        
+        return cleaned_data
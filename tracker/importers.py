@@ -0,0 +1,185 @@
+"""
+Bulk import of expenses from CSV uploads.
+"""
+import codecs
+import csv
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .cache import DashboardCache
+from .categories import get_category_registry
+from .instrumentation import timed
+from .models import Expense
+from .search import get_search_backend
+from .services import RollupService
+from .utils import ExpenseUtils
+
+
+class ExpenseImportService:
+    """Import expenses from the CSV format written by ExpenseService.iter_expenses_csv"""
+
+    REQUIRED_COLUMNS = ('Date', 'Category', 'Amount')
+
+    @staticmethod
+    def get_category_lookup():
+        """Map category names to ids from a freshly loaded category registry
+
+        Names are looked up rather than ids, so a category created by another
+        process would not force a reload; one query per import settles it.
+        """
+        return get_category_registry(reload=True).ids
+
+    @staticmethod
+    def parse_row(row, columns, categories):
+        """Return (category_id, date, amount, description) or raise ValueError"""
+        try:
+            raw_date = row[columns['Date']].strip()
+            raw_category = row[columns['Category']].strip()
+            raw_amount = row[columns['Amount']].strip()
+        except IndexError:
+            raise ValueError("Missing columns")
+
+        try:
+            expense_date = date.fromisoformat(raw_date)
+        except ValueError:
+            raise ValueError(f"Invalid date '{raw_date}', expected YYYY-MM-DD")
+
+        category_id = categories.get(raw_category)
+        if category_id is None:
+            raise ValueError(f"Unknown category '{raw_category}'")
+
+        is_valid, error = ExpenseUtils.validate_expense_amount(raw_amount)
+        if not is_valid:
+            raise ValueError(error)
+        amount = Decimal(raw_amount)
+        if amount.as_tuple().exponent < -2:
+            raise ValueError("Amount must have at most 2 decimal places")
+
+        description = ''
+        if 'Description' in columns and columns['Description'] < len(row):
+            description = row[columns['Description']]
+
+        return category_id, expense_date, amount, description or None
+
+    @staticmethod
+    def decode_lines(lines, invalid_lines):
+        """Decode the lines of an upload as UTF-8
+
+        Lines that are not valid UTF-8, like those of a Latin-1 or cp1252
+        bank export, are decoded with replacement characters and their
+        numbers are added to ``invalid_lines``, so the rows can be reported
+        instead of failing the whole import.
+        """
+        for number, line in enumerate(lines, start=1):
+            if number == 1:
+                line = line.removeprefix(codecs.BOM_UTF8)
+            try:
+                yield line.decode('utf-8')
+            except UnicodeDecodeError:
+                invalid_lines.add(number)
+                yield line.decode('utf-8', errors='replace')
+
+    @staticmethod
+    def iter_rows(reader, invalid_lines, errors):
+        """(line number, row) of the remaining records of ``reader``
+
+        Records on lines that were not valid UTF-8 or that the csv module
+        cannot parse are added to ``errors`` and skipped.
+        """
+        previous = reader.line_num
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as error:
+                errors.append((reader.line_num, f"Unreadable CSV line: {error}"))
+                if reader.line_num == previous:
+                    return
+            else:
+                if invalid_lines.intersection(range(previous + 1, reader.line_num + 1)):
+                    errors.append((reader.line_num, "Not valid UTF-8 text; save the file as UTF-8 CSV"))
+                else:
+                    yield reader.line_num, row
+            previous = reader.line_num
+
+    @staticmethod
+    @timed
+    def import_csv(user, csv_file, batch_size=None):
+        """Import expenses for ``user`` from an uploaded CSV file
+
+        The file is decoded and parsed row by row, valid rows are inserted in
+        batches of ``batch_size`` inside one transaction, and the rollup and
+        cache are updated once at the end. Returns a report with the number of
+        created expenses and a list of (line number, message) errors for the
+        rows that were skipped.
+        """
+        batch_size = batch_size or getattr(settings, 'EXPENSE_IMPORT_BATCH_SIZE', 2000)
+        invalid_lines = set()
+        reader = csv.reader(ExpenseImportService.decode_lines(csv_file, invalid_lines))
+        report = {'created': 0, 'errors': []}
+
+        try:
+            header = next(reader, None)
+        except csv.Error as error:
+            report['errors'].append((1, f"Unreadable CSV header: {error}"))
+            return report
+        if header is None:
+            report['errors'].append((1, "The file is empty"))
+            return report
+        if invalid_lines:
+            report['errors'].append((1, "The header is not valid UTF-8 text; save the file as UTF-8 CSV"))
+            return report
+        columns = {name.strip(): index for index, name in enumerate(header)}
+        missing = [name for name in ExpenseImportService.REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            report['errors'].append((1, f"Missing required columns: {', '.join(missing)}"))
+            return report
+
+        categories = ExpenseImportService.get_category_lookup()
+        user_id = user.pk
+        deltas = {}
+        batch = []
+
+        with transaction.atomic():
+            # Rows above this id are the imported ones, for the search index
+            last_id = Expense.objects.filter(user_id=user_id).aggregate(last_id=Max('id'))['last_id'] or 0
+            rows = ExpenseImportService.iter_rows(reader, invalid_lines, report['errors'])
+            for line_number, row in rows:
+                if not row or not any(row):
+                    continue
+                try:
+                    category_id, expense_date, amount, description = ExpenseImportService.parse_row(
+                        row, columns, categories
+                    )
+                except ValueError as error:
+                    report['errors'].append((line_number, str(error)))
+                    continue
+
+                batch.append(Expense(
+                    user_id=user_id, category_id=category_id, amount=amount, description=description,
+                    date=expense_date
+                ))
+                total, count = deltas.get((category_id, expense_date), (0, 0))
+                deltas[(category_id, expense_date)] = (total + amount, count + 1)
+
+                if len(batch) >= batch_size:
+                    Expense.objects.bulk_create(batch, batch_size=batch_size)
+                    report['created'] += len(batch)
+                    batch = []
+
+            if batch:
+                Expense.objects.bulk_create(batch, batch_size=batch_size)
+                report['created'] += len(batch)
+
+            # Batched inserts skip model signals, so update the derived data explicitly
+            RollupService.apply_deltas(user_id, deltas)
+            if report['created']:
+                get_search_backend().index_queryset(Expense.objects.filter(user_id=user_id, id__gt=last_id))
+                DashboardCache.invalidate(user_id)
+
+        return report
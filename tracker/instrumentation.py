@@ -0,0 +1,188 @@
+"""
+Per-request timing of SQL queries, service methods and template rendering.
+
+RequestTimingMiddleware collects the timings of the current request in a
+context variable; the ``timed`` decorator and ``timed_section`` context manager
+add to it. Outside an instrumented request both are a single context variable
+lookup, and with TRACKER_TIMING_ENABLED off the middleware removes itself from
+the chain.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('tracker.timing')
+
+_current_timings = contextvars.ContextVar('tracker_request_timings', default=None)
+
+
+class RequestTimings:
+    """Timings collected while handling one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.sections = {}
+
+    def add(self, name, elapsed):
+        total, calls = self.sections.get(name, (0.0, 0))
+        self.sections[name] = (total + elapsed, calls + 1)
+
+    def add_query(self, elapsed):
+        self.db_time += elapsed
+        self.queries += 1
+
+    def server_timing_header(self, total):
+        """Format the timings as a Server-Timing header value"""
+        metrics = [
+            f'total;dur={total * 1000:.2f}',
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.2f}',
+        ]
+        for name, (elapsed, calls) in self.sections.items():
+            token = re.sub(r'[^A-Za-z0-9_.-]', '-', name)
+            metrics.append(f'{token};desc="{calls} calls";dur={elapsed * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_dict(self, total):
+        return {
+            'total_ms': round(total * 1000, 2),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'sections': {
+                name: {'ms': round(elapsed * 1000, 2), 'calls': calls}
+                for name, (elapsed, calls) in self.sections.items()
+            },
+        }
+
+
+def timed(func):
+    """Record the time spent in ``func`` for the current instrumented request"""
+    name = func.__qualname__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            timings = _current_timings.get()
+            if timings is None:
+                return await func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timings.add(name, time.perf_counter() - started)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        timings = _current_timings.get()
+        if timings is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.add(name, time.perf_counter() - started)
+
+    return wrapper
+
+
+@contextmanager
+def timed_section(name):
+    """Record the time spent in a block, e.g. template rendering"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook counting queries for the current request
+
+    The timings are looked up per query, so one installed wrapper serves every
+    request that shares the connection's thread.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def install_query_recorder():
+    """Install record_query on this thread's connection for good
+
+    Installing it once instead of per request keeps sync and async requests
+    handled on the same thread from counting their queries twice.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestTimingMiddleware:
+    """Expose per-request query and timing data as Server-Timing and a log line"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TRACKER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_query_recorder()
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        # Async views run their queries in sync_to_async's thread, which has
+        # its own connection; the context variable follows them there
+        await sync_to_async(install_query_recorder)()
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    def finish(self, request, response, timings, total):
+        response['Server-Timing'] = timings.server_timing_header(total)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings.as_dict(total),
+        }))
+        return response
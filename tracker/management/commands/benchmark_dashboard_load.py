@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from tracker.benchmarks import (
+    create_benchmark_user, get_benchmark_categories, run_asgi_load, run_wsgi_load, seed_expenses,
+    summarize_latencies
+)
+
+DUMMY_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare p50/p99 latency of the synchronous dashboard served through WSGI '
+        'with the async dashboard served through ASGI under concurrent load'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Expenses to seed (default: 10000)')
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help='Comma separated numbers of concurrent clients (default: 1,8,32)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run (default: 200)')
+        parser.add_argument('--cached', action='store_true',
+                            help='Cache the dashboards in the configured cache instead of computing every one')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma separated list of integers')
+
+        # The load runs on several connections, so the data has to be
+        # committed; the user and everything it owns is deleted afterwards
+        self.stdout.write(f"Seeding {options['rows']} expenses...")
+        user = create_benchmark_user(f"loadtest-{options['rows']}")
+        user.expenses.all().delete()
+        seed_expenses(user, options['rows'], categories=get_benchmark_categories())
+
+        targets = [
+            ('WSGI home', reverse('home'), run_wsgi_load),
+            ('ASGI home_async', reverse('home_async'), run_asgi_load),
+        ]
+        # The threads share this process's cache, so the dashboard cache is
+        # safe to turn on here
+        overrides = {'ALLOWED_HOSTS': ['testserver'], 'DASHBOARD_CACHE_ENABLED': options['cached']}
+        if not options['cached']:
+            overrides['CACHES'] = DUMMY_CACHES
+
+        results = []
+        try:
+            with override_settings(**overrides):
+                for concurrency in levels:
+                    for name, url, run in targets:
+                        run(user, url, 1, 1)  # warm up connections and templates
+                        latencies, elapsed = run(user, url, concurrency, options['requests'])
+                        result = summarize_latencies(name, concurrency, latencies, elapsed)
+                        self.write_result(result)
+                        results.append(result)
+        finally:
+            user.delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'rows': options['rows'], 'results': results}, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+    def write_result(self, result):
+        self.stdout.write(
+            f"{result['benchmark']:<18} x{result['concurrency']:<4} p50 {result['p50_ms']:>9.2f} ms  "
+            f"p99 {result['p99_ms']:>9.2f} ms  max {result['max_ms']:>9.2f} ms  "
+            f"{result['throughput_rps']:>7.1f} req/s"
+        )
@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from config.sessions import SESSION_PROFILES, get_session_profile
+from tracker.benchmarks import (
+    create_benchmark_user, get_benchmark_categories, measure_request_queries, seed_expenses
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Count the session, user and other queries of an authenticated request '
+        'with each session profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(SESSION_PROFILES),
+                            help=f"Comma separated session profiles (default: {','.join(SESSION_PROFILES)})")
+        parser.add_argument('--rows', type=int, default=1000, help='Expenses to seed (default: 1000)')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per profile (default: 50)')
+        parser.add_argument('--url', help='Path to request (default: the dashboard)')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        unknown = [profile for profile in profiles if profile not in SESSION_PROFILES]
+        if unknown:
+            raise CommandError(f"Unknown session profiles: {', '.join(unknown)}")
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+
+        self.stdout.write(f"Seeding {options['rows']} expenses...")
+        user = create_benchmark_user(f"sessiontest-{options['rows']}")
+        user.expenses.all().delete()
+        seed_expenses(user, options['rows'], categories=get_benchmark_categories())
+        url = options['url'] or reverse('home')
+
+        results = []
+        try:
+            for profile in profiles:
+                with override_settings(ALLOWED_HOSTS=['testserver'], **get_session_profile(profile)):
+                    result = {'profile': profile, **measure_request_queries(user, url, options['requests'])}
+                self.write_result(result)
+                results.append(result)
+        finally:
+            user.delete()
+
+        if results and results[0]['profile'] == 'db':
+            for result in results[1:]:
+                saved = results[0]['queries'] - result['queries']
+                self.stdout.write(f"{result['profile']} saves {saved:.2f} queries per request over db")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'url': url, 'results': results}, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+    def write_result(self, result):
+        self.stdout.write(
+            f"{result['profile']:<7} {result['queries']:>6.2f} queries/request  "
+            f"session {result['session_reads']:.2f} read {result['session_writes']:.2f} write  "
+            f"user {result['user_reads']:.2f}  other {result['other']:.2f}  mean {result['mean_ms']:>8.2f} ms"
+        )
@@ -0,0 +1,107 @@
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from tracker.benchmarks import (
+    ALL_BENCHMARK_CASES, create_benchmark_user, get_benchmark_categories, run_benchmarks, seed_expenses
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic expenses at several sizes and record wall time, query '
+        'count and peak memory of the ExpenseService methods and the dashboard'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,100000,1000000',
+                            help='Comma separated numbers of expenses to seed (default: 1000,100000,1000000)')
+        parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results')
+        parser.add_argument('--compare', help='Earlier results file to print a comparison against')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case; the fastest is kept')
+        parser.add_argument('--only', help='Only run cases whose name contains this text')
+        parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak memory run')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers')
+
+        cases = [case for case in ALL_BENCHMARK_CASES if not options['only'] or options['only'] in case[0]]
+        results = []
+
+        # One process, so the per-process cache can measure warm dashboards
+        with override_settings(ALLOWED_HOSTS=['testserver'], DASHBOARD_CACHE_ENABLED=True):
+            for size in sizes:
+                self.stdout.write(f'Seeding {size} expenses...')
+                # Everything happens in a transaction that is rolled back so the
+                # database is left as it was
+                with transaction.atomic():
+                    user = create_benchmark_user(f'benchmark-{size}')
+                    seed_expenses(user, size, categories=get_benchmark_categories())
+                    size_results = run_benchmarks(
+                        user, size, cases=cases, repeat=options['repeat'], track_memory=not options['no_memory']
+                    )
+                    transaction.set_rollback(True)
+                for result in size_results:
+                    self.write_result(result)
+                results.extend(size_results)
+
+        report = {'meta': self.get_meta(sizes), 'results': results}
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def write_result(self, result):
+        memory = result.get('peak_memory_kb')
+        memory = f'{memory:>10.1f} KiB' if memory is not None else ''
+        if 'bytes_per_row' in result:
+            memory += f" ({result['bytes_per_row']} B/row)"
+        self.stdout.write(
+            f"{result['size']:>9} {result['benchmark']:<48} {result['wall_ms']:>10.2f} ms "
+            f"{result['queries']:>4} queries {memory}"
+        )
+
+    def get_meta(self, sizes):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'sizes': sizes,
+        }
+
+    def compare(self, path, results):
+        with open(path) as previous_file:
+            previous = {
+                (result['size'], result['benchmark']): result
+                for result in json.load(previous_file)['results']
+            }
+
+        self.stdout.write(f'Comparison with {path}:')
+        for result in results:
+            before = previous.get((result['size'], result['benchmark']))
+            if not before:
+                continue
+            ratio = result['wall_ms'] / before['wall_ms'] if before['wall_ms'] else 0
+            self.stdout.write(
+                f"{result['size']:>9} {result['benchmark']:<48} {before['wall_ms']:>10.2f} -> "
+                f"{result['wall_ms']:>10.2f} ms ({ratio:.2f}x) queries {before['queries']} -> {result['queries']}"
+            )
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from tracker.benchmarks import create_benchmark_user, get_benchmark_categories, seed_expenses
+from tracker.forms import ExpenseFilterForm
+from tracker.pagination import ExpenseCursorPaginator
+from tracker.services import ExpenseService, DashboardAggregator
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the expense list query for every sort key and filter '
+        'combination and report any full scan of the expense table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Synthetic expenses to seed per user')
+        parser.add_argument('--users', type=int, default=5, help='Users to spread the synthetic expenses over')
+        parser.add_argument('--page-size', type=int, default=25)
+        parser.add_argument('--strict', action='store_true', help='Exit with an error if any full scan is found')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every query plan in full')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        self.stdout.write(f'Explaining expense queries on {vendor}')
+
+        # Seed inside a transaction that is rolled back, so the command can be
+        # pointed at any database without leaving data behind
+        with transaction.atomic():
+            categories = get_benchmark_categories()
+            # Several users keep the planner statistics realistic: with a
+            # single user the user_id index looks useless and gets skipped
+            for number in range(options['users']):
+                user = create_benchmark_user(f'explain-benchmark-{number}')
+                seed_expenses(user, options['rows'], categories=categories, seed=number)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            results = []
+            for label, queryset in self.get_queries(user, categories[0], options['page_size']):
+                plan = queryset.explain()
+                results.append((label, plan, self.find_full_scans(plan, vendor)))
+            transaction.set_rollback(True)
+
+        for label, plan, full_scans in results:
+            status = self.style.ERROR('FULL SCAN') if full_scans else self.style.SUCCESS('index')
+            self.stdout.write(f'{status:<20} {label}')
+            if options['verbose_plans'] or full_scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        failures = [label for label, _, full_scans in results if full_scans]
+        self.stdout.write(f'{len(results) - len(failures)}/{len(results)} queries avoid a full table scan')
+        if failures and options['strict']:
+            raise CommandError(f'{len(failures)} queries scan the whole expense table')
+
+    def get_queries(self, user, category, page_size):
+        """Yield (label, queryset) for each sort key and filter combination"""
+        sample = ExpenseService.get_user_expenses(user).first()
+        filter_combinations = {
+            'no filters': {},
+            'date range': {'date_from': sample.date, 'date_to': sample.date},
+            'category': {'category': category},
+            'category + date range': {'category': category, 'date_from': sample.date},
+            'amount range': {'amount_min': sample.amount, 'amount_max': sample.amount * 2},
+            'search': {'search': 'rent'},
+        }
+
+        for sort_by, _ in ExpenseFilterForm.SORT_CHOICES:
+            for filter_label, filters in filter_combinations.items():
+                filters = {**filters, 'sort_by': sort_by}
+                expenses = ExpenseService.get_user_expenses(user, filters)
+                paginator = ExpenseCursorPaginator(
+                    expenses, sort_by=ExpenseService.get_sort_by(filters), page_size=page_size,
+                    projection=ExpenseService.LIST_ROW
+                )
+                yield f'list sort={sort_by} filter={filter_label}', paginator.get_page_queryset()
+
+                first_page = paginator.get_page()
+                if first_page.has_next:
+                    yield (
+                        f'list sort={sort_by} filter={filter_label} (next page)',
+                        paginator.get_page_queryset(first_page.next_cursor)
+                    )
+
+        for filter_label, filters in filter_combinations.items():
+            aggregator = DashboardAggregator(user, filters=filters)
+            yield f'dashboard aggregates filter={filter_label}', aggregator.get_grouped_rows()
+
+    def find_full_scans(self, plan, vendor):
+        """Return plan lines that read the whole expense or rollup table"""
+        tables = ('tracker_expense', 'tracker_expensedailyrollup')
+        if vendor == 'postgresql':
+            markers = tuple(f'Seq Scan on {table} ' for table in tables)
+        else:
+            markers = tuple(f'SCAN {table} ' for table in tables) + tuple(f'SCAN {table}\n' for table in tables)
+        return [line for line in plan.splitlines() if any(marker in line + '\n' for marker in markers)]
@@ -0,0 +1,122 @@
+import json
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from config.database import POOL_MODES, configure_connections, get_pool_mode
+from tracker.benchmarks import (
+    create_benchmark_user, get_benchmark_categories, run_connection_load, seed_expenses, summarize_latencies
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Send concurrent requests through the WSGI handler with each connection mode '
+        'and report how many database connections they opened'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='none,persistent,pool',
+                            help='Comma separated connection modes to compare (default: none,persistent,pool); '
+                                 'pool is skipped unless the database is PostgreSQL with psycopg_pool')
+        parser.add_argument('--rows', type=int, default=500, help='Expenses to seed (default: 500)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent threads (default: 8)')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per mode (default: 400)')
+        parser.add_argument('--url', help='Path to request (default: the expenses API)')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = [mode for mode in modes if mode not in POOL_MODES]
+        if unknown:
+            raise CommandError(f"Unknown connection modes: {', '.join(unknown)}")
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+
+        database = dict(connections.settings[DEFAULT_DB_ALIAS])
+        self.stdout.write(f"Database: {database['ENGINE']}, configured mode: {get_pool_mode(database)}")
+        configured = []
+        for mode in modes:
+            try:
+                configured.append((mode, self.configure(database, mode)))
+            except ImproperlyConfigured as exc:
+                self.stdout.write(self.style.WARNING(f'Skipping {mode}: {exc}'))
+
+        # Every thread opens its own connections, so the data has to be
+        # committed; the user and everything it owns is deleted afterwards
+        self.stdout.write(f"Seeding {options['rows']} expenses...")
+        user = create_benchmark_user(f"conntest-{options['rows']}")
+        user.expenses.all().delete()
+        seed_expenses(user, options['rows'], categories=get_benchmark_categories())
+        url = options['url'] or reverse('api_expenses')
+
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for mode, settings_dict in configured:
+                    with self.connection_mode(settings_dict) as stats:
+                        latencies, elapsed, opened, errors = run_connection_load(
+                            user, url, options['concurrency'], options['requests']
+                        )
+                        physical = stats()
+                    result = {
+                        **summarize_latencies(mode, options['concurrency'], latencies, elapsed),
+                        'mode': get_pool_mode(settings_dict),
+                        'connections': physical if physical is not None else opened,
+                        'checkouts': opened,
+                        'errors': errors,
+                    }
+                    result['requests_per_connection'] = round(result['requests'] / max(result['connections'], 1), 1)
+                    self.write_result(result)
+                    results.append(result)
+        finally:
+            user.delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'database': database['ENGINE'], 'results': results}, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+    def configure(self, database, mode):
+        pool = (database.get('OPTIONS') or {}).get('pool') or {}
+        sizes = {f'pool_{key}': pool[key] for key in ('min_size', 'max_size', 'timeout') if key in pool}
+        return configure_connections(database, mode, conn_max_age=database.get('CONN_MAX_AGE') or 600, **sizes)
+
+    @contextmanager
+    def connection_mode(self, settings_dict):
+        """Run with the default database set up as ``settings_dict``
+
+        Yields a function returning the physical connections a pool opened,
+        or None without a pool. The settings dict is shared with every
+        thread's connection, so it is updated in place and restored after.
+        """
+        current = connections.settings[DEFAULT_DB_ALIAS]
+        original = dict(current)
+        connections.close_all()
+        current.clear()
+        current.update(settings_dict)
+
+        def stats():
+            if get_pool_mode(current) != 'pool':
+                return None
+            return connections[DEFAULT_DB_ALIAS].pool.get_stats().get('connections_num')
+
+        try:
+            yield stats
+        finally:
+            connections.close_all()
+            if get_pool_mode(current) == 'pool':
+                connections[DEFAULT_DB_ALIAS].close_pool()
+            current.clear()
+            current.update(original)
+
+    def write_result(self, result):
+        self.stdout.write(
+            f"{result['mode']:<11} x{result['concurrency']:<3} {result['requests']:>5} requests  "
+            f"{result['connections']:>4} connections  {result['requests_per_connection']:>6.1f} req/conn  "
+            f"{result['errors']:>3} errors  p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms"
+        )
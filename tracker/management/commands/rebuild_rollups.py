@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.services import RollupService
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily expense rollups from the raw expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the rollups of this username')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per bulk_create batch')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        created = RollupService.rebuild(user=user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} daily rollup rows'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from tracker.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of expense descriptions'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the {backend.name} search index'))
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.cache import DashboardCache
+from tracker.services import BudgetService
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly expense totals that budgets are checked against'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only recompute the totals of this username')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read and inserted per batch')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        created = BudgetService.rebuild(user=user, batch_size=options['batch_size'])
+        if user is not None:
+            DashboardCache.invalidate(user.pk)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {created} monthly total rows'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tracker.recurring import RecurringExpenseService
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the expenses of every due recurring expense rule, catching up on '
+        'missed occurrences. Safe to run from several workers at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Rules claimed per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep running, checking for due rules periodically')
+        parser.add_argument('--interval', type=float, default=300, help='Seconds between checks with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            rules, expenses = RecurringExpenseService.run_due(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Created {expenses} expenses from {rules} recurring rules'))
+            if not options['loop']:
+                break
+            # Long-lived workers must not keep a connection past CONN_MAX_AGE
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.2 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same grouping as RollupService.rebuild, on the historical models
+    Expense = apps.get_model('tracker', 'Expense')
+    ExpenseDailyRollup = apps.get_model('tracker', 'ExpenseDailyRollup')
+    grouped = Expense.objects.order_by().values_list('user_id', 'category_id', 'date').annotate(
+        total=Sum('amount'),
+        expense_count=Count('id')
+    )
+    batch = []
+    for user_id, category_id, day, total, expense_count in grouped.iterator(chunk_size=1000):
+        batch.append(ExpenseDailyRollup(
+            user_id=user_id, category_id=category_id, date=day, amount=total, count=expense_count
+        ))
+        if len(batch) >= 1000:
+            ExpenseDailyRollup.objects.bulk_create(batch)
+            batch = []
+    ExpenseDailyRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='tracker.expensecategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='rollup_user_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'date'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
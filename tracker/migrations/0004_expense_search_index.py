@@ -0,0 +1,62 @@
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+# Keep in step with tracker.search and the ExpenseSearchEntry model
+FTS_TABLE = 'tracker_expense_fts'
+POSTGRES_INDEX = 'expense_description_search_idx'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"description, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: searches keep using icontains
+            return
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, description, category) "
+            f"SELECT e.id, e.description, c.name FROM tracker_expense e "
+            f"INNER JOIN tracker_expensecategory c ON c.id = e.category_id"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON tracker_expense "
+            f"USING gin (to_tsvector('simple'::regconfig, COALESCE(description, ''::text)))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {POSTGRES_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_expense_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseSearchEntry',
+            fields=[
+                ('expense', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='tracker.expense')),
+                ('description', models.TextField()),
+                ('category', models.TextField()),
+                ('document', models.TextField(db_column='tracker_expense_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'tracker_expense_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
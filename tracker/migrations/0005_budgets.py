@@ -0,0 +1,65 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_totals(apps, schema_editor):
+    # Same totals as BudgetService.rebuild, on the historical models
+    Expense = apps.get_model('tracker', 'Expense')
+    ExpenseMonthlyTotal = apps.get_model('tracker', 'ExpenseMonthlyTotal')
+    grouped = Expense.objects.order_by().annotate(month=TruncMonth('date')).values_list(
+        'user_id', 'category_id', 'month'
+    ).annotate(total=Sum('amount'), expense_count=Count('id'))
+    batch = []
+    for user_id, category_id, month, total, expense_count in grouped.iterator(chunk_size=1000):
+        batch.append(ExpenseMonthlyTotal(
+            user_id=user_id, category_id=category_id, month=month, amount=total, count=expense_count
+        ))
+        if len(batch) >= 1000:
+            ExpenseMonthlyTotal.objects.bulk_create(batch)
+            batch = []
+    ExpenseMonthlyTotal.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_expense_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monthly_limit', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='tracker.expensecategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='unique_user_category_budget')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExpenseMonthlyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to='tracker.expensecategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_monthly_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'month'), name='unique_monthly_total')],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_totals, migrations.RunPython.noop),
+    ]
@@ -9,6 +9,46 @@ class ExpenseCategory(models.Model):
     def __str__(self):
         return self.name
 
+class RecurringExpense(models.Model):
+    """Rule that creates the same expense every ``interval`` days, weeks, months or years
+
+    ``next_run`` is the date of the next expense to create. Monthly and yearly
+    rules keep the day of ``start_date``, so a rule starting on the 31st
+    falls on the last day of shorter months.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+
+    user = models.ForeignKey('core.CustomUser', on_delete=models.CASCADE, related_name='recurring_expenses')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='recurring_expenses')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.TextField(blank=True, null=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    next_run = models.DateField()
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # The worker's only query: active rules with next_run <= today
+        indexes = [
+            models.Index(fields=['next_run'], condition=models.Q(active=True), name='recurring_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} - {self.amount} {self.get_frequency_display().lower()}"
+
 class Expense(models.Model):
     category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='expenses')
     user = models.ForeignKey('core.CustomUser', on_delete=models.CASCADE, related_name='expenses')
@@ -17,6 +57,104 @@ class Expense(models.Model):
     date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    recurring_expense = models.ForeignKey(
+        RecurringExpense, on_delete=models.SET_NULL, blank=True, null=True, related_name='expenses'
+    )
+
+    class Meta:
+        # A rule creates at most one expense per date, however many workers run
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_expense', 'date'], name='unique_recurring_occurrence'),
+        ]
+        # Every dashboard query filters on user first, then ranges or sorts on
+        # one of these columns (see ExpenseService.apply_filters and the
+        # keyset paginator, which breaks ties on id).
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'amount', 'id'], name='expense_user_amount_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='expense_user_cat_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.category.name} - {self.amount}"
+
+class ExpenseDailyRollup(models.Model):
+    """Per-user, per-category daily totals kept in step with Expense writes
+
+    ``amount`` is the sum of the expense amounts on ``date`` and ``count`` the
+    number of expenses, so the row can stand in for the expenses it covers in
+    date/category aggregations.
+    """
+    user = models.ForeignKey('core.CustomUser', on_delete=models.CASCADE, related_name='expense_rollups')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'date'], name='unique_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='rollup_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.date} {self.category_id}: {self.amount} ({self.count})"
+
+class ExpenseMonthlyTotal(models.Model):
+    """Per-user, per-category monthly totals kept in step with Expense writes
+
+    ``month`` is the first day of the month. Budgets are checked against these
+    rows, so the check is one indexed lookup however many expenses the month has.
+    """
+    user = models.ForeignKey('core.CustomUser', on_delete=models.CASCADE, related_name='expense_monthly_totals')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='monthly_totals')
+    month = models.DateField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'month'], name='unique_monthly_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.category_id}: {self.amount} ({self.count})"
+
+class Budget(models.Model):
+    """Monthly spending limit of a user for one category"""
+    user = models.ForeignKey('core.CustomUser', on_delete=models.CASCADE, related_name='budgets')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='budgets')
+    monthly_limit = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_user_category_budget'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} - {self.monthly_limit}/month"
+
+class ExpenseSearchEntry(models.Model):
+    """Row of the SQLite FTS5 table that indexes expenses for search
+
+    The virtual table is created by migration 0004 on SQLite only and kept in
+    sync by tracker.search. ``document`` is the hidden column FTS5 names after
+    the table, the left-hand side of MATCH, and ``rank`` the match's bm25
+    score (lower is better).
+    """
+    expense = models.OneToOneField(
+        Expense, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry'
+    )
+    description = models.TextField()
+    category = models.TextField()
+    document = models.TextField(db_column='tracker_expense_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'tracker_expense_fts'
@@ -0,0 +1,166 @@
+"""
+Keyset (cursor) pagination for expense querysets.
+
+Pages are addressed by the (sort value, id) of the boundary row instead of an
+OFFSET, so every page is a bounded index range scan no matter how deep the
+user has paged.
+"""
+import base64
+import binascii
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, Q
+
+
+class ExpensePage:
+    """A single page of expenses plus the cursors pointing to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class ExpenseCursorPaginator:
+    """Cursor paginator over one of the ExpenseFilterForm sort keys
+
+    Rows are ordered by the sort field with ``id`` as a tie breaker in the same
+    direction, which gives a total order the cursor can resume from. With a
+    ``projection`` (see tracker.projections) the page holds its rows instead
+    of model instances.
+    """
+
+    DEFAULT_SORT = '-date'
+    FORWARD = 'n'
+    BACKWARD = 'p'
+
+    # Sortable field -> parser turning the cursor's string value back into
+    # the database type.
+    SORT_FIELDS = {
+        'date': date.fromisoformat,
+        'amount': Decimal,
+        'category__name': str,
+        # Annotated by the search backend for the relevance sort
+        'search_rank': float,
+    }
+
+    def __init__(self, queryset, sort_by=None, page_size=25, projection=None):
+        sort_by = sort_by or self.DEFAULT_SORT
+        field = sort_by.lstrip('-')
+        if field not in self.SORT_FIELDS:
+            raise ValueError(f"Unsupported sort key for cursor pagination: {sort_by}")
+
+        self.queryset = queryset
+        self.sort_by = sort_by
+        self.field = field
+        self.descending = sort_by.startswith('-')
+        self.page_size = page_size
+        self.projection = projection
+
+    def get_page_queryset(self, cursor=None):
+        """Return the sliced queryset that fetches the page for ``cursor``"""
+        position = self.decode_cursor(cursor)
+        backward = bool(position) and position[2] == self.BACKWARD
+
+        queryset = self.queryset.annotate(cursor_value=F(self.field))
+        if position:
+            queryset = queryset.filter(self._boundary_filter(position[0], position[1], backward))
+        queryset = queryset.order_by(*self._ordering(reverse=backward))
+        if self.projection is not None:
+            queryset = self.projection.select(queryset, 'cursor_value')
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, cursor=None):
+        """Return the page that starts after (or ends before) ``cursor``"""
+        rows = list(self.get_page_queryset(cursor))
+        if self.projection is not None:
+            rows = self.projection.rows(rows)
+        return self.build_page(rows, cursor)
+
+    async def aget_page(self, cursor=None):
+        """Async get_page, fetching the rows with async iteration"""
+        rows = [row async for row in self.get_page_queryset(cursor)]
+        if self.projection is not None:
+            rows = await self.projection.arows(rows)
+        return self.build_page(rows, cursor)
+
+    def build_page(self, rows, cursor=None):
+        """Turn the rows fetched by get_page_queryset(cursor) into an ExpensePage"""
+        position = self.decode_cursor(cursor)
+        backward = bool(position) and position[2] == self.BACKWARD
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backward:
+            rows.reverse()
+
+        if not rows:
+            return ExpensePage([])
+
+        first, last = rows[0], rows[-1]
+        if backward:
+            next_cursor = self.encode_cursor(last, self.FORWARD)
+            previous_cursor = self.encode_cursor(first, self.BACKWARD) if has_more else None
+        else:
+            next_cursor = self.encode_cursor(last, self.FORWARD) if has_more else None
+            previous_cursor = self.encode_cursor(first, self.BACKWARD) if position else None
+
+        return ExpensePage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.field}', f'{prefix}id']
+
+    def _boundary_filter(self, value, pk, backward):
+        """Rows strictly after (value, pk) in the direction of travel"""
+        descending = self.descending != backward
+        lookup = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{self.field}__{lookup}': value}) |
+            Q(**{self.field: value, f'id__{lookup}': pk})
+        )
+
+    def encode_cursor(self, row, direction):
+        """Build an opaque cursor string from a row of the current page"""
+        value = row.cursor_value
+        if isinstance(value, date):
+            value = value.isoformat()
+        payload = json.dumps([self.sort_by, str(value), row.pk, direction], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return (value, id, direction) or None for a missing or foreign cursor"""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sort_by, raw_value, pk, direction = json.loads(base64.urlsafe_b64decode(padded))
+            if sort_by != self.sort_by or direction not in (self.FORWARD, self.BACKWARD):
+                return None
+            return self.SORT_FIELDS[self.field](raw_value), int(pk), direction
+        except (binascii.Error, ValueError, TypeError, InvalidOperation, UnicodeDecodeError):
+            return None
@@ -0,0 +1,98 @@
+"""
+Calendar period boundaries for bucketing expenses.
+
+A period is a half-open date range ``[start, end)``: a day, an ISO week
+starting on Monday, a month, a quarter or a year. Filtering on
+``date__gte=start, date__lt=end`` keeps bucketed queries on the date indexes
+instead of truncating every row. "Today" is the local date in the active time
+zone, so activating a user's zone with ``timezone.activate`` moves every
+boundary with it.
+
+Boundaries only depend on the kind and the date, so they are memoized.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+from django.utils import timezone
+
+PERIOD_KINDS = ('day', 'week', 'month', 'quarter', 'year')
+
+# Months per period for the kinds that have calendar-month boundaries
+MONTH_SPANS = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+class Period(namedtuple('Period', 'start end')):
+    """Half-open date range [start, end)"""
+
+    __slots__ = ()
+
+    def __contains__(self, day):
+        return self.start <= day < self.end
+
+    @property
+    def last_day(self):
+        return self.end - timedelta(days=1)
+
+    def as_filter(self, field='date'):
+        """Lookups selecting the rows of ``field`` that fall in the period"""
+        return {f'{field}__gte': self.start, f'{field}__lt': self.end}
+
+
+def add_months(day, months):
+    """First day of the month ``months`` after (or before) ``day``'s month"""
+    years, month_index = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month_index + 1, 1)
+
+
+def local_today():
+    """Today's date in the active time zone"""
+    return timezone.localdate()
+
+
+@lru_cache(maxsize=4096)
+def period_start(kind, day):
+    """First day of the ``kind`` period that contains ``day``"""
+    if kind == 'day':
+        return day
+    if kind == 'week':
+        return day - timedelta(days=day.weekday())
+    if kind in MONTH_SPANS:
+        span = MONTH_SPANS[kind]
+        return date(day.year, (day.month - 1) // span * span + 1, 1)
+    raise ValueError(f"Unknown period kind: {kind}")
+
+
+def shift_start(kind, start, count):
+    """Start of the period ``count`` periods after the one starting at ``start``"""
+    if kind == 'day':
+        return start + timedelta(days=count)
+    if kind == 'week':
+        return start + timedelta(weeks=count)
+    if kind in MONTH_SPANS:
+        return add_months(start, count * MONTH_SPANS[kind])
+    raise ValueError(f"Unknown period kind: {kind}")
+
+
+def get_period(kind, day=None):
+    """The ``kind`` period containing ``day`` (default: today)"""
+    start = period_start(kind, day or local_today())
+    return Period(start, shift_start(kind, start, 1))
+
+
+def get_periods(kind, count, day=None):
+    """The last ``count`` ``kind`` periods, oldest first, ending with the one containing ``day``"""
+    return _get_periods(kind, count, day or local_today())
+
+
+@lru_cache(maxsize=1024)
+def _get_periods(kind, count, day):
+    last_start = period_start(kind, day)
+    starts = [shift_start(kind, last_start, offset) for offset in range(1 - count, 2)]
+    return tuple(Period(start, end) for start, end in zip(starts, starts[1:]))
+
+
+def get_span(kind, count, day=None):
+    """One Period covering the last ``count`` ``kind`` periods"""
+    periods = get_periods(kind, count, day)
+    return Period(periods[0].start, periods[-1].end)
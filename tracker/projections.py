@@ -0,0 +1,103 @@
+"""
+Compact row projections of expense querysets.
+
+The expense list, the JSON API, the CSV export and the dashboard aggregator
+only need a few columns per expense. A projection reads just those with
+``values_list`` and turns each row into a namedtuple, which skips model
+initialisation and takes a fraction of the memory of an ``Expense`` instance
+(no ``__dict__``, no ``_state``, no unused TEXT and timestamp columns).
+Category names come from the category registry, so no projection joins the
+category table.
+"""
+from collections import namedtuple
+
+from .categories import aget_category_names, get_category_names
+
+
+class ExpenseRow(namedtuple('ExpenseRow', [
+    'id', 'date', 'category_id', 'category_name', 'amount', 'description', 'recurring_expense_id',
+    'cursor_value',
+], defaults=[None])):
+    """One expense of the list and the JSON API
+
+    ``cursor_value`` is only set on the rows of a cursor paginated page.
+    """
+    __slots__ = ()
+
+    @property
+    def pk(self):
+        return self.id
+
+    @classmethod
+    def from_expense(cls, expense):
+        return cls(
+            expense.pk, expense.date, expense.category_id, expense.category.name, expense.amount,
+            expense.description, expense.recurring_expense_id
+        )
+
+
+class ExportRow(namedtuple('ExportRow', [
+    'date', 'category_id', 'category_name', 'amount', 'description', 'created_at', 'updated_at',
+])):
+    """One expense of the CSV export"""
+    __slots__ = ()
+
+
+class ChartPoint(namedtuple('ChartPoint', ['date', 'category_id', 'category_name', 'total', 'count'])):
+    """Total and number of expenses of one category on one day"""
+    __slots__ = ()
+
+
+class Projection:
+    """Columns read with ``values_list`` and the namedtuple each row becomes
+
+    ``columns`` are the row's fields without ``category_name``, which is
+    looked up from ``category_id`` and inserted right after it. Columns added
+    to the values_list after them, such as annotations, fill the remaining
+    fields.
+    """
+
+    def __init__(self, row_class, columns):
+        self.row_class = row_class
+        self.columns = tuple(columns)
+        self.category_index = self.columns.index('category_id')
+
+    def select(self, queryset, *extra):
+        """values_list queryset of the projection's columns followed by ``extra``"""
+        return queryset.values_list(*self.columns, *extra)
+
+    def category_ids(self, values):
+        return {value[self.category_index] for value in values}
+
+    def build(self, value, names):
+        index = self.category_index + 1
+        return self.row_class(*value[:index], names[value[self.category_index]], *value[index:])
+
+    def rows(self, values):
+        """Rows of a list of values_list tuples"""
+        names = get_category_names(self.category_ids(values))
+        return [self.build(value, names) for value in values]
+
+    async def arows(self, values):
+        """Async rows"""
+        names = await aget_category_names(self.category_ids(values))
+        return [self.build(value, names) for value in values]
+
+    def iter_rows(self, queryset, chunk_size=2000):
+        """Stream the rows of ``queryset`` with a server-side iterator"""
+        names = get_category_names()
+        for value in self.select(queryset).iterator(chunk_size=chunk_size):
+            category_id = value[self.category_index]
+            if category_id not in names:
+                names = get_category_names([category_id])
+            yield self.build(value, names)
+
+
+LIST_ROW = Projection(ExpenseRow, [
+    'id', 'date', 'category_id', 'amount', 'description', 'recurring_expense_id',
+])
+EXPORT_ROW = Projection(ExportRow, [
+    'date', 'category_id', 'amount', 'description', 'created_at', 'updated_at',
+])
+# Selected from grouped querysets that annotate total and count
+CHART_POINT = Projection(ChartPoint, ['date', 'category_id'])
@@ -0,0 +1,182 @@
+"""
+Materialization of recurring expenses.
+
+``RecurringExpenseService.run_due`` is what the ``run_recurring_expenses``
+command calls, once or in a loop. Each batch of due rules is handled in one
+transaction:
+
+1. The due rules are read with one query on the partial ``recurring_due_idx``
+   index. Databases with ``SKIP LOCKED`` (PostgreSQL) lock them so concurrent
+   workers take disjoint batches.
+2. Each rule's ``next_run`` is advanced past today with a compare-and-swap
+   UPDATE. A worker that loses the race (always possible on SQLite, which has
+   no row locks) updates nothing and skips the rule.
+3. The missed and due occurrences of every claimed rule are inserted with one
+   ``bulk_create``, and the rollups, search index and dashboard cache are
+   updated once for the batch.
+
+An occurrence whose date a rule already has an expense on, for instance one
+the user moved onto a future due date, is skipped rather than duplicated.
+The unique (recurring_expense, date) constraint on Expense stays the last
+line of defence against concurrent writes.
+"""
+import calendar
+import logging
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+
+from .cache import DashboardCache
+from .instrumentation import timed
+from .models import Expense, RecurringExpense
+from .periods import add_months, local_today
+from .search import get_search_backend
+from .services import RollupService
+
+logger = logging.getLogger(__name__)
+
+
+class RecurringExpenseService:
+    """Create recurring expense rules and turn due occurrences into expenses"""
+
+    @staticmethod
+    def next_occurrence(rule, day):
+        """Date of the occurrence after ``day``, which must be an occurrence of ``rule``"""
+        if rule.frequency == RecurringExpense.DAILY:
+            return day + timedelta(days=rule.interval)
+        if rule.frequency == RecurringExpense.WEEKLY:
+            return day + timedelta(weeks=rule.interval)
+        months = rule.interval * (12 if rule.frequency == RecurringExpense.YEARLY else 1)
+        month = add_months(day, months)
+        # Keep the start date's day, clamped to the length of the month
+        last_day = calendar.monthrange(month.year, month.month)[1]
+        return month.replace(day=min(rule.start_date.day, last_day))
+
+    @staticmethod
+    def due_dates(rule, today):
+        """Occurrences of ``rule`` from next_run up to ``today``, and the next_run after them"""
+        dates = []
+        day = rule.next_run
+        while day <= today and (rule.end_date is None or day <= rule.end_date):
+            dates.append(day)
+            day = RecurringExpenseService.next_occurrence(rule, day)
+        return dates, day
+
+    @staticmethod
+    def create_from_expense(expense, frequency, interval=1):
+        """Make ``expense`` the first occurrence of a new rule repeating it"""
+        rule = RecurringExpense(
+            user_id=expense.user_id, category_id=expense.category_id, amount=expense.amount,
+            description=expense.description, frequency=frequency, interval=interval,
+            start_date=expense.date, next_run=expense.date
+        )
+        rule.next_run = RecurringExpenseService.next_occurrence(rule, expense.date)
+        with transaction.atomic():
+            rule.save()
+            Expense.objects.filter(pk=expense.pk).update(recurring_expense=rule)
+        expense.recurring_expense = rule
+        return rule
+
+    @staticmethod
+    def stop(user, rule_id):
+        """Stop a user's rule; the expenses it already created are kept"""
+        return RecurringExpense.objects.filter(user=user, pk=rule_id).update(active=False)
+
+    @staticmethod
+    def get_due_rules(today, batch_size):
+        """Queryset of up to ``batch_size`` due rules, locked where the database allows it"""
+        rules = RecurringExpense.objects.filter(active=True, next_run__lte=today).order_by('next_run', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            rules = rules.select_for_update(skip_locked=True)
+        return rules[:batch_size]
+
+    @staticmethod
+    def claim(rule, today):
+        """Advance the rule past ``today`` if no other worker did; returns the dates to create"""
+        dates, next_run = RecurringExpenseService.due_dates(rule, today)
+        finished = rule.end_date is not None and next_run > rule.end_date
+        claimed = RecurringExpense.objects.filter(pk=rule.pk, next_run=rule.next_run).update(
+            next_run=next_run, active=not finished
+        )
+        return dates if claimed else None
+
+    @staticmethod
+    @timed
+    def run_batch(today, batch_size=100):
+        """Materialize one batch of due rules; returns (rules handled, expenses created)"""
+        with transaction.atomic():
+            rules = list(RecurringExpenseService.get_due_rules(today, batch_size))
+            expenses = []
+            handled = 0
+            for rule in rules:
+                dates = RecurringExpenseService.claim(rule, today)
+                if dates is None:
+                    continue
+                handled += 1
+                expenses.extend(
+                    Expense(
+                        user_id=rule.user_id, category_id=rule.category_id, amount=rule.amount,
+                        description=rule.description, date=day, recurring_expense_id=rule.pk
+                    )
+                    for day in dates
+                )
+            expenses = RecurringExpenseService.skip_existing(expenses)
+            if not expenses:
+                return handled, 0
+
+            Expense.objects.bulk_create(expenses, batch_size=500)
+            RecurringExpenseService.update_derived_data(expenses)
+        return handled, len(expenses)
+
+    @staticmethod
+    def skip_existing(expenses):
+        """``expenses`` without the occurrences their rule already has an expense on"""
+        if not expenses:
+            return expenses
+        existing = set(Expense.objects.filter(
+            recurring_expense_id__in={expense.recurring_expense_id for expense in expenses},
+            date__in={expense.date for expense in expenses}
+        ).values_list('recurring_expense_id', 'date'))
+        return [expense for expense in expenses if (expense.recurring_expense_id, expense.date) not in existing]
+
+    @staticmethod
+    def update_derived_data(expenses):
+        """bulk_create sends no signals, so update rollups, search and caches here"""
+        deltas_by_user = {}
+        for expense in expenses:
+            deltas = deltas_by_user.setdefault(expense.user_id, {})
+            key = (expense.category_id, expense.date)
+            total, count = deltas.get(key, (0, 0))
+            deltas[key] = (total + expense.amount, count + 1)
+        for user_id, deltas in deltas_by_user.items():
+            RollupService.apply_deltas(user_id, deltas)
+            DashboardCache.invalidate(user_id)
+
+        rule_ids = {expense.recurring_expense_id for expense in expenses}
+        first_date = min(expense.date for expense in expenses)
+        get_search_backend().index_queryset(
+            Expense.objects.filter(recurring_expense_id__in=rule_ids, date__gte=first_date)
+        )
+
+    @staticmethod
+    @timed
+    def run_due(today=None, batch_size=100):
+        """Materialize every due rule, batch by batch; returns (rules handled, expenses created)
+
+        A batch that fails, for instance because another SQLite worker holds
+        the write lock, is rolled back and left for the next run.
+        """
+        today = today or local_today()
+        rules_handled = expenses_created = 0
+        while True:
+            try:
+                handled, created = RecurringExpenseService.run_batch(today, batch_size)
+            except DatabaseError:
+                logger.exception('Recurring expense batch failed; it will be retried on the next run')
+                break
+            rules_handled += handled
+            expenses_created += created
+            # A short batch means nothing else is due, or the rest is locked by other workers
+            if handled < batch_size:
+                break
+        return rules_handled, expenses_created
@@ -0,0 +1,137 @@
+"""
+Gap-filled time series for the dashboard trend charts.
+
+The monthly, weekly and daily trends all cover recent history, so instead of
+one grouped query per chart a DailySeries fetches ``(date, total)`` once for
+the widest range. It lays the rows out in a fixed-length array with one slot
+per day and zeros where nothing was spent. Each chart then sums slices of
+that array, so series always have exactly one point per period.
+
+The array is an ``array('d')``. When NumPy is installed it is used instead
+and the buckets are summed with ``add.reduceat``.
+
+Callers that may not need every chart get a LazyChartData, which computes
+each series the first time it is read.
+"""
+from array import array
+from collections.abc import Mapping
+
+from django.db.models import Sum
+
+from .periods import Period, get_periods, local_today
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - depends on the environment
+    numpy = None
+
+# Chart series name -> (period kind, label format, data key)
+TREND_SERIES = {
+    'monthly': ('month', '%b %Y', 'data'),
+    'weekly': ('week', 'Week of %b %d', 'amounts'),
+    'daily': ('day', '%m/%d', 'amounts'),
+}
+
+
+class DailySeries:
+    """Daily totals over a Period, one float slot per day"""
+
+    def __init__(self, span):
+        self.span = span
+        length = (span.end - span.start).days
+        self.values = numpy.zeros(length) if numpy is not None else array('d', bytes(8 * length))
+
+    @classmethod
+    def fetch(cls, queryset, span):
+        """Daily totals of ``queryset`` (raw expenses or rollups) with one grouped query"""
+        rows = queryset.filter(**span.as_filter()).order_by().values_list('date').annotate(total=Sum('amount'))
+        return cls(span).add_rows(rows)
+
+    def add(self, day, amount):
+        if day in self.span:
+            self.values[(day - self.span.start).days] += float(amount)
+
+    def add_rows(self, rows):
+        """Add (date, amount) rows; days outside the span are ignored"""
+        for day, amount in rows:
+            self.add(day, amount)
+        return self
+
+    def totals(self, periods):
+        """Sum of each of ``periods``, which must be contiguous and inside the span
+
+        Amounts have two decimal places, so the sums are rounded back to cents
+        to drop the binary floating point noise.
+        """
+        offsets = [(period.start - self.span.start).days for period in periods]
+        first, last = offsets[0], (periods[-1].end - self.span.start).days
+        if numpy is not None:
+            relative = [offset - first for offset in offsets]
+            return numpy.add.reduceat(self.values[first:last], relative).round(2).tolist()
+        bounds = offsets + [last]
+        return [round(sum(self.values[start:end]), 2) for start, end in zip(bounds, bounds[1:])]
+
+
+def get_trend_periods(months=12, weeks=8, days=30, today=None):
+    """Periods of each trend chart, keyed like TREND_SERIES"""
+    today = today or local_today()
+    return {
+        'monthly': get_periods('month', months, today),
+        'weekly': get_periods('week', weeks, today),
+        'daily': get_periods('day', days, today),
+    }
+
+
+def covering_span(period_lists):
+    """One Period covering every period of ``period_lists``"""
+    return Period(
+        min(periods[0].start for periods in period_lists),
+        max(periods[-1].end for periods in period_lists)
+    )
+
+
+def format_trend(series, periods, daily):
+    """Chart data for one TREND_SERIES entry"""
+    _, label_format, data_key = TREND_SERIES[series]
+    return {
+        'labels': [period.start.strftime(label_format) for period in periods],
+        data_key: daily.totals(periods),
+    }
+
+
+def build_trends(daily, trend_periods):
+    """Chart data for every series of ``trend_periods`` from one DailySeries"""
+    return {
+        series: format_trend(series, periods, daily)
+        for series, periods in trend_periods.items()
+    }
+
+
+class LazyChartData(Mapping):
+    """Read-only mapping of chart series, each computed by ``load(name)`` when first read
+
+    Only ``series`` are available. A computed series is kept for the life of
+    the mapping, so one instance per request computes each series at most
+    once and never the ones nobody reads.
+    """
+
+    def __init__(self, load, series):
+        self._load = load
+        self.series = tuple(series)
+        self._data = {}
+
+    def __getitem__(self, name):
+        if name not in self._data:
+            if name not in self.series:
+                raise KeyError(name)
+            self._data[name] = self._load(name)
+        return self._data[name]
+
+    def __iter__(self):
+        return iter(self.series)
+
+    def __len__(self):
+        return len(self.series)
+
+    def __repr__(self):
+        return f'<LazyChartData {", ".join(self.series)} (computed: {", ".join(self._data) or "none"})>'
@@ -1,22 +1,329 @@
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncMonth, TruncWeek, TruncDate
-from django.utils import timezone
-from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Count, Q, F, DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import asyncio
+import functools
 from decimal import Decimal
-from .models import Expense
+from .categories import get_category_names
+from .models import Budget, Expense, ExpenseDailyRollup, ExpenseMonthlyTotal
+from .instrumentation import timed
+from .periods import get_period, get_periods, local_today, period_start
+from .projections import CHART_POINT, EXPORT_ROW, LIST_ROW
+from .search import get_search_backend
+from .series import DailySeries, LazyChartData, build_trends, covering_span, format_trend, get_trend_periods
+
+
+class RollupService:
+    """Maintain the per-user daily rollup table used by the dashboard charts"""
+    
+    # Filters the rollup can answer: it keeps date and category but not the
+    # individual amounts or descriptions.
+    SUPPORTED_FILTERS = ('date_from', 'date_to', 'category', 'sort_by')
+    
+    @staticmethod
+    def supports_filters(filters):
+        """Whether the rollup can answer a query with these filters"""
+        return not any(
+            value for key, value in (filters or {}).items()
+            if key not in RollupService.SUPPORTED_FILTERS
+        )
+    
+    @staticmethod
+    def get_user_rollups(user, filters=None):
+        """Get rollup rows for a user restricted to the date/category filters"""
+        queryset = ExpenseDailyRollup.objects.filter(user=user)
+        filters = filters or {}
+        
+        if filters.get('date_from'):
+            queryset = queryset.filter(date__gte=filters['date_from'])
+        
+        if filters.get('date_to'):
+            queryset = queryset.filter(date__lte=filters['date_to'])
+        
+        if filters.get('category'):
+            queryset = queryset.filter(category=filters['category'])
+        
+        return queryset
+    
+    @staticmethod
+    def snapshot(expense):
+        """Capture the rollup key and amount of an expense before it changes"""
+        return (expense.category_id, expense.date, expense.amount)
+    
+    @staticmethod
+    @timed
+    def apply_deltas(user_id, deltas):
+        """Apply {(category_id, date): (amount, count)} changes for one user"""
+        for (category_id, day), (amount, count) in deltas.items():
+            RollupService.apply_delta(
+                ExpenseDailyRollup, amount, count, user_id=user_id, category_id=category_id, date=day
+            )
+        # Budgets are checked against monthly totals that move with the same deltas
+        BudgetService.apply_deltas(user_id, deltas)
+    
+    @staticmethod
+    def apply_delta(model, amount, count, **key):
+        """Add ``amount`` and ``count`` to the ``model`` row at ``key``
+        
+        The row is created on the first expense and deleted with the last one.
+        """
+        if not amount and not count:
+            return
+        rows = model.objects.filter(**key)
+        updated = rows.update(amount=F('amount') + amount, count=F('count') + count)
+        if not updated and count > 0:
+            try:
+                with transaction.atomic():
+                    model.objects.create(amount=amount, count=count, **key)
+            except IntegrityError:
+                # Another writer created the row first
+                rows.update(amount=F('amount') + amount, count=F('count') + count)
+        elif count < 0:
+            rows.filter(count__lte=0).delete()
+    
+    @staticmethod
+    def record_change(user_id, before=None, after=None):
+        """Move an expense's contribution from the ``before`` to the ``after`` snapshot"""
+        deltas = {}
+        if before is not None:
+            category_id, day, amount = before
+            deltas[(category_id, day)] = (-amount, -1)
+        if after is not None:
+            category_id, day, amount = after
+            old_amount, old_count = deltas.get((category_id, day), (0, 0))
+            deltas[(category_id, day)] = (old_amount + amount, old_count + 1)
+        RollupService.apply_deltas(user_id, deltas)
+    
+    @staticmethod
+    @timed
+    def rebuild(user=None, batch_size=1000):
+        """Recompute rollups from the raw expenses for one user or everyone"""
+        expenses = Expense.objects.all()
+        rollups = ExpenseDailyRollup.objects.all()
+        if user is not None:
+            expenses = expenses.filter(user=user)
+            rollups = rollups.filter(user=user)
+        
+        grouped = expenses.order_by().values_list('user_id', 'category_id', 'date').annotate(
+            total=Sum('amount'),
+            expense_count=Count('id')
+        )
+        
+        created = 0
+        with transaction.atomic():
+            rollups.delete()
+            batch = []
+            for user_id, category_id, day, total, expense_count in grouped.iterator(chunk_size=batch_size):
+                batch.append(ExpenseDailyRollup(
+                    user_id=user_id, category_id=category_id, date=day, amount=total, count=expense_count
+                ))
+                if len(batch) >= batch_size:
+                    ExpenseDailyRollup.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                ExpenseDailyRollup.objects.bulk_create(batch)
+                created += len(batch)
+        
+        return created
+
+
+class BudgetService:
+    """Per-category monthly budgets and the running totals they are checked against"""
+    
+    @staticmethod
+    def monthly_deltas(deltas):
+        """Fold {(category_id, date): (amount, count)} deltas into calendar months"""
+        monthly = {}
+        for (category_id, day), (amount, count) in deltas.items():
+            key = (category_id, period_start('month', day))
+            old_amount, old_count = monthly.get(key, (0, 0))
+            monthly[key] = (old_amount + amount, old_count + count)
+        return monthly
+    
+    @staticmethod
+    @timed
+    def apply_deltas(user_id, deltas):
+        """Apply RollupService deltas of one user to the monthly totals"""
+        for (category_id, month), (amount, count) in BudgetService.monthly_deltas(deltas).items():
+            RollupService.apply_delta(
+                ExpenseMonthlyTotal, amount, count, user_id=user_id, category_id=category_id, month=month
+            )
+    
+    @staticmethod
+    def set_budget(user, category, monthly_limit):
+        """Create or change the user's budget for a category"""
+        budget, _ = Budget.objects.update_or_create(
+            user=user, category=category, defaults={'monthly_limit': monthly_limit}
+        )
+        return budget
+    
+    @staticmethod
+    def delete_budget(user, category_id):
+        """Remove the user's budget for a category"""
+        for budget in Budget.objects.filter(user=user, category_id=category_id):
+            budget.delete()
+    
+    @staticmethod
+    def get_budgets(user, month=None):
+        """The user's budgets annotated with the amount ``spent`` in ``month``
+        
+        Each budget reads a single monthly total row, so the cost does not
+        grow with the number of expenses.
+        """
+        month = month or get_period('month').start
+        totals = ExpenseMonthlyTotal.objects.filter(
+            user=OuterRef('user'), category=OuterRef('category'), month=month
+        ).values('amount')[:1]
+        return Budget.objects.filter(user=user).select_related('category').annotate(
+            spent=Coalesce(
+                Subquery(totals), Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )
+        ).order_by('category__name')
+    
+    @staticmethod
+    def format_status(budget):
+        """Remaining amount and flags of one budget from get_budgets"""
+        remaining = budget.monthly_limit - budget.spent
+        if budget.monthly_limit > 0:
+            percent_used = int(budget.spent / budget.monthly_limit * 100)
+        else:
+            percent_used = 100 if budget.spent > 0 else 0
+        return {
+            'category_id': budget.category_id,
+            'category': budget.category.name,
+            'limit': budget.monthly_limit,
+            'spent': budget.spent,
+            'remaining': remaining,
+            'over_budget': remaining < 0,
+            'percent_used': percent_used,
+        }
+    
+    @staticmethod
+    def summarize(statuses):
+        return {
+            'budgets': statuses,
+            'over_budget_count': sum(1 for status in statuses if status['over_budget']),
+            'budget_remaining': sum((status['remaining'] for status in statuses), Decimal('0.00')),
+        }
+    
+    @staticmethod
+    @timed
+    def get_budget_status(user, month=None):
+        """Every budget of the user with its spending in ``month`` (default: this month)"""
+        return BudgetService.summarize([
+            BudgetService.format_status(budget) for budget in BudgetService.get_budgets(user, month)
+        ])
+    
+    @staticmethod
+    @timed
+    async def aget_budget_status(user, month=None):
+        """Async get_budget_status"""
+        return BudgetService.summarize([
+            BudgetService.format_status(budget) async for budget in BudgetService.get_budgets(user, month)
+        ])
+    
+    @staticmethod
+    def get_category_status(user, category_id, day=None):
+        """Status of the budget covering ``category_id`` on ``day``, or None"""
+        budget = BudgetService.get_budgets(user, get_period('month', day).start).filter(
+            category_id=category_id
+        ).first()
+        return BudgetService.format_status(budget) if budget else None
+    
+    @staticmethod
+    @timed
+    def rebuild(user=None, batch_size=1000):
+        """Recompute the monthly totals from the raw expenses for one user or everyone"""
+        expenses = Expense.objects.all()
+        totals = ExpenseMonthlyTotal.objects.all()
+        if user is not None:
+            expenses = expenses.filter(user=user)
+            totals = totals.filter(user=user)
+        
+        grouped = expenses.order_by().values_list('user_id', 'category_id', 'date').annotate(
+            total=Sum('amount'),
+            expense_count=Count('id')
+        )
+        by_month = {}
+        for user_id, category_id, day, total, expense_count in grouped.iterator(chunk_size=batch_size):
+            key = (user_id, category_id, period_start('month', day))
+            amount, count = by_month.get(key, (0, 0))
+            by_month[key] = (amount + total, count + expense_count)
+        
+        with transaction.atomic():
+            totals.delete()
+            ExpenseMonthlyTotal.objects.bulk_create(
+                [
+                    ExpenseMonthlyTotal(user_id=user_id, category_id=category_id, month=month, amount=amount, count=count)
+                    for (user_id, category_id, month), (amount, count) in by_month.items()
+                ],
+                batch_size=batch_size
+            )
+        
+        return len(by_month)
+
 
 class ExpenseService:
     """Service class for expense-related business logic"""
     
+    CATEGORY_COLORS = [
+        '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF',
+        '#FF9F40', '#FF6384', '#C9CBCF', '#4BC0C0', '#FF6384'
+    ]
+    
+    # Projections reading only the columns each consumer needs, as namedtuple
+    # rows (see tracker.projections): the list and API page, the dashboard's
+    # grouped chart points and the CSV export
+    LIST_ROW = LIST_ROW
+    CHART_POINT = CHART_POINT
+    EXPORT_ROW = EXPORT_ROW
+    
     @staticmethod
     def get_user_expenses(user, filters=None):
         """Get expenses for a user with optional filters"""
-        queryset = Expense.objects.filter(user=user)
+        queryset = Expense.objects.filter(user=user).select_related('category')
         
         if filters:
             queryset = ExpenseService.apply_filters(queryset, filters)
         
-        return queryset.order_by('-date')
+        if not ExpenseService.get_sort_by(filters):
+            queryset = queryset.order_by('-date', '-id')
+        
+        return queryset
+    
+    @staticmethod
+    @timed
+    def save_expense(expense, before=None):
+        """Save an expense and keep the daily rollup in step
+
+        ``before`` is the RollupService.snapshot of the expense taken before
+        it was edited, or None for a new expense.
+        """
+        with transaction.atomic():
+            expense.save()
+            RollupService.record_change(expense.user_id, before, RollupService.snapshot(expense))
+        return expense
+    
+    @staticmethod
+    @timed
+    def delete_expense(expense):
+        """Delete an expense and remove it from the daily rollup"""
+        with transaction.atomic():
+            before = RollupService.snapshot(expense)
+            expense.delete()
+            RollupService.record_change(expense.user_id, before, None)
+    
+    RELEVANCE_SORT = '-search_rank'
+    
+    @staticmethod
+    def get_sort_by(filters):
+        """The requested sort order, ignoring relevance when there is no search"""
+        sort_by = (filters or {}).get('sort_by')
+        if sort_by == ExpenseService.RELEVANCE_SORT and not filters.get('search'):
+            return None
+        return sort_by
     
     @staticmethod
     def apply_filters(queryset, filters):
@@ -39,21 +346,41 @@ class ExpenseService:
         if filters.get('amount_max'):
             queryset = queryset.filter(amount__lte=filters['amount_max'])
         
-        # Search in description
+        sort_by = ExpenseService.get_sort_by(filters)
+        
+        # Search in description and category name
         if filters.get('search'):
-            search_term = filters['search']
-            queryset = queryset.filter(
-                Q(description__icontains=search_term) |
-                Q(category__name__icontains=search_term)
+            queryset = get_search_backend().search(
+                queryset, filters['search'], ranked=sort_by == ExpenseService.RELEVANCE_SORT
             )
         
         # Sorting
-        if filters.get('sort_by'):
-            queryset = queryset.order_by(filters['sort_by'])
+        if sort_by:
+            tie_breaker = '-id' if sort_by.startswith('-') else 'id'
+            queryset = queryset.order_by(sort_by, tie_breaker)
         
         return queryset
     
     @staticmethod
+    def get_statistics_source(user, filters=None):
+        """Queryset to aggregate for statistics and charts under ``filters``
+
+        Returns the daily rollup when it can answer the filters and the raw
+        filtered expenses otherwise; the aggregation methods accept either.
+        """
+        if RollupService.supports_filters(filters):
+            return RollupService.get_user_rollups(user, filters)
+        return ExpenseService.get_user_expenses(user, filters)
+    
+    @staticmethod
+    def count_expression(queryset):
+        """Expression counting expenses in either raw or rollup querysets"""
+        if queryset.model is ExpenseDailyRollup:
+            return Sum('count')
+        return Count('id')
+    
+    @staticmethod
+    @timed
     def get_expense_statistics(user, expenses=None):
         """Calculate basic expense statistics for a user
         
@@ -65,8 +392,9 @@ class ExpenseService:
         if expenses is None:
             expenses = Expense.objects.filter(user=user)
         
-        total_expenses = expenses.count()
-        total_amount = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        totals = expenses.aggregate(count=ExpenseService.count_expression(expenses), total=Sum('amount'))
+        total_expenses = totals['count'] or 0
+        total_amount = totals['total'] or Decimal('0.00')
         avg_expense = total_amount / total_expenses if total_expenses > 0 else Decimal('0.00')
         
         return {
@@ -76,74 +404,42 @@ class ExpenseService:
         }
     
     @staticmethod
+    @timed
     def get_monthly_statistics(user):
         """Get current month statistics and comparison with previous month"""
-        current_month = timezone.now().replace(day=1)
-        user_expenses = Expense.objects.filter(user=user)
-        
-        # Current month data
-        next_month = current_month.replace(month=current_month.month + 1) if current_month.month < 12 else current_month.replace(year=current_month.year + 1, month=1)
-        current_month_expenses = user_expenses.filter(date__gte=current_month, date__lt=next_month)
-        current_month_total = current_month_expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        current_month_count = current_month_expenses.count()
-        
-        # Previous month for comparison
-        if current_month.month == 1:
-            prev_month = current_month.replace(year=current_month.year - 1, month=12)
-        else:
-            prev_month = current_month.replace(month=current_month.month - 1)
-        
-        prev_month_expenses = user_expenses.filter(date__gte=prev_month, date__lt=current_month)
-        prev_month_total = prev_month_expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        # Calculate percentage change
-        if prev_month_total > 0:
-            month_change = ((current_month_total - prev_month_total) / prev_month_total) * 100
-        else:
-            month_change = 100 if current_month_total > 0 else 0
-        
-        return {
-            'current_month_total': current_month_total,
-            'current_month_count': current_month_count,
-            'month_change': month_change
-        }
+        return DashboardAggregator(user).get_monthly_statistics()
     
     @staticmethod
+    def get_trend(expenses, series, periods):
+        """Gap-filled TREND_SERIES chart data over ``periods`` from one grouped query"""
+        daily = DailySeries.fetch(expenses, covering_span([periods]))
+        return format_trend(series, periods, daily)
+    
+    @staticmethod
+    @timed
     def get_monthly_trends(user, expenses=None, months=12):
         """Get monthly expense trends for the last N months"""
         if expenses is None:
-            expenses = Expense.objects.filter(user=user)
-        
-        monthly_data = expenses.filter(
-            date__gte=timezone.now() - timedelta(days=365)
-        ).annotate(
-            month=TruncMonth('date')
-        ).values('month').annotate(
-            total=Sum('amount')
-        ).order_by('month')
-        
-        labels = [item['month'].strftime('%b %Y') for item in monthly_data]
-        data = [float(item['total']) for item in monthly_data]
+            expenses = RollupService.get_user_rollups(user)
         
-        return {'labels': labels, 'data': data}
+        return ExpenseService.get_trend(expenses, 'monthly', get_periods('month', months))
     
     @staticmethod
+    @timed
     def get_category_distribution(user, expenses=None):
         """Get expense distribution by category"""
         if expenses is None:
-            expenses = Expense.objects.filter(user=user)
+            expenses = RollupService.get_user_rollups(user)
         
-        category_data = expenses.values('category__name').annotate(
+        category_data = list(expenses.values('category_id').annotate(
             total=Sum('amount'),
-            count=Count('id')
-        ).order_by('-total')
+            count=ExpenseService.count_expression(expenses)
+        ).order_by('-total'))
         
-        category_labels = [item['category__name'] for item in category_data]
+        names = get_category_names({item['category_id'] for item in category_data})
+        category_labels = [names[item['category_id']] for item in category_data]
         category_amounts = [float(item['total']) for item in category_data]
-        category_colors = [
-            '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF',
-            '#FF9F40', '#FF6384', '#C9CBCF', '#4BC0C0', '#FF6384'
-        ]
+        category_colors = ExpenseService.CATEGORY_COLORS
         
         return {
             'labels': category_labels,
@@ -152,42 +448,22 @@ class ExpenseService:
         }
     
     @staticmethod
+    @timed
     def get_weekly_trends(user, expenses=None, weeks=8):
         """Get weekly expense trends for the last N weeks"""
         if expenses is None:
-            expenses = Expense.objects.filter(user=user)
-        
-        weekly_data = expenses.filter(
-            date__gte=timezone.now() - timedelta(weeks=weeks)
-        ).annotate(
-            week=TruncWeek('date')
-        ).values('week').annotate(
-            total=Sum('amount')
-        ).order_by('week')
-        
-        weekly_labels = [f"Week of {item['week'].strftime('%b %d')}" for item in weekly_data]
-        weekly_amounts = [float(item['total']) for item in weekly_data]
+            expenses = RollupService.get_user_rollups(user)
         
-        return {'labels': weekly_labels, 'amounts': weekly_amounts}
+        return ExpenseService.get_trend(expenses, 'weekly', get_periods('week', weeks))
     
     @staticmethod
+    @timed
     def get_daily_trends(user, expenses=None, days=30):
         """Get daily expense trends for the last N days"""
         if expenses is None:
-            expenses = Expense.objects.filter(user=user)
+            expenses = RollupService.get_user_rollups(user)
         
-        daily_data = expenses.filter(
-            date__gte=timezone.now() - timedelta(days=days)
-        ).annotate(
-            day=TruncDate('date')
-        ).values('day').annotate(
-            total=Sum('amount')
-        ).order_by('day')
-        
-        daily_labels = [item['day'].strftime('%m/%d') for item in daily_data]
-        daily_amounts = [float(item['total']) for item in daily_data]
-        
-        return {'labels': daily_labels, 'amounts': daily_amounts}
+        return ExpenseService.get_trend(expenses, 'daily', get_periods('day', days))
     
     @staticmethod
     def get_top_categories(user, expenses=None, limit=5):
@@ -196,7 +472,7 @@ class ExpenseService:
             expenses = Expense.objects.filter(user=user)
         
         return expenses.values('category__name').annotate(
-            count=Count('id'),
+            count=ExpenseService.count_expression(expenses),
             total=Sum('amount')
         ).order_by('-count')[:limit]
     
@@ -205,55 +481,231 @@ class ExpenseService:
         """Get recent expenses for quick view"""
         if expenses is None:
             expenses = Expense.objects.filter(user=user)
-        return expenses.order_by('-date')[:limit]
+        return expenses.select_related('category').order_by('-date')[:limit]
+
+    # Chart series name -> ExpenseService method computing it
+    CHART_SERIES = {
+        'monthly': 'get_monthly_trends',
+        'weekly': 'get_weekly_trends',
+        'daily': 'get_daily_trends',
+        'category': 'get_category_distribution',
+    }
+
+    @staticmethod
+    def get_chart_series(user, series, expenses=None):
+        """Get one chart series by its CHART_SERIES name"""
+        return getattr(ExpenseService, ExpenseService.CHART_SERIES[series])(user, expenses)
 
     @staticmethod
-    def get_chart_data(user, expenses=None):
-        """Get all chart data for the dashboard"""
+    def get_chart_data(user, expenses=None, series=None):
+        """Get the dashboard chart data as a LazyChartData
+
+        ``series`` are the CHART_SERIES names to offer, all by default; each
+        is computed when first read. Without a pre-filtered queryset the series
+        are read from the daily rollup. The trends share one fetch of daily
+        totals, covering only the trends offered.
+        """
         if expenses is None:
-            expenses = Expense.objects.filter(user=user)
-            
-        return {
-            'monthly': ExpenseService.get_monthly_trends(user, expenses),
-            'weekly': ExpenseService.get_weekly_trends(user, expenses),
-            'daily': ExpenseService.get_daily_trends(user, expenses),
-            'category': ExpenseService.get_category_distribution(user, expenses)
+            expenses = RollupService.get_user_rollups(user)
+        if series is None:
+            series = ExpenseService.CHART_SERIES
+        
+        trend_periods = {
+            name: periods for name, periods in get_trend_periods().items() if name in series
         }
+        
+        @functools.cache
+        def fetch_daily():
+            return DailySeries.fetch(expenses, covering_span(trend_periods.values()))
+        
+        def load(name):
+            if name in trend_periods:
+                return format_trend(name, trend_periods[name], fetch_daily())
+            return ExpenseService.get_chart_series(user, name, expenses)
+        
+        return LazyChartData(load, series)
+    
+    CSV_HEADER = ['Date', 'Category', 'Amount', 'Description', 'Created At', 'Updated At']
     
     @staticmethod
-    def export_expenses_to_csv(user, queryset=None):
-        """Export user expenses to CSV format"""
+    def iter_expenses_csv(user, queryset=None, chunk_size=2000):
+        """Yield the CSV export in chunks of ``chunk_size`` rows
+
+        Rows are streamed as EXPORT_ROW projections with a server-side
+        iterator, and the category names come from the category registry, so
+        the query needs no join, memory stays flat however many expenses are
+        exported and the header is available before the first query runs.
+        """
         import csv
         from io import StringIO
-        from django.utils import timezone
         
         # If no queryset provided, get all user expenses
         if queryset is None:
             queryset = Expense.objects.filter(user=user).order_by('-date')
         
-        # Create CSV file in memory
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header row
-        writer.writerow([
-            'Date',
-            'Category',
-            'Amount',
-            'Description',
-            'Created At',
-            'Updated At'
-        ])
+        rows = ExpenseService.EXPORT_ROW.iter_rows(queryset, chunk_size=chunk_size)
+        
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(ExpenseService.CSV_HEADER)
+        yield buffer.getvalue()
         
-        # Write data rows
-        for expense in queryset:
+        pending = 0
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
             writer.writerow([
-                expense.date.strftime('%Y-%m-%d'),
-                expense.category.name,
-                str(expense.amount),
-                expense.description or '',
-                expense.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                expense.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+                row.date.strftime('%Y-%m-%d'),
+                row.category_name,
+                str(row.amount),
+                row.description or '',
+                row.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                row.updated_at.strftime('%Y-%m-%d %H:%M:%S')
             ])
+            pending += 1
+            if pending >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        
+        if pending:
+            yield buffer.getvalue()
+    
+    @staticmethod
+    @timed
+    def export_expenses_to_csv(user, queryset=None):
+        """Export user expenses to CSV format"""
+        return ''.join(ExpenseService.iter_expenses_csv(user, queryset))
+
+
+class DashboardAggregator:
+    """Compute every dashboard widget from a single grouped scan
+
+    The filtered expenses are grouped once by (date, category) and the
+    statistics cards, the category distribution and the monthly, weekly and
+    daily trends are all folded from those rows in Python; ``charts`` limits
+    the chart series that are built to the CHART_SERIES names given. When the active
+    filters only restrict date and category the scan runs over the daily
+    rollup instead of the raw expenses. The month-over-month comparison covers
+    all of the user's expenses, so it is answered by one extra query against
+    the rollup using conditional aggregation.
+    """
+    
+    def __init__(self, user, expenses=None, filters=None, months=12, weeks=8, days=30, charts=None):
+        self.user = user
+        if filters is None and expenses is not None:
+            self.source = expenses
+        elif RollupService.supports_filters(filters):
+            self.source = RollupService.get_user_rollups(user, filters)
+        else:
+            self.source = expenses if expenses is not None else ExpenseService.get_user_expenses(user, filters)
+        self.months = months
+        self.weeks = weeks
+        self.days = days
+        self.charts = tuple(ExpenseService.CHART_SERIES if charts is None else charts)
+        self.today = local_today()
+    
+    def get_grouped_rows(self):
+        """Return (date, category id, total, count) values for the filtered expenses"""
+        return ExpenseService.CHART_POINT.select(self.source.order_by()).annotate(
+            total=Sum('amount'),
+            count=ExpenseService.count_expression(self.source)
+        )
+    
+    def get_monthly_totals(self):
+        """Queryset and aggregates for the current versus last month comparison"""
+        previous_month, current_month = get_periods('month', 2, self.today)
+        
+        in_current_month = Q(date__gte=current_month.start)
+        queryset = ExpenseDailyRollup.objects.filter(
+            user=self.user, date__gte=previous_month.start, date__lt=current_month.end
+        )
+        return queryset, {
+            'current_total': Sum('amount', filter=in_current_month),
+            'current_count': Sum('count', filter=in_current_month),
+            'prev_total': Sum('amount', filter=~in_current_month),
+        }
+    
+    def get_monthly_statistics(self):
+        """Current month totals and change versus last month in one query"""
+        queryset, aggregates = self.get_monthly_totals()
+        return self.format_monthly_statistics(queryset.aggregate(**aggregates))
+    
+    async def aget_monthly_statistics(self):
+        """Async get_monthly_statistics"""
+        queryset, aggregates = self.get_monthly_totals()
+        return self.format_monthly_statistics(await queryset.aaggregate(**aggregates))
+    
+    @staticmethod
+    def format_monthly_statistics(totals):
+        current_month_total = totals['current_total'] or Decimal('0.00')
+        prev_month_total = totals['prev_total'] or Decimal('0.00')
+        if prev_month_total > 0:
+            month_change = ((current_month_total - prev_month_total) / prev_month_total) * 100
+        else:
+            month_change = 100 if current_month_total > 0 else 0
         
-        return output.getvalue()
+        return {
+            'current_month_total': current_month_total,
+            'current_month_count': totals['current_count'] or 0,
+            'month_change': month_change
+        }
+    
+    @timed
+    def compute(self):
+        """Return statistics, chart data and monthly statistics for the dashboard"""
+        rows = ExpenseService.CHART_POINT.rows(list(self.get_grouped_rows()))
+        return self.build(rows, self.get_monthly_statistics())
+    
+    @timed
+    async def acompute(self):
+        """Async compute, running the grouped scan and the monthly comparison concurrently"""
+        rows, monthly_statistics = await asyncio.gather(
+            self._afetch_grouped_rows(), self.aget_monthly_statistics()
+        )
+        return self.build(rows, monthly_statistics)
+    
+    async def _afetch_grouped_rows(self):
+        return await ExpenseService.CHART_POINT.arows([row async for row in self.get_grouped_rows()])
+    
+    def build(self, rows, monthly_statistics):
+        """Fold grouped ChartPoint rows into the dashboard aggregates"""
+        trend_periods = {
+            name: periods
+            for name, periods in get_trend_periods(self.months, self.weeks, self.days, self.today).items()
+            if name in self.charts
+        }
+        daily = DailySeries(covering_span(trend_periods.values())) if trend_periods else None
+        
+        total_expenses = 0
+        total_amount = Decimal('0.00')
+        by_category = {}
+        
+        for row in rows:
+            total_expenses += row.count
+            total_amount += row.total
+            by_category[row.category_name] = by_category.get(row.category_name, Decimal('0.00')) + row.total
+            if daily is not None:
+                daily.add(row.date, row.total)
+        
+        avg_expense = total_amount / total_expenses if total_expenses > 0 else Decimal('0.00')
+        
+        charts = build_trends(daily, trend_periods) if daily is not None else {}
+        if 'category' in self.charts:
+            categories = sorted(by_category.items(), key=lambda item: item[1], reverse=True)
+            charts['category'] = {
+                'labels': [name for name, _ in categories],
+                'amounts': [float(total) for _, total in categories],
+                'colors': ExpenseService.CATEGORY_COLORS
+            }
+        
+        return {
+            'statistics': {
+                'total_expenses': total_expenses,
+                'total_amount': total_amount,
+                'avg_expense': avg_expense
+            },
+            'charts': charts,
+            'monthly_statistics': monthly_statistics
+        }
@@ -0,0 +1,51 @@
+"""
+Signal handlers that invalidate per-user cached data and keep the search
+index in sync after expense and budget writes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import DashboardCache
+from .categories import invalidate_categories
+from .models import Budget, Expense, ExpenseCategory
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def invalidate_user_dashboard(sender, instance, **kwargs):
+    """Invalidate the owner's cached dashboard data"""
+    DashboardCache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def invalidate_user_budgets(sender, instance, **kwargs):
+    """Budget statuses are cached with the rest of the dashboard"""
+    DashboardCache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Expense)
+def index_expense(sender, instance, **kwargs):
+    """Keep the expense's description searchable"""
+    get_search_backend(instance._state.db).index_expense(instance)
+
+
+@receiver(post_delete, sender=Expense)
+def remove_expense_from_index(sender, instance, **kwargs):
+    """Drop a deleted expense from the search index"""
+    get_search_backend(instance._state.db).remove_expense(instance.pk)
+
+
+@receiver(post_save, sender=ExpenseCategory)
+def reindex_category_expenses(sender, instance, created, **kwargs):
+    """Category names are indexed with each expense, so refresh them on a rename"""
+    if not created:
+        get_search_backend(instance._state.db).index_queryset(Expense.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_delete, sender=ExpenseCategory)
+def invalidate_category_registry(sender, instance, **kwargs):
+    """Processes reload their category registry"""
+    invalidate_categories()
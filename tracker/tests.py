@@ -1,11 +1,58 @@
-from django.test import TestCase, Client
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, Client
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from tracker.models import Expense, ExpenseCategory
-from tracker.services import ExpenseService
+from tracker.models import Budget, Expense, ExpenseCategory, ExpenseDailyRollup, ExpenseMonthlyTotal, RecurringExpense
+from tracker.recurring import RecurringExpenseService
+from tracker.bulk import BulkExpenseService
+from tracker.services import BudgetService, ExpenseService, DashboardAggregator, RollupService
 from tracker.view_helpers import ExpenseViewHelper
+from tracker.pagination import ExpenseCursorPaginator
+from tracker.projections import ExpenseRow
+from tracker.cache import DashboardCache
+from tracker.importers import ExpenseImportService
+from tracker.instrumentation import timed
+from tracker.benchmarks import summarize_latencies
+from config.database import configure_connections, get_pool_mode, resolve_pool_mode
+from tracker.search import BasicSearchBackend, get_search_backend
+from tracker.periods import Period, get_period, get_periods, get_span
+from tracker.series import DailySeries
+from tracker.charts import chart_token, render_chart
+from tracker.categories import get_category_choices, get_category_registry
+from tracker.forms import ExpenseFilterForm, ExpenseForm
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.html import escape
+from tracker.utils import ExpenseUtils
+from django.utils import timezone
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
 from decimal import Decimal
-from datetime import date
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import csv
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+class QueryCountAssertionsMixin:
+    """Guard against N+1 queries by comparing query counts across data sizes"""
+
+    def assertConstantQueryCount(self, add_rows, run, sizes=(1, 10, 25)):
+        """Fail unless ``run()`` issues the same number of queries after each ``add_rows(n)``"""
+        counts = {}
+        for size in sizes:
+            add_rows(size)
+            with CaptureQueriesContext(connection) as context:
+                run()
+            counts[size] = len(context.captured_queries)
+        self.assertEqual(len(set(counts.values())), 1, f"Query count grows with the number of rows: {counts}")
 
 class ExpenseServiceTests(TestCase):
     def setUp(self):
@@ -36,8 +83,128 @@ class ExpenseServiceTests(TestCase):
         self.assertIn('Lunch', csv_data)
         self.assertIn('Dinner', csv_data)
 
+class DashboardAggregatorTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        food = ExpenseCategory.objects.create(name='Food')
+        travel = ExpenseCategory.objects.create(name='Travel')
+        today = date.today()
+        for offset, category, amount in [(0, food, '10.00'), (0, travel, '25.00'), (3, food, '5.50'),
+                                         (20, travel, '40.00'), (45, food, '7.25'), (400, travel, '99.00')]:
+            Expense.objects.create(user=self.user, category=category, amount=Decimal(amount),
+                                   date=today - timedelta(days=offset))
+        RollupService.rebuild(self.user)
+
+    def test_matches_per_widget_service_methods(self):
+        expenses = Expense.objects.filter(user=self.user)
+        result = DashboardAggregator(self.user, expenses).compute()
+        self.assertEqual(result['statistics'], ExpenseService.get_expense_statistics(self.user, expenses))
+        self.assertEqual(result['charts'], ExpenseService.get_chart_data(self.user, expenses))
+        monthly = ExpenseService.get_monthly_statistics(self.user)
+        self.assertEqual(result['monthly_statistics']['current_month_total'], monthly['current_month_total'])
+        self.assertEqual(result['monthly_statistics']['current_month_count'], monthly['current_month_count'])
+
+    def test_uses_two_queries(self):
+        get_category_registry()
+        with self.assertNumQueries(2):
+            DashboardAggregator(self.user).compute()
+
+    def test_rollup_source_matches_raw_expenses(self):
+        expenses = Expense.objects.filter(user=self.user)
+        from_rollup = DashboardAggregator(self.user, expenses, filters={'sort_by': '-date'}).compute()
+        from_expenses = DashboardAggregator(self.user, expenses).compute()
+        self.assertEqual(from_rollup, from_expenses)
+
+class RollupServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.travel = ExpenseCategory.objects.create(name='Travel')
+
+    def _rollup_state(self):
+        return sorted(ExpenseDailyRollup.objects.filter(user=self.user).values_list(
+            'category_id', 'date', 'amount', 'count'
+        ))
+
+    def _assert_rollup_matches_expenses(self):
+        maintained = self._rollup_state()
+        RollupService.rebuild(self.user)
+        self.assertEqual(maintained, self._rollup_state())
+
+    def test_add_edit_delete_keep_rollup_in_step(self):
+        for amount in ['10.00', '5.00']:
+            self.client.post(reverse('home'), {
+                'action': 'add_expense', 'category': self.food.id, 'amount': amount, 'date': date.today()
+            })
+        self.assertEqual(self._rollup_state(), [(self.food.id, date.today(), Decimal('15.00'), 2)])
+
+        expense = Expense.objects.filter(user=self.user).first()
+        moved_date = date.today() - timedelta(days=3)
+        self.client.post(reverse('home'), {
+            'action': 'edit_expense', 'expense_id': expense.id,
+            'category': self.travel.id, 'amount': '7.00', 'date': moved_date
+        })
+        self._assert_rollup_matches_expenses()
+        self.assertEqual(len(self._rollup_state()), 2)
+
+        self.client.post(reverse('home'), {'action': 'delete_expense', 'expense_id': expense.id})
+        self._assert_rollup_matches_expenses()
+        self.assertEqual(len(self._rollup_state()), 1)
+
+    def test_rebuild_rollups_command(self):
+        Expense.objects.create(user=self.user, category=self.food, amount=Decimal('3.00'), date=date.today())
+        self.assertEqual(self._rollup_state(), [])
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self._rollup_state(), [(self.food.id, date.today(), Decimal('3.00'), 1)])
+
+class MigrationBackfillTests(TransactionTestCase):
+    """Expenses that exist before an upgrade reach the tables derived from them"""
+    
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('tracker', target)])
+        return executor.loader.project_state([('tracker', target)]).apps
+    
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('tracker')[0][1])
+    
+    def seed(self, target):
+        apps = self.migrate(target)
+        user = apps.get_model('core', 'CustomUser').objects.create(username='upgraded', email='upgraded@example.com')
+        category = apps.get_model('tracker', 'ExpenseCategory').objects.create(name='Food')
+        Expense = apps.get_model('tracker', 'Expense')
+        today = timezone.localdate()
+        for amount, day in [('42.00', today), ('8.00', today), ('5.00', today - timedelta(days=40))]:
+            Expense.objects.create(user=user, category=category, amount=Decimal(amount), date=day)
+        return user.pk, category.pk, today
+    
+    def test_daily_rollups_are_backfilled(self):
+        user_id, category_id, today = self.seed('0001_initial')
+        ExpenseDailyRollup = self.migrate('0002_expensedailyrollup').get_model('tracker', 'ExpenseDailyRollup')
+        self.assertEqual(
+            sorted(ExpenseDailyRollup.objects.values_list('user_id', 'category_id', 'date', 'amount', 'count')),
+            [(user_id, category_id, today - timedelta(days=40), Decimal('5.00'), 1),
+             (user_id, category_id, today, Decimal('50.00'), 2)]
+        )
+    
+    def test_monthly_totals_are_backfilled(self):
+        user_id, category_id, today = self.seed('0004_expense_search_index')
+        ExpenseMonthlyTotal = self.migrate('0005_budgets').get_model('tracker', 'ExpenseMonthlyTotal')
+        self.assertEqual(
+            sorted(ExpenseMonthlyTotal.objects.values_list('user_id', 'category_id', 'month', 'amount', 'count')),
+            [(user_id, category_id, (today - timedelta(days=40)).replace(day=1), Decimal('5.00'), 1),
+             (user_id, category_id, today.replace(day=1), Decimal('50.00'), 2)]
+        )
+
 class ExpenseViewHelperTests(TestCase):
     def setUp(self):
+        cache.clear()
         User = get_user_model()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpass')
@@ -81,6 +248,7 @@ class ExpenseViewHelperTests(TestCase):
 
 class ViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         User = get_user_model()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpass')
@@ -99,5 +267,1289 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
         self.assertIn('attachment; filename=', response['Content-Disposition'])
-        self.assertIn('Lunch', response.content.decode())
+        self.assertIn('Lunch', b''.join(response.streaming_content).decode())
+
+    def test_export_expenses_csv_query_count_is_constant(self):
+        for day in range(30):
+            Expense.objects.create(user=self.user, category=self.category, amount=Decimal('1.00'),
+                                   date=date.today() - timedelta(days=day), description=f'Row {day}')
+        get_category_registry()
+        with self.assertNumQueries(1):
+            chunks = list(ExpenseService.iter_expenses_csv(self.user, chunk_size=7))
+        self.assertEqual(len(chunks), 1 + 5)  # header plus 31 rows in chunks of 7
+        self.assertEqual(''.join(chunks).count('\n'), 32)
+
+class ExpenseCursorPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = ExpenseCategory.objects.create(name='Food')
+        # Seven expenses over four days so that several rows share a date
+        for offset in range(7):
+            Expense.objects.create(
+                user=self.user, category=self.category,
+                amount=Decimal(offset + 1), date=date.today() - timedelta(days=offset // 2)
+            )
+        RollupService.rebuild(self.user)
+        self.queryset = Expense.objects.filter(user=self.user)
+
+    def _walk_forward(self, paginator):
+        seen = []
+        page = paginator.get_page()
+        seen.extend(expense.id for expense in page)
+        while page.has_next:
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(expense.id for expense in page)
+        return seen
+
+    def test_pages_cover_every_sort_key_in_order(self):
+        for sort_by in ['-date', 'date', '-amount', 'amount', 'category__name', '-category__name']:
+            paginator = ExpenseCursorPaginator(self.queryset, sort_by=sort_by, page_size=3)
+            tie_breaker = '-id' if sort_by.startswith('-') else 'id'
+            expected = list(self.queryset.order_by(sort_by, tie_breaker).values_list('id', flat=True))
+            self.assertEqual(self._walk_forward(paginator), expected, sort_by)
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = ExpenseCursorPaginator(self.queryset, sort_by='-date', page_size=3)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertFalse(first.has_previous)
+        self.assertTrue(second.has_previous)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual([e.id for e in back], [e.id for e in first])
+        self.assertFalse(back.has_previous)
+        self.assertTrue(back.has_next)
+
+    def test_invalid_or_foreign_cursor_falls_back_to_first_page(self):
+        paginator = ExpenseCursorPaginator(self.queryset, sort_by='-date', page_size=3)
+        first = paginator.get_page()
+        amount_cursor = ExpenseCursorPaginator(self.queryset, sort_by='amount', page_size=3).get_page().next_cursor
+        for cursor in ['garbage', amount_cursor]:
+            page = paginator.get_page(cursor)
+            self.assertEqual([e.id for e in page], [e.id for e in first])
+
+    def test_home_paginates_expense_list(self):
+        client = Client()
+        client.login(username='testuser', password='testpass')
+        with self.settings(EXPENSE_PAGE_SIZE=3):
+            response = client.get(reverse('home'))
+        self.assertEqual(len(response.context['expenses']), 3)
+        self.assertEqual(response.context['total_expenses'], 7)
+        self.assertIn('cursor=', response.context['next_page_query'])
+
+class ExpenseProjectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        for day in range(5):
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=self.food if day % 2 else self.rent, amount=Decimal(day + 1),
+                date=date(2024, 1, day + 1), description=f'Row {day}'
+            ))
+
+    def test_paginated_list_rows_are_projected(self):
+        paginator = ExpenseCursorPaginator(
+            ExpenseService.get_user_expenses(self.user), page_size=2, projection=ExpenseService.LIST_ROW
+        )
+        get_category_registry()
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page()
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('tracker_expensecategory', sql)
+        self.assertNotIn('created_at', sql)
+        self.assertIsInstance(page.object_list[0], ExpenseRow)
+        self.assertEqual([(row.date.day, row.category_name) for row in page], [(5, 'Rent'), (4, 'Food')])
+        self.assertFalse(hasattr(page.object_list[0], '__dict__'))
+
+        second = paginator.get_page(page.next_cursor)
+        self.assertEqual([row.description for row in second], ['Row 2', 'Row 1'])
+        self.assertEqual([row.pk for row in paginator.get_page(second.previous_cursor)], [row.pk for row in page])
+
+    def test_list_and_api_use_projected_rows(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertIsInstance(response.context['expenses'].object_list[0], ExpenseRow)
+        self.assertContains(response, '<td>Rent</td>', html=True)
+
+        results = self.client.get(reverse('api_expenses'), {'sort_by': 'category__name'}).json()['results']
+        self.assertEqual([result['category']['name'] for result in results], ['Food', 'Food', 'Rent', 'Rent', 'Rent'])
+        expense = Expense.objects.get(description='Row 0')
+        self.assertEqual(
+            self.client.get(reverse('api_expense_detail', args=[expense.pk])).json(),
+            next(result for result in results if result['id'] == expense.pk)
+        )
+
+    def test_export_rows_stream_projected_columns(self):
+        rows = list(ExpenseService.EXPORT_ROW.iter_rows(Expense.objects.filter(user=self.user).order_by('date'), chunk_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((rows[0].category_name, rows[0].amount, rows[0].description), ('Rent', Decimal('1.00'), 'Row 0'))
+        self.assertIsNotNone(rows[0].created_at)
+
+class ExplainExpenseQueriesTests(TestCase):
+    def test_no_full_table_scans(self):
+        output = StringIO()
+        call_command('explain_expense_queries', rows=200, users=3, strict=True, stdout=output)
+        self.assertNotIn('FULL SCAN', output.getvalue())
+
+@override_settings(DASHBOARD_CACHE_ENABLED=True)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.category = ExpenseCategory.objects.create(name='Food')
+
+    def test_second_lookup_is_served_from_cache(self):
+        DashboardCache.get_dashboard_aggregates(self.user)
+        with self.assertNumQueries(0):
+            DashboardCache.get_dashboard_aggregates(self.user)
+            DashboardCache.get_dashboard_aggregates(self.user, {'sort_by': 'amount'})
+
+    def test_writes_invalidate_cached_statistics(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['total_expenses'], 0)
+        self.client.post(reverse('home'), {
+            'action': 'add_expense', 'category': self.category.id, 'amount': '15.00', 'date': date.today()
+        })
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['total_expenses'], 1)
+
+        version = DashboardCache.get_version(self.user.pk)
+        ExpenseService.delete_expense(Expense.objects.filter(user=self.user).first())
+        self.assertGreater(DashboardCache.get_version(self.user.pk), version)
+        self.assertEqual(self.client.get(reverse('home')).context['total_expenses'], 0)
+
+    def test_filtered_statistics_count_expenses_not_rollup_rows(self):
+        for amount in ['5.00', '10.00', '15.00']:
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=self.category, amount=Decimal(amount), date=date.today()
+            ))
+        filters = {'date_from': date.today() - timedelta(days=1)}
+        expected = ExpenseService.get_expense_statistics(
+            self.user, ExpenseService.get_user_expenses(self.user, filters)
+        )
+        self.assertEqual(expected['total_expenses'], 3)
+        self.assertEqual(DashboardCache.get_expense_statistics(self.user, filters), expected)
+        self.assertEqual(expected['avg_expense'], Decimal('10.00'))
+
+    @override_settings(DASHBOARD_CACHE_ENABLED=False)
+    def test_nothing_is_cached_or_versioned_while_disabled(self):
+        DashboardCache.get_dashboard_aggregates(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            DashboardCache.get_dashboard_aggregates(self.user)
+        self.assertGreater(len(queries), 0)
+
+        response = self.client.get(reverse('api_chart_series', args=['monthly']))
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        token = chart_token(DashboardCache.get_version(self.user.pk))
+        svg = self.client.get(reverse('chart_svg', args=['monthly']), {'v': token})
+        self.assertIn('no-cache', svg['Cache-Control'])
+
+    def test_filter_signature_is_normalized(self):
+        signature = DashboardCache.filter_signature
+        self.assertEqual(
+            signature({'amount_min': Decimal('10.0'), 'search': '', 'sort_by': '-date'}),
+            signature({'amount_min': Decimal('10.00'), 'category': None})
+        )
+        self.assertEqual(signature({'category': self.category}), signature({'category': self.category.pk}))
+        self.assertNotEqual(signature({'search': 'lunch'}), signature({}))
+
+class QueryCountTests(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='admin', password='testpass', email='admin@example.com')
+        self.client.login(username='admin', password='testpass')
+        # New categories would reload the category registry mid-test
+        for index in range(7):
+            ExpenseCategory.objects.create(name=f'Category {index}')
+        get_category_choices()
+
+    def _add_expenses(self, count):
+        for index in range(count):
+            category, _ = ExpenseCategory.objects.get_or_create(name=f'Category {index % 7}')
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=category, amount=Decimal('5.00'),
+                date=date.today() - timedelta(days=index), description=f'Expense {index}'
+            ))
+
+    def test_dashboard_query_count_is_constant(self):
+        self.assertConstantQueryCount(self._add_expenses, lambda: self.client.get(reverse('home')))
+
+    def test_csv_export_query_count_is_constant(self):
+        self.assertConstantQueryCount(
+            self._add_expenses, lambda: b''.join(self.client.get(reverse('export_expenses_csv')).streaming_content)
+        )
+
+    def test_admin_changelist_query_count_is_constant(self):
+        self.assertConstantQueryCount(
+            self._add_expenses, lambda: self.client.get(reverse('admin:tracker_expense_changelist'))
+        )
+
+class ExpenseImportServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+
+    def _csv(self, *lines):
+        return ('\n'.join(lines) + '\n').encode()
+
+    def test_round_trip_of_exported_csv(self):
+        Expense.objects.create(user=self.user, category=self.food, amount=Decimal('10.50'),
+                               date=date(2025, 1, 2), description='Lunch, with "quotes"')
+        exported = ExpenseService.export_expenses_to_csv(self.user).encode()
+        Expense.objects.all().delete()
+
+        report = ExpenseImportService.import_csv(self.user, SimpleUploadedFile('e.csv', exported), batch_size=1)
+        self.assertEqual(report, {'created': 1, 'errors': []})
+        expense = Expense.objects.get(user=self.user)
+        self.assertEqual((expense.amount, expense.date, expense.description),
+                         (Decimal('10.50'), date(2025, 1, 2), 'Lunch, with "quotes"'))
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        data = self._csv(
+            'Date,Category,Amount,Description',
+            '2025-01-01,Food,12.00,ok',
+            '2025-13-01,Food,5.00,bad date',
+            '2025-01-02,Rent,5.00,unknown category',
+            '2025-01-03,Food,-1,negative',
+            '2025-01-04,Food,abc,not a number',
+            '2025-01-05,Food,1.005,too precise',
+            '',
+            '2025-01-01,Food,3.00,',
+        )
+        report = ExpenseImportService.import_csv(self.user, io.BytesIO(data), batch_size=2)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([line for line, _ in report['errors']], [3, 4, 5, 6, 7])
+        self.assertEqual(
+            list(ExpenseDailyRollup.objects.filter(user=self.user).values_list('date', 'amount', 'count')),
+            [(date(2025, 1, 1), Decimal('15.00'), 2)]
+        )
+
+    def test_undecodable_and_malformed_lines_are_reported(self):
+        data = b'\n'.join([
+            'Date,Category,Amount,Description'.encode(),
+            '2025-01-01,Food,4.00,Café'.encode('latin-1'),
+            '2025-01-02,Food,6.00,Crème brûlée'.encode(),
+            b'2025-01-03,Food,1.00,' + b'x' * (csv.field_size_limit() + 1),
+            b'2025-01-04,Food,2.00,"multi',
+            b'line"',
+        ]) + b'\n'
+        report = ExpenseImportService.import_csv(self.user, io.BytesIO(data))
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([line for line, _ in report['errors']], [2, 4])
+        self.assertIn('UTF-8', report['errors'][0][1])
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=self.user).values_list('description', flat=True)),
+            ['Crème brûlée', 'multi\nline']
+        )
+
+        latin_header = 'Date,Catégorie,Category,Amount'.encode('latin-1') + b'\n'
+        report = ExpenseImportService.import_csv(self.user, io.BytesIO(latin_header))
+        self.assertEqual(report, {'created': 0, 'errors': [(1, report['errors'][0][1])]})
+
+    def test_missing_columns(self):
+        report = ExpenseImportService.import_csv(self.user, io.BytesIO(self._csv('Date,Amount', '2025-01-01,1')))
+        self.assertEqual(report['created'], 0)
+        self.assertIn('Category', report['errors'][0][1])
+
+    def test_import_view(self):
+        upload = SimpleUploadedFile('expenses.csv', self._csv('Date,Category,Amount', '2025-01-01,Food,9.99'))
+        response = self.client.post(reverse('import_expenses_csv'), {'csv_file': upload})
+        self.assertRedirects(response, reverse('home'))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.client.get(reverse('home')).context['total_expenses'], 1)
+
+class BenchmarkCommandTests(TestCase):
+    def test_writes_json_results_for_each_size_and_case(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command('benchmark_tracker', sizes='20,40', repeat=1, output=path, stdout=StringIO())
+            with open(path) as results_file:
+                report = json.load(results_file)
+
+        self.assertEqual(report['meta']['sizes'], [20, 40])
+        benchmarks = {result['benchmark'] for result in report['results']}
+        self.assertIn('GET home (cold cache)', benchmarks)
+        self.assertIn('ExpenseService.export_expenses_to_csv', benchmarks)
+        for result in report['results']:
+            self.assertGreaterEqual(result['queries'], 0)
+            self.assertIn('peak_memory_kb', result)
+        # The seeded data is rolled back
+        self.assertFalse(Expense.objects.exists())
+
+    def test_session_benchmark_counts_queries_per_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command('benchmark_sessions', rows=20, requests=2, output=path, stdout=StringIO())
+            with open(path) as results_file:
+                report = json.load(results_file)
+
+        results = {result['profile']: result for result in report['results']}
+        self.assertEqual(results['db']['session_reads'], 1)
+        self.assertEqual(results['db']['user_reads'], 1)
+        for profile in ('cached', 'cookie'):
+            self.assertEqual(results[profile]['session_reads'] + results[profile]['user_reads'], 0)
+            self.assertEqual(results[profile]['queries'], results['db']['queries'] - 2)
+        self.assertFalse(get_user_model().objects.filter(username__startswith='sessiontest').exists())
+
+    def test_latency_summary_uses_nearest_rank_percentiles(self):
+        latencies = [index / 1000 for index in range(1, 101)]
+        summary = summarize_latencies('GET home', 4, latencies, elapsed=2.0)
+        self.assertEqual(summary['p50_ms'], 50.0)
+        self.assertEqual(summary['p99_ms'], 99.0)
+        self.assertEqual(summary['max_ms'], 100.0)
+        self.assertEqual(summary['throughput_rps'], 50.0)
+
+class ConnectionModeTests(TestCase):
+    POSTGRES = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'tracker', 'CONN_MAX_AGE': 0, 'OPTIONS': {}}
+    SQLITE = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3', 'CONN_MAX_AGE': 0, 'OPTIONS': {}}
+    
+    def test_auto_uses_the_pool_on_postgresql_with_psycopg_pool(self):
+        with mock.patch('config.database.has_psycopg_pool', return_value=True):
+            database = configure_connections(self.POSTGRES, 'auto', pool_min_size=1, pool_max_size=4, pool_timeout=5)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 1, 'max_size': 4, 'timeout': 5})
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertFalse(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(get_pool_mode(database), 'pool')
+        # The settings passed in are left alone
+        self.assertEqual(self.POSTGRES['OPTIONS'], {})
+    
+    def test_auto_falls_back_to_health_checked_persistent_connections(self):
+        for database, has_pool in [(self.SQLITE, True), (self.POSTGRES, False)]:
+            with mock.patch('config.database.has_psycopg_pool', return_value=has_pool):
+                configured = configure_connections(database, 'auto', conn_max_age=300)
+            self.assertEqual(configured['CONN_MAX_AGE'], 300)
+            self.assertTrue(configured['CONN_HEALTH_CHECKS'])
+            self.assertNotIn('pool', configured['OPTIONS'])
+            self.assertEqual(get_pool_mode(configured), 'persistent')
+    
+    def test_none_drops_a_configured_pool(self):
+        pooled = {**self.POSTGRES, 'OPTIONS': {'pool': {'max_size': 4}, 'sslmode': 'require'}}
+        database = configure_connections(pooled, 'none')
+        self.assertEqual(database['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(get_pool_mode(database), 'none')
+    
+    def test_invalid_modes_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            resolve_pool_mode(self.SQLITE, 'pooled')
+        with self.assertRaises(ImproperlyConfigured):
+            resolve_pool_mode(self.SQLITE, 'pool')
+        with mock.patch('config.database.has_psycopg_pool', return_value=False):
+            with self.assertRaises(ImproperlyConfigured):
+                resolve_pool_mode(self.POSTGRES, 'pool')
+
+class ConnectionLoadCommandTests(TransactionTestCase):
+    def test_persistent_connections_are_reused_across_requests(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command(
+                'loadtest_connections', modes='persistent,pool', rows=20, concurrency=2, requests=10,
+                output=path, stdout=StringIO()
+            )
+            with open(path) as results_file:
+                report = json.load(results_file)
+        
+        # pool is skipped on SQLite
+        [result] = report['results']
+        self.assertEqual(result['mode'], 'persistent')
+        self.assertEqual(result['requests'], 10)
+        self.assertEqual(result['errors'], 0)
+        self.assertLessEqual(result['connections'], 2)
+        self.assertGreaterEqual(result['requests_per_connection'], 5)
+        self.assertFalse(get_user_model().objects.filter(username__startswith='conntest').exists())
+
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = ExpenseCategory.objects.create(name='Food')
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('10.00'), date=date.today())
+
+    def _get_home(self):
+        client = Client()
+        client.login(username='testuser', password='testpass')
+        return client.get(reverse('home'))
+
+    def test_server_timing_header_and_log_line(self):
+        with self.settings(TRACKER_TIMING_ENABLED=True), self.assertLogs('tracker.timing', level='INFO') as logs:
+            response = self._get_home()
+        header = response['Server-Timing']
+        self.assertIn('total;dur=', header)
+        self.assertIn('db;desc="', header)
+        self.assertIn('get_dashboard_context;', header)
+        self.assertIn('DashboardAggregator.compute;', header)
+        self.assertIn('render;', header)
+
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['path'], reverse('home'))
+        self.assertGreater(entry['queries'], 0)
+        self.assertIn('render', entry['sections'])
+
+    def test_disabled_by_default(self):
+        with self.settings(TRACKER_TIMING_ENABLED=False):
+            response = self._get_home()
+        self.assertNotIn('Server-Timing', response)
+
+    def test_timed_is_transparent_outside_requests(self):
+        @timed
+        def add(a, b):
+            return a + b
+        self.assertEqual(add(2, 3), 5)
+        self.assertEqual(add.__name__, 'add')
+
+@override_settings(DASHBOARD_CACHE_ENABLED=True)
+class ExpenseApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.category = ExpenseCategory.objects.create(name='Food')
+        self.expense = ExpenseService.save_expense(Expense(
+            user=self.user, category=self.category, amount=Decimal('12.50'), date=date.today(), description='Lunch'
+        ))
+
+    def test_requires_login(self):
+        response = Client().get(reverse('api_expenses'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['error'], 'Authentication required')
+
+    def test_list_is_paginated_with_cursors(self):
+        for index in range(3):
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=self.category, amount=Decimal('1.00'), date=date.today() - timedelta(days=index + 1)
+            ))
+        data = self.client.get(reverse('api_expenses'), {'page_size': 2}).json()
+        self.assertEqual([row['id'] for row in data['results']][0], self.expense.pk)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['previous_cursor'])
+
+        second = self.client.get(reverse('api_expenses'), {'page_size': 2, 'cursor': data['next_cursor']}).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_create_update_and_delete(self):
+        response = self.client.post(
+            reverse('api_expenses'),
+            json.dumps({'category': self.category.pk, 'amount': '20.00', 'date': date.today().isoformat()}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        created = response.json()
+        self.assertEqual(created['amount'], '20.00')
+        self.assertEqual(created['category']['name'], 'Food')
+
+        url = reverse('api_expense_detail', args=[created['id']])
+        response = self.client.patch(url, json.dumps({'amount': '25.00'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['amount'], '25.00')
+        self.assertEqual(response.json()['date'], date.today().isoformat())
+        self.assertEqual(
+            ExpenseDailyRollup.objects.get(user=self.user, date=date.today()).amount, Decimal('37.50')
+        )
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Expense.objects.filter(pk=created['id']).exists())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_invalid_expense_returns_errors(self):
+        response = self.client.post(
+            reverse('api_expenses'), json.dumps({'amount': 'abc'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.json()['errors'])
+
+    def test_other_users_expenses_are_not_found(self):
+        get_user_model().objects.create_user(username='other', email='other@example.com', password='testpass')
+        client = Client()
+        client.login(username='other', password='testpass')
+        self.assertEqual(client.get(reverse('api_expense_detail', args=[self.expense.pk])).status_code, 404)
+        self.assertEqual(client.delete(reverse('api_expense_detail', args=[self.expense.pk])).status_code, 404)
+        self.assertTrue(Expense.objects.filter(pk=self.expense.pk).exists())
+
+    def test_chart_series(self):
+        data = self.client.get(reverse('api_chart_series', args=['category'])).json()
+        self.assertEqual(data['labels'], ['Food'])
+        self.assertEqual(data['amounts'], [12.5])
+        daily = self.client.get(reverse('api_chart_series', args=['daily'])).json()
+        self.assertEqual(len(daily['amounts']), 30)
+        self.assertEqual(daily['amounts'][-1], 12.5)
+        self.assertEqual(sum(daily['amounts']), 12.5)
+        self.assertEqual(self.client.get(reverse('api_chart_series', args=['yearly'])).status_code, 404)
+
+    def test_conditional_requests_return_304_until_a_write(self):
+        url = reverse('api_chart_series', args=['monthly'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # Only the session and user lookups of the authentication middleware
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        ExpenseService.delete_expense(self.expense)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+class AsyncDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = ExpenseCategory.objects.create(name='Food')
+        for amount in ('10.00', '30.00'):
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=self.category, amount=Decimal(amount), date=date.today()
+            ))
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    async def test_async_dashboard_matches_sync_dashboard(self):
+        response = await self.async_client.get(reverse('home_async'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'tracker/home.html')
+        self.assertEqual(response.context['total_expenses'], 2)
+        self.assertEqual(response.context['total_amount'], Decimal('40.00'))
+        self.assertEqual(response.context['current_month_count'], 2)
+        self.assertEqual(len(response.context['expense_page']), 2)
 
+        await cache.aclear()
+        sync_response = await sync_to_async(self.client.get)(reverse('home'))
+        for key in ('total_expenses', 'total_amount', 'avg_expense', 'current_month_total', 'month_change'):
+            self.assertEqual(response.context[key], sync_response.context[key], key)
+        self.assertEqual(
+            [chart['series'] for chart in response.context['charts']],
+            [chart['series'] for chart in sync_response.context['charts']]
+        )
+
+    async def test_async_dashboard_respects_filters(self):
+        response = await self.async_client.get(reverse('home_async'), {'amount_min': '20'})
+        self.assertEqual(response.context['total_expenses'], 1)
+        self.assertEqual([expense.amount for expense in response.context['expenses']], [Decimal('30.00')])
+
+    async def test_guest_is_served_the_guest_dashboard(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('home_async'))
+        self.assertTemplateUsed(response, 'tracker/guest_dashboard.html')
+
+    async def test_timing_middleware_counts_async_queries(self):
+        with self.settings(TRACKER_TIMING_ENABLED=True), self.assertLogs('tracker.timing', level='INFO') as logs:
+            response = await self.async_client.get(reverse('home_async'))
+        self.assertIn('DashboardAggregator.acompute;', response['Server-Timing'])
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertGreater(entry['queries'], 0)
+
+class SearchBackendTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.transport = ExpenseCategory.objects.create(name='Transport')
+        self.groceries = self._add(self.food, 'Weekly groceries')
+        self.taxi = self._add(self.transport, 'Taxi to the airport')
+        self.rent = self._add(self.transport, 'Rent')
+
+    def _add(self, category, description):
+        return ExpenseService.save_expense(Expense(
+            user=self.user, category=category, amount=Decimal('10.00'), date=date.today(), description=description
+        ))
+
+    def _search(self, term, **filters):
+        return list(ExpenseService.get_user_expenses(self.user, {'search': term, **filters}))
+
+    def test_sqlite_uses_fts5(self):
+        self.assertEqual(get_search_backend().name, 'sqlite-fts5')
+
+    def test_prefix_and_category_matches(self):
+        self.assertEqual(self._search('gro'), [self.groceries])
+        self.assertEqual(self._search('AIRPORT taxi'), [self.taxi])
+        self.assertCountEqual(self._search('transp'), [self.taxi, self.rent])
+
+    def test_index_follows_edits_and_deletes(self):
+        before = RollupService.snapshot(self.rent)
+        self.rent.description = 'Monthly parking'
+        ExpenseService.save_expense(self.rent, before=before)
+        self.assertEqual(self._search('parking'), [self.rent])
+        self.assertEqual(self._search('rent'), [])
+
+        ExpenseService.delete_expense(self.taxi)
+        self.assertEqual(self._search('taxi'), [])
+
+    def test_indexing_reads_no_category(self):
+        get_category_registry()
+        expense = Expense(
+            user=self.user, category_id=self.food.pk, amount=Decimal('10.00'), date=date.today(),
+            description='Farmers market'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            expense.save()
+        self.assertFalse(any('tracker_expensecategory' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(self._search('food market'), [expense])
+
+    def test_category_rename_is_reindexed(self):
+        self.transport.name = 'Travel'
+        self.transport.save()
+        self.assertCountEqual(self._search('trav'), [self.taxi, self.rent])
+        self.assertEqual(self._search('transport'), [])
+
+    def test_query_syntax_in_input_is_literal(self):
+        self.assertEqual(self._search('taxi OR "rent'), [])
+        self.assertEqual(self._search('*'), [])
+
+    def test_relevance_sort_is_paginated_by_rank(self):
+        best = self._add(self.food, 'Groceries, groceries and more groceries')
+        filters = {'search': 'groceries', 'sort_by': ExpenseService.RELEVANCE_SORT}
+        expenses = ExpenseService.get_user_expenses(self.user, filters)
+        paginator = ExpenseCursorPaginator(expenses, sort_by=ExpenseService.get_sort_by(filters), page_size=1)
+        first = paginator.get_page()
+        self.assertEqual(list(first), [best])
+        self.assertEqual(list(paginator.get_page(first.next_cursor)), [self.groceries])
+
+        # Without a search term the relevance sort falls back to the default
+        self.assertIsNone(ExpenseService.get_sort_by({'sort_by': ExpenseService.RELEVANCE_SORT}))
+
+    def test_imported_rows_are_indexed(self):
+        upload = io.BytesIO(b'Date,Category,Amount,Description\n2024-03-01,Food,5.00,Bakery bread\n')
+        ExpenseImportService.import_csv(self.user, upload)
+        self.assertEqual([expense.description for expense in self._search('bakery')], ['Bakery bread'])
+
+    def test_basic_backend_matches_substrings(self):
+        queryset = Expense.objects.filter(user=self.user)
+        self.assertEqual(list(BasicSearchBackend().search(queryset, 'ocer')), [self.groceries])
+        ranked = BasicSearchBackend().search(queryset, 'transport', ranked=True)
+        self.assertEqual({expense.search_rank for expense in ranked}, {0.0})
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM tracker_expense_fts')
+        self.assertEqual(self._search('taxi'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self._search('taxi'), [self.taxi])
+
+class PeriodTests(TestCase):
+    def test_period_boundaries_are_half_open(self):
+        day = date(2024, 12, 18)
+        self.assertEqual(get_period('day', day), Period(day, date(2024, 12, 19)))
+        self.assertEqual(get_period('week', day), Period(date(2024, 12, 16), date(2024, 12, 23)))
+        self.assertEqual(get_period('month', day), Period(date(2024, 12, 1), date(2025, 1, 1)))
+        self.assertEqual(get_period('quarter', day), Period(date(2024, 10, 1), date(2025, 1, 1)))
+        self.assertEqual(get_period('year', day), Period(date(2024, 1, 1), date(2025, 1, 1)))
+        self.assertIn(date(2024, 12, 31), get_period('month', day))
+        self.assertNotIn(date(2025, 1, 1), get_period('month', day))
+
+    def test_get_periods_counts_back_across_years(self):
+        months = get_periods('month', 3, date(2024, 1, 31))
+        self.assertEqual([period.start for period in months], [date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1)])
+        self.assertEqual(months[1].last_day, date(2023, 12, 31))
+        self.assertEqual(get_span('day', 30, date(2024, 3, 1)), Period(date(2024, 2, 1), date(2024, 3, 2)))
+
+    def test_today_follows_the_active_time_zone(self):
+        utc_now = datetime(2024, 3, 31, 12, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=utc_now):
+            self.assertEqual(get_period('month').start, date(2024, 3, 1))
+            with timezone.override('Pacific/Kiritimati'):
+                self.assertEqual(get_period('month').start, date(2024, 4, 1))
+                self.assertEqual(ExpenseUtils.get_date_range('quarter'), Period(date(2024, 4, 1), date(2024, 7, 1)))
+
+    def test_monthly_buckets_split_on_the_first_of_the_month(self):
+        User = get_user_model()
+        user = User.objects.create_user(username='testuser', password='testpass')
+        category = ExpenseCategory.objects.create(name='Food')
+        for day, amount in [(date(2024, 2, 29), '10.00'), (date(2024, 3, 1), '20.00'), (date(2024, 3, 31), '5.00')]:
+            ExpenseService.save_expense(Expense(user=user, category=category, amount=Decimal(amount), date=day))
+
+        utc_now = datetime(2024, 3, 31, 12, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=utc_now):
+            trends = ExpenseService.get_monthly_trends(user, months=2)
+            monthly = ExpenseService.get_monthly_statistics(user)
+            result = DashboardAggregator(user).compute()
+        self.assertEqual(trends, {'labels': ['Feb 2024', 'Mar 2024'], 'data': [10.0, 25.0]})
+        self.assertEqual(monthly['current_month_total'], Decimal('25.00'))
+        self.assertEqual(monthly['month_change'], Decimal('150'))
+        self.assertEqual(result['charts']['monthly']['data'][-2:], [10.0, 25.0])
+
+class DailySeriesTests(TestCase):
+    def test_totals_are_gap_filled_and_rounded_to_cents(self):
+        span = Period(date(2024, 3, 4), date(2024, 3, 18))
+        series = DailySeries(span).add_rows([
+            (date(2024, 3, 4), Decimal('10.10')),
+            (date(2024, 3, 5), Decimal('20.20')),
+            (date(2024, 3, 17), Decimal('1.00')),
+            (date(2024, 3, 18), Decimal('99.00')),
+        ])
+        self.assertEqual(series.totals(get_periods('week', 2, date(2024, 3, 11))), [30.3, 1.0])
+        days = get_periods('day', 3, date(2024, 3, 6))
+        self.assertEqual(series.totals(days), [10.1, 20.2, 0.0])
+
+    def test_chart_data_fetches_all_trends_at_once(self):
+        User = get_user_model()
+        user = User.objects.create_user(username='testuser', password='testpass')
+        category = ExpenseCategory.objects.create(name='Food')
+        today = timezone.localdate()
+        for days_ago in (0, 3, 40):
+            ExpenseService.save_expense(Expense(
+                user=user, category=category, amount=Decimal('10.00'), date=today - timedelta(days=days_ago)
+            ))
+
+        # One grouped query for the three trends, one for the categories;
+        # the labels come from the category registry
+        get_category_registry()
+        with self.assertNumQueries(2):
+            charts = dict(ExpenseService.get_chart_data(user))
+        self.assertEqual(len(charts['daily']['amounts']), 30)
+        self.assertEqual(len(charts['weekly']['amounts']), 8)
+        self.assertEqual(sum(charts['daily']['amounts']), 20.0)
+        self.assertEqual(sum(charts['monthly']['data']), 30.0)
+        self.assertEqual(charts['monthly'], ExpenseService.get_monthly_trends(user))
+
+
+@override_settings(DASHBOARD_CACHE_ENABLED=True)
+class ChartSvgTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food & Drink')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        today = timezone.localdate()
+        for category, amount in [(self.food, '25.00'), (self.rent, '75.00')]:
+            ExpenseService.save_expense(Expense(user=self.user, category=category, amount=Decimal(amount), date=today))
+        self.client.force_login(self.user)
+
+    def test_render_chart_draws_every_series(self):
+        charts = ExpenseService.get_chart_data(self.user)
+        pie = render_chart('category', charts['category'])
+        self.assertTrue(pie.startswith('<svg xmlns="http://www.w3.org/2000/svg"'))
+        self.assertEqual(pie.count('<path '), 2)
+        self.assertIn('Food &amp; Drink (25%)', pie)
+        daily = render_chart('daily', charts['daily'])
+        self.assertEqual(daily.count('<rect '), 30)
+        self.assertNotIn('http://', daily.replace('http://www.w3.org/2000/svg', ''))
+        self.assertIn('No expenses to show', render_chart('weekly', {'labels': ['a'], 'amounts': [0.0]}))
+
+    def test_dashboard_links_versioned_chart_images(self):
+        response = self.client.get(reverse('home'), {'category': self.food.pk})
+        charts = response.context['charts']
+        self.assertEqual([chart['series'] for chart in charts], ['category', 'monthly', 'weekly', 'daily'])
+        self.assertIn(f'category={self.food.pk}', charts[0]['url'])
+        self.assertContains(response, f'src="{escape(charts[0]["url"])}"')
+        self.assertNotContains(response, 'chart.js')
+
+        svg_response = self.client.get(charts[0]['url'])
+        self.assertEqual(svg_response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', svg_response['Cache-Control'])
+        self.assertIn('max-age=31536000', svg_response['Cache-Control'])
+        self.assertEqual(svg_response.content.decode().count('<path '), 0)
+        self.assertEqual(svg_response.content.decode().count('<circle '), 1)
+
+    def test_stale_token_revalidates_and_svg_is_cached(self):
+        url = reverse('chart_svg', args=['category'])
+        response = self.client.get(url, {'v': 'stale'})
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with self.assertNumQueries(2):  # session and user only
+            self.client.get(url)
+
+        ExpenseService.save_expense(Expense(
+            user=self.user, category=self.food, amount=Decimal('100.00'), date=timezone.localdate()
+        ))
+        self.assertIn('Food &amp; Drink (62%)', self.client.get(url).content.decode())
+        self.assertEqual(self.client.get(reverse('chart_svg', args=['nope'])).status_code, 404)
+
+
+    def test_chart_data_computes_series_on_first_read(self):
+        get_category_registry()
+        with self.assertNumQueries(0):
+            charts = ExpenseService.get_chart_data(self.user, series=['weekly', 'category'])
+        self.assertEqual(list(charts), ['weekly', 'category'])
+        with self.assertNumQueries(1):
+            self.assertEqual(charts['category']['labels'], ['Rent', 'Food & Drink'])
+            self.assertEqual(charts['category']['amounts'], [75.0, 25.0])
+        with self.assertNumQueries(1):
+            self.assertEqual(sum(charts['weekly']['amounts']), 100.0)
+        self.assertNotIn('monthly', charts)
+        with self.assertRaises(KeyError):
+            charts['monthly']
+
+        self.assertEqual(DashboardAggregator(self.user, charts=()).compute()['charts'], {})
+        self.assertEqual(list(DashboardAggregator(self.user, charts=['daily']).compute()['charts']), ['daily'])
+
+    def test_chart_selector_limits_images_and_api_series(self):
+        response = self.client.get(reverse('home'), {'charts': 'daily,category'})
+        self.assertEqual([chart['series'] for chart in response.context['charts']], ['category', 'daily'])
+        self.assertNotContains(response, reverse('chart_svg', args=['monthly']))
+        # The charts fragment is cached per selection
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, reverse('chart_svg', args=['monthly']))
+        self.assertEqual(len(self.client.get(reverse('home'), {'charts': 'nope'}).context['charts']), 4)
+
+        response = self.client.get(reverse('api_charts'), {'charts': 'category,weekly'})
+        self.assertEqual(list(response.json()), ['category', 'weekly'])
+        self.assertEqual(response.json()['category']['amounts'], [75.0, 25.0])
+        self.assertEqual(len(self.client.get(reverse('api_charts')).json()), 4)
+        self.assertEqual(self.client.get(reverse('api_charts'), {'charts': 'pie'}).status_code, 400)
+
+class BudgetTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        self.today = timezone.localdate()
+        self.month = self.today.replace(day=1)
+        self.client.force_login(self.user)
+
+    def _add(self, amount, category=None, day=None):
+        return ExpenseService.save_expense(Expense(
+            user=self.user, category=category or self.food, amount=Decimal(amount), date=day or self.today
+        ))
+
+    def _totals(self):
+        return sorted(ExpenseMonthlyTotal.objects.filter(user=self.user).values_list(
+            'category_id', 'month', 'amount', 'count'
+        ))
+
+    def test_monthly_totals_follow_expense_writes(self):
+        expense = self._add('10.00')
+        self._add('5.00')
+        self.assertEqual(self._totals(), [(self.food.id, self.month, Decimal('15.00'), 2)])
+
+        last_month = self.month - timedelta(days=1)
+        before = RollupService.snapshot(expense)
+        expense.date = last_month
+        expense.category = self.rent
+        ExpenseService.save_expense(expense, before=before)
+        self.assertEqual(self._totals(), [
+            (self.food.id, self.month, Decimal('5.00'), 1),
+            (self.rent.id, last_month.replace(day=1), Decimal('10.00'), 1),
+        ])
+
+        ExpenseService.delete_expense(expense)
+        maintained = self._totals()
+        BudgetService.rebuild(self.user)
+        self.assertEqual(maintained, self._totals())
+        self.assertEqual(maintained, [(self.food.id, self.month, Decimal('5.00'), 1)])
+
+    def test_budget_status_flags_over_budget_categories(self):
+        BudgetService.set_budget(self.user, self.food, Decimal('20.00'))
+        BudgetService.set_budget(self.user, self.rent, Decimal('100.00'))
+        self._add('25.00')
+        self._add('40.00', self.rent)
+        self._add('1000.00', self.rent, self.month - timedelta(days=1))
+
+        with self.assertNumQueries(1):
+            status = BudgetService.get_budget_status(self.user)
+        food, rent = status['budgets']
+        self.assertEqual((food['spent'], food['remaining'], food['over_budget']), (Decimal('25.00'), Decimal('-5.00'), True))
+        self.assertEqual((rent['spent'], rent['remaining'], rent['over_budget']), (Decimal('40.00'), Decimal('60.00'), False))
+        self.assertEqual(rent['percent_used'], 40)
+        self.assertEqual(status['over_budget_count'], 1)
+        self.assertEqual(status['budget_remaining'], Decimal('55.00'))
+
+    def test_dashboard_sets_budgets_and_warns_when_exceeded(self):
+        response = self.client.post(reverse('home'), {
+            'action': 'set_budget', 'budget-category': self.food.pk, 'budget-monthly_limit': '30.00'
+        })
+        self.assertRedirects(response, reverse('home'))
+        self.assertEqual(Budget.objects.get(user=self.user).monthly_limit, Decimal('30.00'))
+
+        response = self.client.post(reverse('home'), {
+            'action': 'add_expense', 'category': self.food.pk, 'amount': '45.00', 'date': self.today.isoformat()
+        }, follow=True)
+        self.assertContains(response, 'Food is over budget by Rp 15.00')
+        self.assertEqual(response.context['over_budget_count'], 1)
+        self.assertTrue(response.context['budgets'][0]['over_budget'])
+
+        self.client.post(reverse('home'), {'action': 'delete_budget', 'category_id': self.food.pk})
+        self.assertFalse(Budget.objects.exists())
+        self.assertEqual(self.client.get(reverse('home')).context['budgets'], [])
+
+    def test_recompute_budgets_command(self):
+        self._add('3.00')
+        ExpenseMonthlyTotal.objects.all().delete()
+        call_command('recompute_budgets', stdout=StringIO())
+        self.assertEqual(self._totals(), [(self.food.id, self.month, Decimal('3.00'), 1)])
+
+
+class RecurringExpenseTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        self.client.force_login(self.user)
+
+    def _rule(self, start, frequency=RecurringExpense.MONTHLY, **kwargs):
+        return RecurringExpense.objects.create(
+            user=self.user, category=self.rent, amount=Decimal('500.00'), description='Flat rent',
+            frequency=frequency, start_date=start, next_run=start, **kwargs
+        )
+
+    def test_monthly_rule_keeps_the_start_day(self):
+        rule = self._rule(date(2024, 1, 31))
+        dates, next_run = RecurringExpenseService.due_dates(rule, date(2024, 4, 30))
+        self.assertEqual(dates, [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        self.assertEqual(next_run, date(2024, 5, 31))
+
+        weekly = self._rule(date(2024, 1, 1), RecurringExpense.WEEKLY, interval=2, end_date=date(2024, 1, 31))
+        self.assertEqual(
+            RecurringExpenseService.due_dates(weekly, date(2024, 12, 31)),
+            ([date(2024, 1, 1), date(2024, 1, 15), date(2024, 1, 29)], date(2024, 2, 12))
+        )
+
+    def test_run_due_catches_up_once_and_updates_derived_data(self):
+        self._rule(date(2024, 1, 15))
+        finished = self._rule(date(2024, 1, 1), RecurringExpense.YEARLY, end_date=date(2024, 6, 1))
+        version = DashboardCache.get_version(self.user.pk)
+
+        self.assertEqual(RecurringExpenseService.run_due(today=date(2024, 3, 20)), (2, 4))
+        self.assertEqual(RecurringExpenseService.run_due(today=date(2024, 3, 20)), (0, 0))
+        self.assertEqual(
+            sorted(Expense.objects.values_list('date', flat=True)),
+            [date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 15), date(2024, 3, 15)]
+        )
+        finished.refresh_from_db()
+        self.assertFalse(finished.active)
+
+        self.assertEqual(ExpenseMonthlyTotal.objects.get(month=date(2024, 1, 1)).amount, Decimal('1000.00'))
+        self.assertEqual(ExpenseDailyRollup.objects.filter(user=self.user).count(), 4)
+        self.assertNotEqual(DashboardCache.get_version(self.user.pk), version)
+        self.assertEqual(ExpenseService.get_user_expenses(self.user, {'search': 'flat'}).count(), 4)
+
+    def test_claim_skips_rules_another_worker_advanced(self):
+        rule = self._rule(date(2024, 1, 15))
+        stale = RecurringExpense.objects.get(pk=rule.pk)
+        self.assertEqual(RecurringExpenseService.claim(rule, date(2024, 1, 20)), [date(2024, 1, 15)])
+        self.assertIsNone(RecurringExpenseService.claim(stale, date(2024, 1, 20)))
+
+    def test_existing_occurrences_are_not_duplicated(self):
+        rule = self._rule(date(2024, 1, 15))
+        RecurringExpenseService.run_due(today=date(2024, 1, 15))
+        RecurringExpense.objects.filter(pk=rule.pk).update(next_run=date(2024, 1, 15))
+        self.assertEqual(RecurringExpenseService.run_due(today=date(2024, 1, 15)), (1, 0))
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def test_occurrence_moved_onto_a_due_date_does_not_block_the_batch(self):
+        daily = self._rule(date(2024, 1, 1), RecurringExpense.DAILY)
+        RecurringExpenseService.run_due(today=date(2024, 1, 5))
+        # The user moves the last occurrence onto the next due date
+        moved = Expense.objects.get(recurring_expense=daily, date=date(2024, 1, 5))
+        moved.date = date(2024, 1, 6)
+        ExpenseService.save_expense(moved)
+        other = get_user_model().objects.create_user(username='other', email='other@example.com', password='x')
+        monthly = RecurringExpense.objects.create(
+            user=other, category=self.rent, amount=Decimal('900.00'), frequency=RecurringExpense.MONTHLY,
+            start_date=date(2024, 2, 1), next_run=date(2024, 2, 1)
+        )
+
+        self.assertEqual(RecurringExpenseService.run_due(today=date(2024, 2, 1)), (2, 27))
+        self.assertEqual(Expense.objects.filter(recurring_expense=daily, date=date(2024, 1, 6)).count(), 1)
+        self.assertFalse(Expense.objects.filter(recurring_expense=daily, date=date(2024, 1, 5)).exists())
+        self.assertEqual(Expense.objects.filter(recurring_expense=daily).count(), 31)
+        self.assertTrue(Expense.objects.filter(recurring_expense=monthly, date=date(2024, 2, 1)).exists())
+        self.assertEqual(ExpenseDailyRollup.objects.get(user=self.user, date=date(2024, 1, 6)).count, 1)
+
+    def test_repeat_option_and_command(self):
+        today = timezone.localdate()
+        self.client.post(reverse('home'), {
+            'action': 'add_expense', 'category': self.rent.pk, 'amount': '500.00',
+            'date': (today - timedelta(days=2)).isoformat(), 'repeat': 'daily'
+        })
+        rule = RecurringExpense.objects.get()
+        self.assertEqual(rule.next_run, today - timedelta(days=1))
+        self.assertEqual(Expense.objects.get().recurring_expense, rule)
+
+        out = StringIO()
+        call_command('run_recurring_expenses', stdout=out)
+        self.assertIn('Created 2 expenses from 1 recurring rules', out.getvalue())
+        self.assertEqual(Expense.objects.count(), 3)
+
+        self.client.post(reverse('home'), {'action': 'stop_recurring', 'recurring_id': rule.pk})
+        rule.refresh_from_db()
+        self.assertFalse(rule.active)
+        self.assertNotIn('repeat', self.client.get(reverse('home'), {'edit': Expense.objects.first().pk}).context['expense_form'].fields)
+
+
+@override_settings(DASHBOARD_CACHE_ENABLED=True)
+class TemplateFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        ExpenseService.save_expense(Expense(
+            user=self.user, category=self.food, amount=Decimal('12.00'), date=timezone.localdate()
+        ))
+        self.client.force_login(self.user)
+
+    def test_category_choices_are_cached_until_categories_change(self):
+        get_category_choices()
+        with self.assertNumQueries(0):
+            rendered = str(ExpenseForm()['category']) + str(ExpenseFilterForm()['category'])
+        self.assertIn('>Food</option>', rendered)
+        self.assertIn('>All Categories</option>', rendered)
+
+        self.food.name = 'Groceries'
+        self.food.save()
+        self.assertIn('>Groceries</option>', str(ExpenseForm()['category']))
+        # Forms that are never rendered don't load the choices at all
+        ExpenseCategory.objects.create(name='Rent')
+        with self.assertNumQueries(0):
+            ExpenseFilterForm({'search': 'x'}).is_valid()
+
+    def test_fragments_are_reused_and_invalidated_by_writes(self):
+        response = self.client.get(reverse('home'))
+        key = make_template_fragment_key('dashboard_stats', [
+            self.user.pk, response.context['data_token'], response.context['filter_signature']
+        ])
+        self.assertIsNotNone(cache.get(key))
+        self.assertContains(response, 'Rp 12.00')
+
+        cache.set(key, '<p>cached stats</p>')
+        self.assertContains(self.client.get(reverse('home')), 'cached stats')
+        self.assertNotContains(self.client.get(reverse('home'), {'amount_min': '1'}), 'cached stats')
+
+        ExpenseService.save_expense(Expense(
+            user=self.user, category=self.food, amount=Decimal('30.00'), date=timezone.localdate()
+        ))
+        response = self.client.get(reverse('home'))
+        self.assertNotContains(response, 'cached stats')
+        self.assertContains(response, 'Rp 42.00')
+
+class CategoryRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+
+    def test_registry_is_loaded_once_per_version(self):
+        registry = get_category_registry()
+        self.assertEqual(registry.names, {self.food.pk: 'Food', self.rent.pk: 'Rent'})
+        self.assertEqual(registry.ids['Rent'], self.rent.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(get_category_registry(), registry)
+
+        ExpenseCategory.objects.create(name='Travel')
+        self.assertIn('Travel', get_category_registry().ids)
+
+    def test_unknown_id_forces_a_reload(self):
+        get_category_registry()
+        # Created without the signals, like a write another process has not announced yet
+        ExpenseCategory.objects.bulk_create([ExpenseCategory(name='Travel')])
+        travel = ExpenseCategory.objects.get(name='Travel')
+        with self.assertNumQueries(1):
+            self.assertEqual(get_category_registry([travel.pk]).names[travel.pk], 'Travel')
+
+    def test_forms_validate_categories_against_the_registry(self):
+        get_category_registry()
+        with self.assertNumQueries(0):
+            self.assertTrue(ExpenseFilterForm({'category': self.rent.pk}).is_valid())
+            self.assertFalse(ExpenseForm({'category': 'x', 'amount': '5.00', 'date': '2026-01-02'}).is_valid())
+        # Only the model's existence check, for categories deleted elsewhere
+        with self.assertNumQueries(1):
+            form = ExpenseForm({'category': self.food.pk, 'amount': '5.00', 'date': '2026-01-02'})
+            self.assertTrue(form.is_valid(), form.errors)
+        expense = form.save(commit=False)
+        expense.user = self.user
+        expense.save()
+        self.assertEqual(Expense.objects.get().category, self.food)
+        # Cleaned categories are copies; changing one leaves the registry alone
+        form.cleaned_data['category'].name = 'Changed'
+        self.assertEqual(get_category_registry().get(self.food.pk).name, 'Food')
+
+        self.assertFalse(ExpenseForm({'category': 9999, 'amount': '5.00', 'date': '2026-01-02'}).is_valid())
+
+    def test_forms_reject_a_category_deleted_behind_a_stale_registry(self):
+        registry = get_category_registry()
+        self.rent.delete()
+        with mock.patch('tracker.forms.get_category_registry', return_value=registry):
+            form = ExpenseForm({'category': self.rent.pk, 'amount': '5.00', 'date': '2026-01-02'})
+            self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+
+    def test_chart_queries_skip_the_category_join(self):
+        for category in (self.food, self.rent, self.rent):
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=category, amount=Decimal('10.00'), date=timezone.localdate()
+            ))
+        get_category_registry()
+        with CaptureQueriesContext(connection) as queries:
+            distribution = ExpenseService.get_category_distribution(self.user)
+            aggregates = DashboardAggregator(self.user).compute()
+            ''.join(ExpenseService.iter_expenses_csv(self.user))
+        self.assertFalse(any('tracker_expensecategory' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(distribution['labels'], ['Rent', 'Food'])
+        self.assertEqual(aggregates['charts']['category']['labels'], ['Rent', 'Food'])
+
+    def test_import_reloads_names_written_by_other_processes(self):
+        get_category_registry()
+        ExpenseCategory.objects.bulk_create([ExpenseCategory(name='Travel')])
+        with self.assertNumQueries(1):
+            lookup = ExpenseImportService.get_category_lookup()
+        self.assertEqual(set(lookup), {'Food', 'Rent', 'Travel'})
+        self.assertIs(get_category_registry().ids, lookup)
+
+    def test_registry_expires_only_with_a_per_process_cache(self):
+        registry = get_category_registry()
+        ExpenseCategory.objects.bulk_create([ExpenseCategory(name='Travel')])
+        later = registry.loaded_at + 31
+        with mock.patch('tracker.categories.time.monotonic', return_value=later):
+            with mock.patch('tracker.categories.is_cache_shared', return_value=True):
+                self.assertIs(get_category_registry(), registry)
+            with self.settings(CATEGORY_REGISTRY_TTL=30):
+                self.assertIn('Travel', dict(get_category_choices()).values())
+
+class BulkExpenseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.travel = ExpenseCategory.objects.create(name='Travel')
+        self.expenses = [
+            ExpenseService.save_expense(Expense(
+                user=self.user, category=self.food, amount=Decimal(amount), date=day, description='Lunch'
+            ))
+            for amount, day in [('10.00', date(2024, 1, 31)), ('5.00', date(2024, 1, 31)), ('7.00', date(2024, 2, 1))]
+        ]
+        self.foreign = ExpenseService.save_expense(Expense(
+            user=self.other, category=self.food, amount=Decimal('1.00'), date=date(2024, 1, 31)
+        ))
+        self.ids = [expense.pk for expense in self.expenses[:2]] + [self.foreign.pk]
+        self.client.force_login(self.user)
+
+    def _derived_state(self, user):
+        return (
+            sorted(ExpenseDailyRollup.objects.filter(user=user).values_list('category_id', 'date', 'amount', 'count')),
+            sorted(ExpenseMonthlyTotal.objects.filter(user=user).values_list('category_id', 'month', 'amount', 'count')),
+        )
+
+    def _assert_derived_data_matches_expenses(self):
+        for user in (self.user, self.other):
+            maintained = self._derived_state(user)
+            RollupService.rebuild(user)
+            BudgetService.rebuild(user)
+            self.assertEqual(maintained, self._derived_state(user))
+
+    def _expense_statements(self, queries):
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('UPDATE "tracker_expense"', 'DELETE FROM "tracker_expense"'))
+        ]
+
+    def test_delete_is_one_statement_scoped_to_the_user(self):
+        with mock.patch.object(DashboardCache, 'invalidate') as invalidate, \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(BulkExpenseService.delete(self.user, self.ids), 2)
+        self.assertEqual(len(self._expense_statements(queries)), 1)
+        invalidate.assert_called_once_with(self.user.pk)
+        self.assertEqual(list(Expense.objects.filter(user=self.user)), [self.expenses[2]])
+        self.assertTrue(Expense.objects.filter(pk=self.foreign.pk).exists())
+        self._assert_derived_data_matches_expenses()
+        self.assertEqual(
+            list(get_search_backend().search(Expense.objects.all(), 'lunch').values_list('pk', flat=True)),
+            [self.expenses[2].pk]
+        )
+
+    def test_delete_falls_back_to_the_collector_for_related_models(self):
+        with mock.patch.object(BulkExpenseService, 'can_delete_directly', return_value=False), \
+                mock.patch.object(DashboardCache, 'invalidate'):
+            self.assertEqual(BulkExpenseService.delete(self.user, self.ids), 2)
+        self.assertEqual(list(Expense.objects.filter(user=self.user)), [self.expenses[2]])
+        self.assertTrue(Expense.objects.filter(pk=self.foreign.pk).exists())
+        self._assert_derived_data_matches_expenses()
+        self.assertTrue(BulkExpenseService.can_delete_directly())
+
+    def test_recategorize_moves_totals_and_search_terms(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(BulkExpenseService.recategorize(self.user, self.ids, self.travel), 2)
+        self.assertEqual(len(self._expense_statements(queries)), 1)
+        self.assertEqual(Expense.objects.get(pk=self.foreign.pk).category, self.food)
+        self._assert_derived_data_matches_expenses()
+        found = get_search_backend().search(Expense.objects.filter(user=self.user), 'travel')
+        self.assertEqual(sorted(found.values_list('pk', flat=True)), sorted(self.ids[:2]))
+        # Already in the category: nothing to do
+        self.assertEqual(BulkExpenseService.recategorize(self.user, self.ids, self.travel), 0)
+
+    def test_shift_dates_across_months(self):
+        ids = [expense.pk for expense in self.expenses]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(BulkExpenseService.shift_dates(self.user, ids, 1), 3)
+        self.assertEqual(len(self._expense_statements(queries)), 1)
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=self.user).values_list('date', flat=True)),
+            [date(2024, 2, 1), date(2024, 2, 1), date(2024, 2, 2)]
+        )
+        self._assert_derived_data_matches_expenses()
+
+    def test_shift_onto_an_existing_recurring_occurrence_changes_nothing(self):
+        rule = RecurringExpenseService.create_from_expense(self.expenses[0], RecurringExpense.DAILY)
+        Expense.objects.filter(pk=self.expenses[2].pk).update(recurring_expense=rule)
+        before = self._derived_state(self.user)
+        with self.assertRaises(IntegrityError):
+            BulkExpenseService.shift_dates(self.user, [self.expenses[0].pk], 1)
+        self.assertEqual(Expense.objects.get(pk=self.expenses[0].pk).date, date(2024, 1, 31))
+        self.assertEqual(self._derived_state(self.user), before)
+
+    def test_shift_a_run_of_consecutive_occurrences(self):
+        rule = RecurringExpense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('3.00'), frequency=RecurringExpense.DAILY,
+            start_date=date(2024, 3, 1), next_run=date(2024, 3, 1)
+        )
+        RecurringExpenseService.run_due(today=date(2024, 3, 5))
+        ids = list(Expense.objects.filter(recurring_expense=rule).values_list('pk', flat=True))
+        self.assertEqual(len(ids), 5)
+
+        self.assertEqual(BulkExpenseService.shift_dates(self.user, ids, 1), 5)
+        self.assertEqual(
+            sorted(Expense.objects.filter(recurring_expense=rule).values_list('date', flat=True)),
+            [date(2024, 3, day) for day in range(2, 7)]
+        )
+        self._assert_derived_data_matches_expenses()
+        # Moving only part of the run back onto the rest still collides
+        with self.assertRaises(IntegrityError):
+            BulkExpenseService.shift_dates(self.user, ids[:2], 1)
+
+    def test_bulk_form_in_the_list(self):
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'id="bulk-expense-form"')
+        self.assertContains(response, 'name="bulk-expense_ids"', count=3)
+        self.assertContains(response, 'form="bulk-expense-form"', count=3)
+
+        url = reverse('home') + '?category=' + str(self.food.pk)
+        response = self.client.post(url, {
+            'action': 'bulk_expenses', 'bulk-bulk_action': 'shift_dates', 'bulk-days': '-2',
+            'bulk-expense_ids': [self.expenses[2].pk],
+        })
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(Expense.objects.get(pk=self.expenses[2].pk).date, date(2024, 1, 30))
+
+        response = self.client.post(reverse('home'), {
+            'action': 'bulk_expenses', 'bulk-bulk_action': 'recategorize', 'bulk-expense_ids': self.ids,
+        }, follow=True)
+        self.assertContains(response, 'Choose the category')
+        response = self.client.post(reverse('home'), {'action': 'bulk_expenses', 'bulk-bulk_action': 'delete'}, follow=True)
+        self.assertContains(response, 'Select at least one expense.')
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
@@ -1,9 +1,16 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('dashboard/async/', views.home_async, name='home_async'),
     path('guest-dashboard/', views.guest_dashboard, name='guest_dashboard'),
+    path('charts/<str:series>.svg', views.chart_svg, name='chart_svg'),
     path('about/', views.about, name='about'),
     path('export-csv/', views.export_expenses_csv, name='export_expenses_csv'),
+    path('import-csv/', views.import_expenses_csv, name='import_expenses_csv'),
+    path('api/expenses/', api.expense_collection, name='api_expenses'),
+    path('api/expenses/<int:expense_id>/', api.expense_detail, name='api_expense_detail'),
+    path('api/charts/', api.chart_collection, name='api_charts'),
+    path('api/charts/<str:series>/', api.chart_series, name='api_chart_series'),
 ]
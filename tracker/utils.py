@@ -1,6 +1,5 @@
-from decimal import Decimal
-from django.utils import timezone
-from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from .periods import PERIOD_KINDS, get_period, get_span
 
 class ExpenseUtils:
     """Utility functions for expense-related operations"""
@@ -21,22 +20,14 @@ class ExpenseUtils:
     
     @staticmethod
     def get_date_range(period='month'):
-        """Get date range for different periods"""
-        now = timezone.now()
+        """Get the current period as a half-open (start, end) date range
         
-        if period == 'week':
-            start_date = now - timedelta(weeks=1)
-        elif period == 'month':
-            start_date = now.replace(day=1)
-        elif period == 'quarter':
-            quarter_start_month = ((now.month - 1) // 3) * 3 + 1
-            start_date = now.replace(month=quarter_start_month, day=1)
-        elif period == 'year':
-            start_date = now.replace(month=1, day=1)
-        else:
-            start_date = now - timedelta(days=30)
-        
-        return start_date, now
+        ``period`` is one of tracker.periods.PERIOD_KINDS; anything else
+        means the last 30 days including today.
+        """
+        if period in PERIOD_KINDS:
+            return get_period(period)
+        return get_span('day', 30)
     
     @staticmethod
     def get_expense_categories_colors():
@@ -57,7 +48,7 @@ class ExpenseUtils:
             if amount > Decimal('999999999.99'):
                 return False, "Amount is too large"
             return True, None
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, InvalidOperation):
             return False, "Invalid amount format"
     
     @staticmethod
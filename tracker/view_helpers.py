@@ -1,14 +1,27 @@
 """
 Helper functions for views to make them more modular and maintainable.
 """
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
+from django.db import IntegrityError
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
 
-from .models import Expense
-from .forms import ExpenseForm, ExpenseFilterForm
-from .services import ExpenseService
+from .models import Expense, RecurringExpense
+from .forms import BudgetForm, BulkExpenseForm, ExpenseForm, ExpenseFilterForm, ExpenseImportForm
+from .services import BudgetService, ExpenseService, RollupService
+from .pagination import ExpenseCursorPaginator
+from .recurring import RecurringExpenseService
+from .bulk import BulkExpenseService
+from .cache import DashboardCache
+from .categories import aget_category_version, get_category_version
+from .charts import chart_token, get_chart_urls, parse_chart_selection
+from .instrumentation import timed
 
 
 class ExpenseViewHelper:
@@ -18,6 +31,7 @@ class ExpenseViewHelper:
         self.request = request
         self.user = request.user
         self.expense_service = ExpenseService()
+        self.filters = {}
     
     def handle_expense_form_submission(self):
         """Handle POST requests for expense operations"""
@@ -32,6 +46,14 @@ class ExpenseViewHelper:
             return self._handle_edit_expense()
         elif action == 'delete_expense':
             return self._handle_delete_expense()
+        elif action == 'set_budget':
+            return self._handle_set_budget()
+        elif action == 'delete_budget':
+            return self._handle_delete_budget()
+        elif action == 'stop_recurring':
+            return self._handle_stop_recurring()
+        elif action == 'bulk_expenses':
+            return self._handle_bulk_expenses()
         
         return None
     
@@ -41,8 +63,17 @@ class ExpenseViewHelper:
         if form.is_valid():
             expense = form.save(commit=False)
             expense.user = self.user
-            expense.save()
-            messages.success(self.request, 'Expense added successfully!')
+            self.expense_service.save_expense(expense)
+            if form.cleaned_data.get('repeat'):
+                rule = RecurringExpenseService.create_from_expense(expense, form.cleaned_data['repeat'])
+                messages.success(
+                    self.request,
+                    f"Expense added successfully! It repeats {rule.get_frequency_display().lower()}, "
+                    f"next on {rule.next_run:%b %d, %Y}."
+                )
+            else:
+                messages.success(self.request, 'Expense added successfully!')
+            self._warn_if_over_budget(expense)
             return redirect('home')
         else:
             messages.error(self.request, 'Please correct the errors below.')
@@ -52,11 +83,15 @@ class ExpenseViewHelper:
         """Handle editing existing expense"""
         expense_id = self.request.POST.get('expense_id')
         expense = get_object_or_404(Expense, pk=expense_id, user=self.user)
+        # Validation writes the new values onto the instance, so remember the
+        # old ones for the rollup first
+        before = RollupService.snapshot(expense)
         form = ExpenseForm(self.request.POST, instance=expense)
         
         if form.is_valid():
-            form.save()
+            self.expense_service.save_expense(form.save(commit=False), before=before)
             messages.success(self.request, 'Expense updated successfully!')
+            self._warn_if_over_budget(expense)
             return redirect('home')
         else:
             messages.error(self.request, 'Please correct the errors below.')
@@ -66,10 +101,79 @@ class ExpenseViewHelper:
         """Handle deleting expense"""
         expense_id = self.request.POST.get('expense_id')
         expense = get_object_or_404(Expense, pk=expense_id, user=self.user)
-        expense.delete()
+        self.expense_service.delete_expense(expense)
         messages.success(self.request, 'Expense deleted successfully!')
         return redirect('home')
     
+    def _handle_set_budget(self):
+        """Handle creating or changing a category budget"""
+        form = BudgetForm(self.request.POST, prefix='budget')
+        if form.is_valid():
+            BudgetService.set_budget(self.user, form.cleaned_data['category'], form.cleaned_data['monthly_limit'])
+            messages.success(self.request, f"Budget for {form.cleaned_data['category']} saved.")
+        else:
+            messages.error(self.request, 'Please enter a category and a monthly limit of 0 or more.')
+        return redirect('home')
+    
+    def _handle_delete_budget(self):
+        """Handle removing a category budget"""
+        category_id = self.request.POST.get('category_id', '')
+        if category_id.isdigit():
+            BudgetService.delete_budget(self.user, int(category_id))
+            messages.success(self.request, 'Budget removed.')
+        return redirect('home')
+    
+    def _handle_stop_recurring(self):
+        """Handle stopping a recurring expense"""
+        rule_id = self.request.POST.get('recurring_id', '')
+        if rule_id.isdigit() and RecurringExpenseService.stop(self.user, int(rule_id)):
+            messages.success(self.request, 'Recurring expense stopped.')
+        return redirect('home')
+    
+    def _handle_bulk_expenses(self):
+        """Handle deleting, re-categorizing or shifting the selected expenses"""
+        form = BulkExpenseForm(self.request.POST, prefix='bulk')
+        if not form.is_valid():
+            for error in form.non_field_errors() + form.errors.get('expense_ids', []):
+                messages.error(self.request, error)
+            return self._redirect_back()
+        
+        expense_ids = form.cleaned_data['expense_ids']
+        action = form.cleaned_data['bulk_action']
+        if action == BulkExpenseForm.DELETE:
+            count = BulkExpenseService.delete(self.user, expense_ids)
+            messages.success(self.request, f'{count} expense(s) deleted.')
+        elif action == BulkExpenseForm.RECATEGORIZE:
+            category = form.cleaned_data['category']
+            count = BulkExpenseService.recategorize(self.user, expense_ids, category)
+            messages.success(self.request, f'{count} expense(s) moved to {category.name}.')
+        else:
+            try:
+                count = BulkExpenseService.shift_dates(self.user, expense_ids, form.cleaned_data['days'])
+            except IntegrityError:
+                messages.error(
+                    self.request,
+                    'Dates not changed: a recurring expense would fall on a date it already has an expense on.'
+                )
+            else:
+                messages.success(self.request, f'{count} expense(s) moved by {form.cleaned_data["days"]} day(s).')
+        return self._redirect_back()
+    
+    def _redirect_back(self):
+        """Redirect to the dashboard, keeping the list filters and page"""
+        query = self.request.GET.urlencode()
+        return redirect(f"{reverse('home')}?{query}" if query else 'home')
+    
+    def _warn_if_over_budget(self, expense):
+        """Flag a write that pushed its category over the month's budget"""
+        status = BudgetService.get_category_status(self.user, expense.category_id, expense.date)
+        if status and status['over_budget']:
+            messages.warning(
+                self.request,
+                f"{status['category']} is over budget by Rp {-status['remaining']:.2f} "
+                f"for {expense.date:%B %Y}."
+            )
+    
     def get_expense_form_context(self):
         """Get form context for GET requests"""
         edit_id = self.request.GET.get('edit')
@@ -84,7 +188,13 @@ class ExpenseViewHelper:
         
         return {
             'expense_form': expense_form,
-            'edit_expense': edit_expense
+            'edit_expense': edit_expense,
+            'import_form': ExpenseImportForm(),
+            'budget_form': BudgetForm(prefix='budget'),
+            'bulk_form': BulkExpenseForm(prefix='bulk'),
+            'recurring_expenses': RecurringExpense.objects.filter(
+                user=self.user, active=True
+            ).select_related('category').order_by('next_run')
         }
     
     def get_filtered_expenses(self):
@@ -103,6 +213,7 @@ class ExpenseViewHelper:
                 'sort_by': filter_form.cleaned_data.get('sort_by')
             }
         
+        self.filters = filters
         expenses = self.expense_service.get_user_expenses(self.user, filters)
         
         return {
@@ -110,17 +221,115 @@ class ExpenseViewHelper:
             'filter_form': filter_form
         }
     
+    def get_paginator(self, expenses):
+        """Cursor paginator for the list, using the requested sort order"""
+        sort_by = ExpenseService.get_sort_by(self.filters)
+        
+        return ExpenseCursorPaginator(
+            expenses,
+            sort_by=sort_by,
+            page_size=getattr(settings, 'EXPENSE_PAGE_SIZE', 25),
+            projection=ExpenseService.LIST_ROW
+        )
+    
+    def get_expense_page_context(self, expenses):
+        """Get the current keyset page of expenses and its navigation links"""
+        page = self.get_paginator(expenses).get_page(self.request.GET.get('cursor'))
+        return self._page_context(page)
+    
+    async def aget_expense_page_context(self, expenses):
+        """Async get_expense_page_context"""
+        page = await self.get_paginator(expenses).aget_page(self.request.GET.get('cursor'))
+        return self._page_context(page)
+    
+    def _page_context(self, page):
+        return {
+            'expenses': page,
+            'expense_page': page,
+            'next_page_query': self._page_query(page.next_cursor) if page.has_next else None,
+            'previous_page_query': self._page_query(page.previous_cursor) if page.has_previous else None
+        }
+    
+    def _page_query(self, cursor):
+        """Build the query string for a page link, keeping the active filters"""
+        params = self.request.GET.copy()
+        params.pop('edit', None)
+        params['cursor'] = cursor
+        return params.urlencode()
+    
     def get_statistics_context(self, expenses):
         """Get statistics context for dashboard"""
-        return self.expense_service.get_expense_statistics(self.user, expenses)
+        return DashboardCache.get_expense_statistics(self.user, self.filters)
     
     def get_chart_data_context(self, expenses):
         """Get chart data context"""
-        return self.expense_service.get_chart_data(self.user, expenses)
-
-
-import json
+        return DashboardCache.get_chart_data(self.user, self.filters)
+    
+    def get_dashboard_aggregates(self, expenses):
+        """Get statistics, chart data and monthly statistics in one pass"""
+        return DashboardCache.get_dashboard_aggregates(self.user, self.filters, expenses)
+    
+    async def aget_dashboard_aggregates(self, expenses):
+        """Async get_dashboard_aggregates"""
+        return await DashboardCache.aget_dashboard_aggregates(self.user, self.filters, expenses)
+    
+    def get_budget_context(self):
+        """This month's budget statuses"""
+        return DashboardCache.get_budget_status(self.user)
+    
+    async def aget_budget_context(self):
+        """Async get_budget_context"""
+        return await DashboardCache.aget_budget_status(self.user)
+    
+    def get_chart_filter_params(self):
+        """Raw query parameters of the filters that change the charts"""
+        return {
+            field: self.request.GET[field]
+            for field in DashboardCache.SIGNATURE_FIELDS
+            if self.request.GET.get(field)
+        }
+    
+    def get_chart_selection(self):
+        """Charts picked with ``?charts=``; every chart if it is missing or invalid"""
+        try:
+            return parse_chart_selection(self.request.GET.get('charts'))
+        except ValueError:
+            return parse_chart_selection(None)
+    
+    def get_fragment_context(self, version, category_version):
+        """Chart image URLs and the keys of the cached template fragments
+        
+        Fragments are keyed by the user, a token of the data version and
+        today's date, and the filter signature, the charts also by the chart
+        selection; the filter form by the query string and the category list
+        version.
+        """
+        token = chart_token(version)
+        selection = self.get_chart_selection()
+        return {
+            'charts': get_chart_urls(token, self.get_chart_filter_params(), selection),
+            'chart_selection': ','.join(selection),
+            'data_token': token,
+            'filter_signature': DashboardCache.filter_signature(self.filters),
+            'category_version': category_version,
+            # A zero timeout stores nothing while the dashboard cache is off
+            'fragment_cache_timeout': (
+                getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300) if DashboardCache.is_enabled() else 0
+            ),
+        }
+    
+    def get_chart_context(self):
+        """Chart URLs and fragment cache keys for the dashboard template"""
+        return self.get_fragment_context(DashboardCache.get_version(self.user.pk), get_category_version())
+    
+    async def aget_chart_context(self):
+        """Async get_chart_context"""
+        version, category_version = await asyncio.gather(
+            DashboardCache.aget_version(self.user.pk), aget_category_version()
+        )
+        return self.get_fragment_context(version, category_version)
 
+@timed
 def get_dashboard_context(request):
     """Get complete dashboard context"""
     helper = ExpenseViewHelper(request)
@@ -129,28 +338,67 @@ def get_dashboard_context(request):
     expense_data = helper.get_filtered_expenses()
     expenses = expense_data['expenses']
     
+    # Get the visible page of the expense list
+    page_context = helper.get_expense_page_context(expenses)
+    
     # Get form context
     form_context = helper.get_expense_form_context()
     
-    # Get statistics
-    stats_context = helper.get_statistics_context(expenses)
+    # Get statistics, chart data and monthly statistics from one grouped scan
+    aggregates = helper.get_dashboard_aggregates(expenses)
+    
+    # The charts are images rendered by the chart_svg view; their URLs share
+    # a token with the keys of the cached template fragments
+    chart_context = helper.get_chart_context()
+    
+    # Budgets are for the whole month and ignore the list filters
+    budget_context = helper.get_budget_context()
+    
+    return build_dashboard_context(
+        expense_data, page_context, form_context, aggregates, chart_context, budget_context
+    )
+
+
+@timed
+async def aget_dashboard_context(request):
+    """Async get_dashboard_context
+
+    The list page and the aggregates don't depend on each other, so their
+    queries are issued concurrently. The forms validate against the database
+    and run in a worker thread.
+    """
+    helper = ExpenseViewHelper(request)
+    expense_data = await sync_to_async(helper.get_filtered_expenses)()
+    expenses = expense_data['expenses']
     
-    # Get chart data
-    chart_context = helper.get_chart_data_context(expenses)
+    page_context, aggregates, form_context, chart_context, budget_context = await asyncio.gather(
+        helper.aget_expense_page_context(expenses),
+        helper.aget_dashboard_aggregates(expenses),
+        sync_to_async(helper.get_expense_form_context)(),
+        helper.aget_chart_context(),
+        helper.aget_budget_context()
+    )
     
-    # Get monthly statistics
-    monthly_stats = helper.expense_service.get_monthly_statistics(request.user)
+    return build_dashboard_context(
+        expense_data, page_context, form_context, aggregates, chart_context, budget_context
+    )
+
+
+def build_dashboard_context(expense_data, page_context, form_context, aggregates, chart_context, budget_context):
+    """Combine the parts of the dashboard into the template context"""
+    stats_context = aggregates['statistics']
+    monthly_stats = aggregates['monthly_statistics']
     
     # Combine all contexts
     context = {
         'now': timezone.now(),
         **expense_data,
+        **page_context,
         **form_context,
         **stats_context,
         **monthly_stats,
-        'category_labels': json.dumps(chart_context['category']['labels']),
-        'category_amounts': json.dumps(chart_context['category']['amounts']),
-        'category_colors': json.dumps(chart_context['category']['colors'])
+        **chart_context,
+        **budget_context
     }
     
     return context
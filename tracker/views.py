@@ -1,9 +1,19 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.views.decorators.http import require_GET, require_POST
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from datetime import datetime
 
-from .view_helpers import ExpenseViewHelper, get_dashboard_context
+from .api import user_data_condition
+from .cache import DashboardCache
+from .charts import CHART_TITLES, IMMUTABLE_MAX_AGE, chart_token
+from .view_helpers import ExpenseViewHelper, aget_dashboard_context, get_dashboard_context
+from .forms import ExpenseImportForm
+from .importers import ExpenseImportService
+from .instrumentation import timed_section
 
 def home(request):
     """Home page with expense dashboard or guest dashboard"""
@@ -21,30 +31,48 @@ def home(request):
             if isinstance(result, dict):
                 context = get_dashboard_context(request)
                 context.update(result)
-                return render(request, 'tracker/home.html', context)
+                with timed_section('render'):
+                    return render(request, 'tracker/home.html', context)
             elif result:  # Form with errors
                 context = get_dashboard_context(request)
                 context['expense_form'] = result
-                return render(request, 'tracker/home.html', context)
+                with timed_section('render'):
+                    return render(request, 'tracker/home.html', context)
         
         # Handle GET requests
         context = get_dashboard_context(request)
-        return render(request, 'tracker/home.html', context)
+        with timed_section('render'):
+            return render(request, 'tracker/home.html', context)
     else:
         # Guest user sees guest dashboard
         return render(request, 'tracker/guest_dashboard.html')
 
+async def home_async(request):
+    """Async home page for ASGI deployments
+
+    GET requests build the dashboard with aget_dashboard_context; form posts
+    and the guest page are handled by the synchronous ``home``.
+    """
+    user = await request.auser()
+    # Avoid the lazy request.user hitting the database from the event loop
+    request.user = user
+    if request.method != 'GET' or not user.is_authenticated:
+        return await sync_to_async(home)(request)
+    
+    context = await aget_dashboard_context(request)
+    with timed_section('render'):
+        # Rendering evaluates form choices, so it runs in a worker thread too
+        return await sync_to_async(render)(request, 'tracker/home.html', context)
+
 @login_required
 def export_expenses_csv(request):
     """Export user expenses to CSV file"""
     helper = ExpenseViewHelper(request)
     expense_data = helper.get_filtered_expenses()
     
-    # Generate CSV content
-    csv_content = helper.expense_service.export_expenses_to_csv(request.user, expense_data['expenses'])
-    
-    # Create HTTP response with CSV content
-    response = HttpResponse(csv_content, content_type='text/csv')
+    # Stream the CSV so the download starts immediately and memory stays flat
+    csv_chunks = helper.expense_service.iter_expenses_csv(request.user, expense_data['expenses'])
+    response = StreamingHttpResponse(csv_chunks, content_type='text/csv')
     
     # Generate filename with current date
     filename = f"expenses_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -52,6 +80,56 @@ def export_expenses_csv(request):
     
     return response
 
+@login_required
+@require_POST
+def import_expenses_csv(request):
+    """Import expenses from an uploaded CSV file"""
+    form = ExpenseImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, 'Please choose a CSV file to import.')
+        return redirect('home')
+    
+    report = ExpenseImportService.import_csv(request.user, request.FILES['csv_file'])
+    
+    if report['created']:
+        messages.success(request, f"Imported {report['created']} expenses.")
+    if report['errors']:
+        shown = report['errors'][:10]
+        details = '; '.join(f'line {line}: {message}' for line, message in shown)
+        remaining = len(report['errors']) - len(shown)
+        if remaining:
+            details += f' (and {remaining} more)'
+        messages.warning(request, f"Skipped {len(report['errors'])} rows: {details}")
+    
+    return redirect('home')
+
+@login_required
+@require_GET
+@user_data_condition
+def chart_svg(request, series):
+    """One dashboard chart as an SVG image
+    
+    Requested with the current ``v`` token the image can never change, so the
+    browser may keep it for a year. Other requests must revalidate, which the
+    ETag makes cheap.
+    """
+    if series not in CHART_TITLES:
+        raise Http404('Unknown chart')
+    
+    helper = ExpenseViewHelper(request)
+    helper.get_filtered_expenses()
+    svg = DashboardCache.get_chart_svg(request.user, series, helper.filters)
+    
+    response = HttpResponse(svg, content_type='image/svg+xml')
+    current = DashboardCache.is_enabled() and request.GET.get('v') == chart_token(
+        DashboardCache.get_version(request.user.pk)
+    )
+    if current:
+        patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 def about(request):
     """About page view"""
     return render(request, 'tracker/about.html', {'now': datetime.now()})